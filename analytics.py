@@ -0,0 +1,128 @@
+import numpy as np
+
+from database import connect_db
+from progress import EPLEY_REPS_DIVISOR, MAX_E1RM_REPS
+
+HISTORY_DTYPE = [('date', 'U10'), ('weight', 'f8'), ('sets', 'i8'), ('reps', 'i8')]
+
+def load_exercise_history(user_id, exercise_id):
+    conn = connect_db()
+    cursor = conn.cursor()
+
+    cursor.execute('''
+        SELECT t2.date, t1.weight, t1.sets, t1.reps
+        FROM workout_exercises t1
+        INNER JOIN workout t2
+            ON t1.workout_id = t2.id
+        WHERE t1.exercise_id = ? AND t2.user_id = ?
+        ORDER BY t2.date, t2.id
+    ''', (exercise_id, user_id))
+    history = np.array(cursor.fetchall(), dtype=HISTORY_DTYPE)
+
+    return {
+        'dates': history['date'].astype('datetime64[D]'),
+        'weight': history['weight'],
+        'sets': history['sets'],
+        'reps': history['reps']
+    }
+
+# Sets outside 1..MAX_E1RM_REPS get NaN, the same as the NULL the progress
+# rollups give them, and are left out of daily bests and averages
+def has_e1rm(reps):
+    return (reps >= 1) & (reps <= MAX_E1RM_REPS)
+
+def epley_e1rm(weight, reps):
+    return np.where(has_e1rm(reps), np.where(reps == 1, weight, weight * (1 + reps / EPLEY_REPS_DIVISOR)), np.nan)
+
+def brzycki_e1rm(weight, reps):
+    return np.where(has_e1rm(reps), weight * 36.0 / (37.0 - np.minimum(reps, MAX_E1RM_REPS)), np.nan)
+
+E1RM_FORMULAS = {
+    'epley': epley_e1rm,
+    'brzycki': brzycki_e1rm
+}
+
+def set_volume(weight, sets, reps):
+    return weight * sets * reps
+
+def daily_totals(dates, volume, e1rm):
+    # Collapses sets onto the days they were done; dates must be sorted
+    days, day_index = np.unique(dates, return_inverse=True)
+    daily_volume = np.bincount(day_index, weights=volume, minlength=len(days))
+    # fmax skips NaN, so a day keeps NaN only if none of its sets had one
+    daily_e1rm = np.full(len(days), np.nan)
+    np.fmax.at(daily_e1rm, day_index, e1rm)
+    return days, daily_volume, daily_e1rm
+
+def rolling_volume(days, daily_volume, window_days=7):
+    # Sum of the volume in the window_days ending on each day
+    cumulative = np.concatenate(([0.0], np.cumsum(daily_volume)))
+    window_start = np.searchsorted(days, days - np.timedelta64(window_days - 1, 'D'), side='left')
+    return cumulative[1:] - cumulative[window_start]
+
+def moving_average(values, window):
+    # Mean of the non-NaN values among the last window entries
+    if len(values) == 0:
+        return np.array([], dtype=float)
+    present = ~np.isnan(values)
+    cumulative = np.concatenate(([0.0], np.cumsum(np.where(present, values, 0.0))))
+    cumulative_counts = np.concatenate(([0], np.cumsum(present)))
+    window_start = np.maximum(np.arange(1, len(values) + 1) - window, 0)
+    counts = cumulative_counts[1:] - cumulative_counts[window_start]
+    with np.errstate(invalid='ignore'):
+        return (cumulative[1:] - cumulative[window_start]) / counts
+
+def detect_prs(values):
+    # True wherever a value beats everything before it
+    if len(values) == 0:
+        return np.array([], dtype=bool)
+    previous_best = np.concatenate(([-np.inf], np.fmax.accumulate(values)[:-1]))
+    return values > np.where(np.isnan(previous_best), -np.inf, previous_best)
+
+def analyze_history(history, formula='epley', volume_window_days=7, average_window=4):
+    e1rm = E1RM_FORMULAS[formula](history['weight'], history['reps'])
+    volume = set_volume(history['weight'], history['sets'], history['reps'])
+
+    days, daily_volume, daily_e1rm = daily_totals(history['dates'], volume, e1rm)
+    is_pr = detect_prs(daily_e1rm)
+
+    return {
+        'days': days,
+        'volume': daily_volume,
+        'rolling_volume': rolling_volume(days, daily_volume, volume_window_days),
+        'e1rm': daily_e1rm,
+        'e1rm_moving_average': moving_average(daily_e1rm, average_window),
+        'is_pr': is_pr
+    }
+
+def rounded_list(values):
+    # NaN isn't valid JSON, so days without an estimate come out as null
+    return [None if np.isnan(value) else value for value in values.round(1).tolist()]
+
+def get_exercise_analytics(user_id, exercise_id, formula='epley'):
+    analysis = analyze_history(load_exercise_history(user_id, exercise_id), formula)
+
+    return {
+        'formula': formula,
+        'days': analysis['days'].astype(str).tolist(),
+        'volume': analysis['volume'].round(1).tolist(),
+        'rolling_volume': analysis['rolling_volume'].round(1).tolist(),
+        'e1rm': rounded_list(analysis['e1rm']),
+        'e1rm_moving_average': rounded_list(analysis['e1rm_moving_average']),
+        'prs': analysis['days'][analysis['is_pr']].astype(str).tolist()
+    }
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Print estimated 1RM and volume analytics for an exercise')
+    parser.add_argument('exercise_id', type=int)
+    parser.add_argument('--formula', choices=sorted(E1RM_FORMULAS), default='epley')
+    parser.add_argument('--user-id', type=int, default=1)
+    args = parser.parse_args()
+
+    analytics = get_exercise_analytics(args.user_id, args.exercise_id, args.formula)
+    prs = set(analytics['prs'])
+    print(f"{'date':<12}{'volume':>10}{'7d volume':>12}{'e1RM':>8}{'avg e1RM':>10}")
+    for i, day in enumerate(analytics['days']):
+        print(f"{day:<12}{analytics['volume'][i]:>10}{analytics['rolling_volume'][i]:>12}{analytics['e1rm'][i] or '-':>8}{analytics['e1rm_moving_average'][i] or '-':>10}{'  PR' if day in prs else ''}")
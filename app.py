@@ -1,22 +1,166 @@
-from flask import Flask, jsonify, render_template, request, redirect, url_for
-from database import create_tables, get_exercises_and_muscle_groups, get_muscle_groups, load_data_from_folder
+import click
+import functools
+import hmac
+from flask import Flask, Response, abort, g, jsonify, make_response, render_template, request, redirect, session, stream_with_context, url_for
+import http_cache
+import live_sync
+import metrics
+import write_behind
+from catalog_cache import cache_stats
+from database import close_db, database_ready, init_database
+import logging
 import os
 from datetime import date
+from jinja2 import FileSystemBytecodeCache
 
-from weekly_schedule import add_exercise_from_library, delete_exercise_from_schedule, get_planned_workouts
-from log_workouts import add_exercise_to_log, add_muscle_group_to_log, add_overall_workout_to_log, check_current_workout_exists, delete_curr_muscle_group, delete_curr_overall_workout, delete_curr_workout, delete_curr_workout_exercise, get_curr_workout_data, get_secondary_muscle_groups, get_weekday_exercises, save_curr_workout_data, update_curr_workout_date, update_curr_workout_exercise, update_curr_workout_muscle_group, update_curr_workout_overall
+from weekly_schedule import bulk_add_exercises_from_library, delete_exercise_from_schedule
+from schedule_cache import get_schedule_fragments, schedule_cache_stats
+from log_workouts import add_muscle_group_to_log, add_overall_workout_to_log, apply_curr_workout_patches, bulk_add_exercises_to_log, delete_curr_muscle_group, delete_curr_overall_workout, delete_curr_workout, delete_curr_workout_exercise, finish_curr_workout, load_log_workout_page, update_curr_workout_date, update_curr_workout_exercise, update_curr_workout_muscle_group, update_curr_workout_overall, validate_curr_workout_patches
+from progress import get_exercise_progress, get_muscle_group_progress, get_progress_catalog
+from recovery import get_muscle_group_recovery
+from workout_logs import get_workout_logs
+from export import EXPORT_FORMATS, export_history
+from exercise_search import SEARCH_PAGE_SIZE, search_exercises
+from http_cache import conditional_page
+from users import DEFAULT_USER_ID, get_or_create_user, get_user_id, get_user_name
+
+logger = logging.getLogger(__name__)
 
 app = Flask(__name__)
+# Compiled templates are kept on disk, so a new process loads them instead of
+# compiling every template on its first request. Point TEMPLATE_CACHE_DIR at a
+# directory that outlives the process and fill it at build time with
+# `flask --app app precompile-templates`.
+app.jinja_options = dict(app.jinja_options, bytecode_cache=FileSystemBytecodeCache(os.environ.get('TEMPLATE_CACHE_DIR')))
+app.secret_key = os.environ.get('SECRET_KEY') or os.urandom(32)
+app.teardown_appcontext(close_db)
+metrics.init_app(app)
+http_cache.init_app(app)
+
+# With WRITE_BEHIND=1 autosave updates are queued and written in the
+# background; see write_behind.py. The queue belongs to one process, so
+# read-your-writes only holds for requests served by the same worker.
+app.config['WRITE_BEHIND'] = os.environ.get('WRITE_BEHIND') == '1'
+
+# Users are picked by name through /switch_user, with no password. That is
+# a convenience for a shared device, not a login: anyone who can reach the
+# app can act as any user. It is off unless USER_SWITCHING=1 (or the app runs
+# in debug mode), and only reaches users made with
+# `flask --app app create-user NAME`.
+app.config['USER_SWITCHING'] = os.environ.get('USER_SWITCHING') == '1'
+
+# /_metrics, /_metrics/slow_queries and /_cache_stats show SQL text, timings
+# and usage. With METRICS_TOKEN set they need "Authorization: Bearer <token>";
+# without it they are only served to requests from this machine that did not
+# come through a proxy.
+app.config['METRICS_TOKEN'] = os.environ.get('METRICS_TOKEN')
+
+WRITE_BEHIND_ENDPOINTS = {
+    'update_log_workout_date', 'update_log_exercise', 'update_log_muscle_group', 'update_log_overall_workout', 'update_log_batch'
+}
+
+def create_app():
+    # Called once by every process that serves requests (see wsgi.py). The
+    # database is initialized under a file lock, so any number of workers can
+    # start at once against the same file.
+    if not os.environ.get('SECRET_KEY'):
+        logger.warning("SECRET_KEY is not set; sessions will not survive a restart or be shared between workers")
+    init_database()
+    if app.config['WRITE_BEHIND']:
+        write_behind.start()
+    return app
+
+@app.cli.command('precompile-templates')
+def precompile_templates():
+    # Loading a template compiles it and writes its bytecode to the cache
+    for template_name in app.jinja_env.list_templates(extensions=['html']):
+        app.jinja_env.get_template(template_name)
+    print(f"Templates compiled to {app.jinja_env.bytecode_cache.directory}")
+
+@app.before_request
+def load_user():
+    g.user_id = session.get('user_id', DEFAULT_USER_ID)
+
+@app.before_request
+def flush_queued_updates():
+    # Anything else this user does may read the staged workout, so their
+    # queued updates are written first
+    if app.config['WRITE_BEHIND'] and request.endpoint not in WRITE_BEHIND_ENDPOINTS and request.endpoint != 'static':
+        write_behind.flush(g.user_id)
+
+@app.after_request
+def notify_live_sync(response):
+    # Any write may have changed the staged workout; open streams only read
+    # it again if the version moved
+    if request.method == 'POST' and response.status_code < 400 and 'user_id' in g:
+        live_sync.notify(g.user_id)
+    return response
+
+def enqueue_update(patch_type):
+    if not app.config['WRITE_BEHIND']:
+        return False
+    body = request.get_json(silent=True)
+    try:
+        if not isinstance(body, dict):
+            raise ValueError("Request body must be a JSON object")
+        patches = [dict(body, type=patch_type)]
+        validate_curr_workout_patches(patches)
+    except ValueError as e:
+        abort(make_response(jsonify({"message": str(e)}), 400))
+    write_behind.enqueue(g.user_id, patches)
+    return True
+
+def internal_only(view):
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        token = app.config['METRICS_TOKEN']
+        if token:
+            allowed = hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}')
+        else:
+            allowed = request.remote_addr in ('127.0.0.1', '::1') and 'X-Forwarded-For' not in request.headers
+        if not allowed:
+            abort(404)
+        return view(*args, **kwargs)
+    return wrapper
+
+def user_switching_enabled():
+    return app.config['USER_SWITCHING'] or app.debug
+
+@app.context_processor
+def inject_user():
+    return {
+        'user_name': get_user_name(g.user_id) if 'user_id' in g else None,
+        'user_switching': user_switching_enabled()
+    }
+
+@app.cli.command('create-user')
+@click.argument('name')
+def create_user(name):
+    print(f"User {name} has id {get_or_create_user(name)}")
+
+@app.route('/switch_user', methods=['POST'])
+def switch_user():
+    if not user_switching_enabled():
+        abort(404)
+    name = request.form.get('user_name', '').strip()
+    user_id = get_user_id(name) if name else None
+    if user_id is None:
+        return jsonify({"message": f"No user named {name}"}), 404
+    session['user_id'] = user_id
+    return redirect(request.referrer or url_for('schedule'))
 
 @app.route('/')
 def home():
     return redirect(url_for('schedule'))
 
 @app.route('/schedule')
+@conditional_page(lambda: [f'schedule:{g.user_id}'])
 def schedule():
-    exercises = get_exercises_and_muscle_groups()
-    schedule_data = get_planned_workouts()
-    return render_template('schedule.html', schedule=schedule_data, exercises=exercises)
+    def render_day(day, scheduled_exercises):
+        return render_template('schedule_day.html', day=day, scheduled_exercises=scheduled_exercises)
+
+    day_fragments = get_schedule_fragments(g.user_id, render_day)
+    return render_template('schedule.html', day_fragments=day_fragments)
 
 @app.route('/add_exercises_to_schedule', methods=['POST'])
 def add_exercises_to_schedule():
@@ -27,14 +171,11 @@ def add_exercises_to_schedule():
 
     day_of_week = request.form.get('day_of_week')
     
-    selected_exercise_indicators = [False] * len(exercise_ids)
-
+    exercises = []
     for i in range(len(exercise_ids)):
-        if exercise_ids[i] in selected_exercises:
-            selected_exercise_indicators[i] = True
-        if selected_exercise_indicators[i] == True or sets[i] != '' or reps[i] != '':
-            print(day_of_week)
-            add_exercise_from_library(exercise_ids[i], day_of_week, sets[i], reps[i])
+        if exercise_ids[i] in selected_exercises or sets[i] != '' or reps[i] != '':
+            exercises.append((exercise_ids[i], sets[i], reps[i]))
+    bulk_add_exercises_from_library(g.user_id, day_of_week, exercises)
 
     return redirect(url_for('schedule'))
 
@@ -46,15 +187,12 @@ def add_exercises_to_log():
     sets = request.form.getlist('sets')
     reps = request.form.getlist('reps')
 
-    selected_exercise_indicators = [False] * len(exercise_ids)
-
+    exercises = []
     for i in range(len(exercise_ids)):
-        if exercise_ids[i] in selected_exercises:
-            selected_exercise_indicators[i] = True
-        if selected_exercise_indicators[i] == True or weights[i] != '' or sets[i] != '' or reps[i] != '':
-            add_exercise_to_log(exercise_ids[i], weights[i], sets[i], reps[i])
+        if exercise_ids[i] in selected_exercises or weights[i] != '' or sets[i] != '' or reps[i] != '':
+            exercises.append((exercise_ids[i], weights[i], sets[i], reps[i]))
+    bulk_add_exercises_to_log(g.user_id, exercises)
 
-    
     return redirect(url_for('log_workout'))
 
 @app.route('/add_muscle_group_to_log', methods=['POST'])
@@ -62,149 +200,283 @@ def add_muscle_groups_to_log():
     selected_muscle_groups = request.form.getlist('selected_muscle_groups')
     if selected_muscle_groups:
         for muscle_group in selected_muscle_groups:
-            add_muscle_group_to_log(muscle_group, request.form.get('pump_level_add'), request.form.get('pre_workout_soreness_add'), request.form.get('pre_workout_recovery_add'))
+            add_muscle_group_to_log(g.user_id, muscle_group, request.form.get('pump_level_add'), request.form.get('pre_workout_soreness_add'), request.form.get('pre_workout_recovery_add'))
     return redirect(url_for('log_workout'))
 
 @app.route('/delete_scheduled_exercise', methods=['POST'])
 def delete_scheduled_exercise():
-    delete_exercise_from_schedule(request.form.get('exercise_id'), request.form.get('day_of_week'))
+    delete_exercise_from_schedule(g.user_id, request.form.get('exercise_id'), request.form.get('day_of_week'))
     return redirect(url_for('schedule'))
 
 @app.route('/log-workout')
+@conditional_page(lambda: [f'curr_workout:{g.user_id}', 'catalog'])
 def log_workout():
-    no_overall_workout_data = False
-    curr_workout_exists = check_current_workout_exists()
-    print(f"curr_workout_exists: {curr_workout_exists}")
-
-    if not curr_workout_exists:
-        workout_date = date.today().strftime("%Y-%m-%d")
-        weekday = date.today().strftime("%A")
-        weekday_exercises = get_weekday_exercises(weekday)
-        exercise_ids = [exercise['exercise_id'] for exercise in weekday_exercises]
-        primary_muscle_groups = [exercise['primary_muscle_group'] for exercise in weekday_exercises]
-        secondary_muscle_groups = get_secondary_muscle_groups(exercise_ids)
-        muscle_group_names = list(set(primary_muscle_groups).union(secondary_muscle_groups))
-        
-        exercises = [(exercise['exercise_name'], None, None, exercise['target_sets'], None, exercise['target_reps'], 3, '') for exercise in weekday_exercises]
-        muscle_groups = [(muscle_group, 3, 1, 5, '') for muscle_group in muscle_group_names]
-        overall_workout_data = [(None, "Push", 4, 3, '')]
-
-        exercise_save_data = [(exercise[0], exercise[1], exercise[2], exercise[3], exercise[4], exercise[5], exercise[6], exercise[7]) for exercise in exercises]
-        save_curr_workout_data(workout_date, exercise_save_data, muscle_groups, overall_workout_data)
-
-    curr_workout_dict = get_curr_workout_data()
-    if curr_workout_dict['workout_date'] is None:
-        workout_date = date.today().strftime("%Y-%m-%d")
-    else:
-        workout_date = date.fromisoformat(curr_workout_dict['workout_date'])
-    exercises = curr_workout_dict['exercises']
-    
-    muscle_groups = curr_workout_dict['muscle_groups']
-    overall_workout_data = curr_workout_dict['overall_workout_data']
-    if len(overall_workout_data) == 0:
-        no_overall_workout_data = True
-        overall_workout_data = [(0, "Push", 4, 3, '')]
-        add_overall_workout_to_log(overall_workout_data[0][0], overall_workout_data[0][1], overall_workout_data[0][2], overall_workout_data[0][3])
+    today = date.today()
+    page = load_log_workout_page(g.user_id, today.strftime("%Y-%m-%d"), today.strftime("%A"))
 
-    exercises_in_library = [exercise for exercise in get_exercises_and_muscle_groups() if exercise['name'] not in [e[0] for e in exercises]]
-    muscle_groups_in_db = [muscle_group['muscle_group'] for muscle_group in get_muscle_groups() if muscle_group['muscle_group'] not in [mg[0] for mg in muscle_groups]]
+    if page['workout_date'] is None:
+        workout_date = today.strftime("%Y-%m-%d")
+    else:
+        workout_date = date.fromisoformat(page['workout_date'])
 
     return render_template(
         'log_workout.html',
         workout_date=workout_date,
-        exercises=exercises,
-        muscle_groups=muscle_groups,
-        overall=overall_workout_data,
-        no_overall_workout_data=no_overall_workout_data,
-        exercises_in_library=exercises_in_library,
-        muscle_groups_in_db=muscle_groups_in_db
+        exercises=page['exercises'],
+        muscle_groups=page['muscle_groups'],
+        overall=page['overall'],
+        muscle_groups_in_db=page['muscle_groups_in_db'],
+        curr_workout_version=page['version']
     )
 
+LIVE_ROW_TEMPLATES = {
+    'exercise': ('log_workout_exercise.html', 'exercise'),
+    'muscle_group': ('log_workout_muscle_group.html', 'muscle_group'),
+    'overall': ('log_workout_overall.html', 'workout')
+}
+
+@app.route('/curr_workout/stream')
+def curr_workout_stream():
+    # A reconnecting EventSource sends the id of the last event it received
+    since_version = request.headers.get('Last-Event-ID') or request.args.get('version')
+    try:
+        since_version = int(since_version)
+    except (TypeError, ValueError):
+        since_version = None
+
+    def render_row(kind, row):
+        template_name, row_name = LIVE_ROW_TEMPLATES[kind]
+        return render_template(template_name, **{row_name: row})
+
+    if not live_sync.acquire_stream_slot():
+        return jsonify({"message": "Too many live streams, try again later"}), 503, {'Retry-After': str(live_sync.STREAM_RETRY_SECONDS)}
+
+    response = Response(
+        stream_with_context(live_sync.workout_events(g.user_id, since_version, render_row)),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+    # Runs when the response is closed, whether or not it was ever streamed
+    response.call_on_close(live_sync.release_stream_slot)
+    return response
+
 @app.route('/update_curr_workout_date', methods=['POST'])
 def update_log_workout_date():
+    if enqueue_update('date'):
+        return jsonify({"message": "Workout date update queued"}), 200
     workout_date = request.json.get('workout_date')
-    update_curr_workout_date(workout_date)
+    update_curr_workout_date(g.user_id, workout_date)
     return jsonify({"message": "Workout date updated successfully"}), 200
 
 @app.route('/update_curr_workout_exercise', methods=['POST'])
 def update_log_exercise():
+    if enqueue_update('exercise'):
+        return jsonify({"message": "Exercise update queued"}), 200
     exercise_name = request.json.get('exercise_name')
     weight = request.json.get('weight_used')
     sets = request.json.get('sets_completed')
     reps = request.json.get('reps_completed')
     difficulty = request.json.get('difficulty')
-    print(difficulty)
     note = request.json.get('exercise_notes')
-    update_curr_workout_exercise(exercise_name, weight, sets, reps, difficulty, note)
+    update_curr_workout_exercise(g.user_id, exercise_name, weight, sets, reps, difficulty, note)
     return jsonify({"message": "Exercise updated successfully"}), 200
 
 @app.route('/update_curr_workout_muscle_group', methods=['POST'])
 def update_log_muscle_group():
+    if enqueue_update('muscle_group'):
+        return jsonify({"message": "Muscle group update queued"}), 200
     muscle_group = request.json.get('muscle_group_name')
     pump = request.json.get('pump_level')
     soreness_before_workout = request.json.get('pre_workout_soreness')
     recovery_before_workout = request.json.get('pre_workout_recovery')
     note = request.json.get('muscle_group_notes')
-    update_curr_workout_muscle_group(muscle_group, pump, soreness_before_workout, recovery_before_workout, note)
+    update_curr_workout_muscle_group(g.user_id, muscle_group, pump, soreness_before_workout, recovery_before_workout, note)
     return jsonify({"message": "Muscle group updated successfully"}), 200
 
 @app.route('/update_curr_workout_overall', methods=['POST'])
 def update_log_overall_workout():
+    if enqueue_update('overall'):
+        return jsonify({"message": "Overall workout update queued"}), 200
     workout_id = request.json.get('workout_id')
     duration = request.json.get('workout_duration')
     type = request.json.get('workout_type')
     performance = request.json.get('performance_rating')
     fatigue = request.json.get('fatigue_induced')
     note = request.json.get('workout_notes')
-    update_curr_workout_overall(workout_id, duration, type, performance, fatigue, note)
+    update_curr_workout_overall(g.user_id, workout_id, duration, type, performance, fatigue, note)
     return jsonify({"message": "Overall workout updated successfully"}), 200
 
+@app.route('/update_curr_workout_batch', methods=['POST'])
+def update_log_batch():
+    body = request.get_json(silent=True)
+    patches = body.get('patches', []) if isinstance(body, dict) else None
+    try:
+        validate_curr_workout_patches(patches)
+        if app.config['WRITE_BEHIND']:
+            write_behind.enqueue(g.user_id, patches)
+            return jsonify({"message": f"{len(patches)} updates queued"}), 200
+        apply_curr_workout_patches(g.user_id, patches)
+    except ValueError as e:
+        return jsonify({"message": str(e)}), 400
+    return jsonify({"message": f"{len(patches)} updates applied successfully"}), 200
+
 @app.route('/delete_log_exercise', methods=['POST'])
 def delete_log_exercise():
     exercise_name = request.form.get('exercise_name')
-    print(f"exercise_name: {exercise_name}")
-    delete_curr_workout_exercise(exercise_name)
+    logger.debug(f"Deleting {exercise_name} from the current workout")
+    delete_curr_workout_exercise(g.user_id, exercise_name)
     return redirect(url_for('log_workout'))
 
 @app.route('/delete_log_muscle_group', methods=['POST'])
 def delete_log_muscle_group():
     muscle_group = request.form.get('muscle_group')
-    delete_curr_muscle_group(muscle_group)
+    delete_curr_muscle_group(g.user_id, muscle_group)
     return redirect(url_for('log_workout'))
 
 @app.route('/delete_log_overall_workout', methods=['POST'])
 def delete_log_overall_workout():
     workout_id = request.form.get('workout_id')
-    delete_curr_overall_workout(workout_id)
+    delete_curr_overall_workout(g.user_id, workout_id)
     return redirect(url_for('log_workout'))
 
 @app.route('/clear_current_workout', methods=['POST'])
 def clear_current_workout():
-    delete_curr_workout()
+    delete_curr_workout(g.user_id)
     overall_workout_data = [(0, "Push", 4, 3, '')]
-    add_overall_workout_to_log(overall_workout_data[0][0], overall_workout_data[0][1], overall_workout_data[0][2], overall_workout_data[0][3])
+    add_overall_workout_to_log(g.user_id, overall_workout_data[0][0], overall_workout_data[0][1], overall_workout_data[0][2], overall_workout_data[0][3])
     return redirect(url_for('log_workout'))
 
+@app.route('/finish_workout', methods=['POST'])
+def finish_workout():
+    finish_curr_workout(g.user_id, date.today().strftime("%Y-%m-%d"))
+    return redirect(url_for('logs'))
+
 @app.route('/use_scheduled_workout', methods=['POST'])
 def use_scheduled_workout():
-    delete_curr_workout()
-    print('hello    ')
+    delete_curr_workout(g.user_id)
     return redirect(url_for('log_workout'))
 
+@app.route('/readyz')
+def readyz():
+    # For load balancers and process managers: the schema is current and the
+    # catalog is loaded
+    if not database_ready():
+        return jsonify({"status": "unavailable"}), 503
+    return jsonify({"status": "ready"}), 200
+
+@app.route('/_cache_stats')
+@internal_only
+def catalog_cache_stats():
+    return jsonify({**cache_stats(), 'schedule': schedule_cache_stats()})
+
+@app.route('/_metrics')
+@internal_only
+def prometheus_metrics():
+    stats = cache_stats()
+    extra_counters = {
+        'catalog_cache_hits_total': stats['hits'],
+        'catalog_cache_misses_total': stats['misses']
+    }
+    for stat, count in schedule_cache_stats().items():
+        if stat.endswith(('hits', 'misses')):
+            extra_counters[f'schedule_cache_{stat}_total'] = count
+    return Response(metrics.render_prometheus(extra_counters), mimetype='text/plain; version=0.0.4')
+
+@app.route('/_metrics/slow_queries')
+@internal_only
+def slow_queries():
+    return jsonify(list(metrics.slow_queries))
+
 @app.route('/exercise-library')
+@conditional_page()
 def exercise_library():
     return render_template('exercise_library.html')
 
+@app.route('/api/exercises/search')
+@conditional_page(lambda: ['catalog'])
+def search_exercise_library():
+    query = request.args.get('q', '')
+    offset = request.args.get('offset', 0, type=int)
+    limit = request.args.get('limit', SEARCH_PAGE_SIZE, type=int)
+    return jsonify(search_exercises(query, offset, limit))
+
 @app.route('/logs')
+@conditional_page(lambda: [f'history:{g.user_id}', 'catalog'])
 def logs():
-    return render_template('logs.html')
+    before_date = request.args.get('before_date')
+    before_id = request.args.get('before_id', type=int)
+    if before_date is None or before_id is None:
+        workout_logs = get_workout_logs(g.user_id)
+    else:
+        workout_logs = get_workout_logs(g.user_id, before_date, before_id)
+    return render_template('logs.html', workouts=workout_logs['workouts'], next_page=workout_logs['next_page'])
 
 @app.route('/progress')
+@conditional_page(lambda: [f'history:{g.user_id}', 'catalog'])
 def progress():
-    return render_template('progress.html')
+    catalog = get_progress_catalog(g.user_id)
+    return render_template('progress.html', exercises=catalog['exercises'], muscle_groups=catalog['muscle_groups'])
+
+@app.route('/progress/data')
+def progress_data():
+    period = request.args.get('period', 'week')
+    if period not in ('day', 'week'):
+        return jsonify({"message": "period must be 'day' or 'week'"}), 400
+
+    exercise_id = request.args.get('exercise_id', type=int)
+    muscle_group_id = request.args.get('muscle_group_id', type=int)
+    if exercise_id is not None:
+        return jsonify({"kind": "exercise", "period": period, "progress": get_exercise_progress(g.user_id, exercise_id, period)})
+    if muscle_group_id is not None:
+        return jsonify({"kind": "muscle_group", "period": period, "progress": get_muscle_group_progress(g.user_id, muscle_group_id, period)})
+    return jsonify({"message": "exercise_id or muscle_group_id is required"}), 400
+
+@app.route('/progress/analytics')
+def progress_analytics():
+    exercise_id = request.args.get('exercise_id', type=int)
+    formula = request.args.get('formula', 'epley')
+    if exercise_id is None:
+        return jsonify({"message": "exercise_id is required"}), 400
+    # numpy takes longer to import than the rest of the app together, so it
+    # is only loaded once analytics are asked for
+    from analytics import E1RM_FORMULAS, get_exercise_analytics
+    if formula not in E1RM_FORMULAS:
+        return jsonify({"message": f"formula must be one of {', '.join(sorted(E1RM_FORMULAS))}"}), 400
+    return jsonify(get_exercise_analytics(g.user_id, exercise_id, formula))
+
+@app.route('/progress/recovery')
+def progress_recovery():
+    on_date = request.args.get('date')
+    try:
+        on_date = on_date and date.fromisoformat(on_date).isoformat()
+    except ValueError:
+        return jsonify({"message": "date must be YYYY-MM-DD"}), 400
+    return jsonify({"recovery": get_muscle_group_recovery(g.user_id, on_date)})
+
+@app.route('/export/<export_format>')
+def export(export_format):
+    if export_format not in EXPORT_FORMATS:
+        return jsonify({"message": f"format must be one of {', '.join(sorted(EXPORT_FORMATS))}"}), 404
+
+    start_date = request.args.get('start_date')
+    end_date = request.args.get('end_date')
+    try:
+        start_date = start_date and date.fromisoformat(start_date).isoformat()
+        end_date = end_date and date.fromisoformat(end_date).isoformat()
+    except ValueError:
+        return jsonify({"message": "start_date and end_date must be YYYY-MM-DD"}), 400
+    exercise_ids = request.args.getlist('exercise_id', type=int)
+    compress = request.args.get('gzip') == '1'
+
+    file_name = f'workout_history.{export_format}'
+    mimetype = EXPORT_FORMATS[export_format]
+    if compress:
+        file_name += '.gz'
+        mimetype = 'application/gzip'
+
+    chunks = export_history(g.user_id, export_format, start_date, end_date, exercise_ids, compress)
+    return Response(chunks, mimetype=mimetype, headers={'Content-Disposition': f'attachment; filename={file_name}'})
 
 if __name__ == '__main__':
-    create_tables()
-    if not os.path.exists('weight_training_tracker.db'):
-        load_data_from_folder('baseline_data')
-    app.run(debug=True)
\ No newline at end of file
+    logging.basicConfig(level=os.environ.get('LOG_LEVEL', 'INFO'))
+    create_app().run(debug=True)
\ No newline at end of file
@@ -0,0 +1,84 @@
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from analytics import analyze_history
+
+def synthetic_history(num_sets, seed=0):
+    rng = np.random.default_rng(seed)
+    # Roughly five sets a day, in date order like load_exercise_history returns
+    day_offsets = np.sort(rng.integers(0, max(num_sets // 5, 1), num_sets))
+    return {
+        'dates': np.datetime64('2000-01-01') + day_offsets.astype('timedelta64[D]'),
+        'weight': rng.uniform(20, 200, num_sets).round(1),
+        'sets': rng.integers(1, 6, num_sets),
+        'reps': rng.integers(1, 15, num_sets)
+    }
+
+def naive_analyze_history(history, volume_window_days=7, average_window=4):
+    days = []
+    volume = []
+    e1rm = []
+    for date, weight, sets, reps in zip(history['dates'].tolist(), history['weight'].tolist(), history['sets'].tolist(), history['reps'].tolist()):
+        estimate = weight if reps == 1 else weight * (1 + reps / 30.0)
+        if days and days[-1] == date:
+            volume[-1] += weight * sets * reps
+            e1rm[-1] = max(e1rm[-1], estimate)
+        else:
+            days.append(date)
+            volume.append(weight * sets * reps)
+            e1rm.append(estimate)
+
+    rolling = []
+    start = 0
+    window_total = 0.0
+    for i, day in enumerate(days):
+        window_total += volume[i]
+        while (day - days[start]).days >= volume_window_days:
+            window_total -= volume[start]
+            start += 1
+        rolling.append(window_total)
+
+    averages = []
+    is_pr = []
+    best = float('-inf')
+    for i, value in enumerate(e1rm):
+        window = e1rm[max(0, i - average_window + 1):i + 1]
+        averages.append(sum(window) / len(window))
+        is_pr.append(value > best)
+        best = max(best, value)
+
+    return {'days': days, 'volume': volume, 'rolling_volume': rolling, 'e1rm': e1rm, 'e1rm_moving_average': averages, 'is_pr': is_pr}
+
+def best_of(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Compare the vectorized analytics against a plain row loop')
+    parser.add_argument('--sets', type=int, default=1_000_000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    history = synthetic_history(args.sets)
+
+    vectorized_time, vectorized = best_of(lambda: analyze_history(history), args.repeat)
+    naive_time, naive = best_of(lambda: naive_analyze_history(history), args.repeat)
+
+    for key in ('volume', 'rolling_volume', 'e1rm', 'e1rm_moving_average'):
+        assert np.allclose(vectorized[key], naive[key]), key
+    assert vectorized['is_pr'].tolist() == naive['is_pr']
+
+    print(f"{args.sets:,} sets over {len(naive['days']):,} days")
+    print(f"vectorized: {vectorized_time * 1000:8.1f} ms  {args.sets / vectorized_time:14,.0f} sets/s")
+    print(f"row loop:   {naive_time * 1000:8.1f} ms  {args.sets / naive_time:14,.0f} sets/s")
+    print(f"speedup:    {naive_time / vectorized_time:8.1f}x")
@@ -0,0 +1,82 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Runs in a fresh interpreter, like a worker started from zero, and times
+# each step up to the first response of every page
+CHILD = '''
+import json
+import sys
+import time
+
+start = time.perf_counter()
+timings = {}
+
+def lap(name):
+    global start
+    now = time.perf_counter()
+    timings[name] = (now - start) * 1000
+    start = now
+
+sys.path.insert(0, sys.argv[1])
+import app as app_module
+lap('import app')
+app_module.create_app()
+lap('create_app')
+client = app_module.app.test_client()
+for path in ('/schedule', '/log-workout', '/exercise-library', '/logs', '/progress'):
+    assert client.get(path).status_code == 200, path
+    lap('first ' + path)
+timings['numpy imported'] = 'numpy' in sys.modules
+print(json.dumps(timings))
+'''
+
+def run_child(data_dir, template_cache_dir):
+    env = dict(os.environ, TEMPLATE_CACHE_DIR=template_cache_dir, SECRET_KEY='bench')
+    output = subprocess.run(
+        [sys.executable, '-c', CHILD, ROOT], cwd=data_dir, env=env, capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output.splitlines()[-1])
+
+def precompile_templates(template_cache_dir):
+    env = dict(os.environ, TEMPLATE_CACHE_DIR=template_cache_dir)
+    subprocess.run(
+        [sys.executable, '-m', 'flask', '--app', 'app', 'precompile-templates'], cwd=ROOT, env=env, capture_output=True, check=True
+    )
+
+def summarize(runs):
+    return {name: statistics.median(run[name] for run in runs) for name in runs[0] if name != 'numpy imported'}
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Time process startup up to the first response of each page')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as data_dir:
+        # The very first start creates the schema and loads the seed data
+        first = run_child(data_dir, tempfile.mkdtemp(dir=data_dir))
+
+        cold_runs = [run_child(data_dir, tempfile.mkdtemp(dir=data_dir)) for _ in range(args.repeat)]
+
+        template_cache_dir = tempfile.mkdtemp(dir=data_dir)
+        precompile_templates(template_cache_dir)
+        warm_runs = [run_child(data_dir, template_cache_dir) for _ in range(args.repeat)]
+
+    scenarios = [
+        ('first start', {name: value for name, value in first.items() if name != 'numpy imported'}),
+        ('cold templates', summarize(cold_runs)),
+        ('precompiled', summarize(warm_runs))
+    ]
+
+    print(f"median of {args.repeat} fresh processes, ms")
+    print(f"{'step':28}" + ''.join(f"{name:>16}" for name, _ in scenarios))
+    for step in scenarios[0][1]:
+        print(f"{step:28}" + ''.join(f"{timings[step]:16.1f}" for _, timings in scenarios))
+    print(f"{'total':28}" + ''.join(f"{sum(timings.values()):16.1f}" for _, timings in scenarios))
+    print(f"numpy imported at startup: {any(run['numpy imported'] for run in cold_runs + warm_runs)}")
@@ -0,0 +1,193 @@
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from synthetic_db import build_synthetic_db
+
+import app as app_module
+import catalog_cache
+import database
+import exercise_search
+import log_workouts
+import schedule_cache
+import weekly_schedule
+
+TODAY = date.today().strftime('%Y-%m-%d')
+WEEKDAY = date.today().strftime('%A')
+
+USER_ID = 1
+
+def seed_workout():
+    log_workouts.delete_curr_workout(USER_ID)
+    log_workouts.load_log_workout_page(USER_ID, TODAY, 'Monday')
+
+EXERCISE_PATCH = {
+    'type': 'exercise', 'exercise_name': 'squat', 'weight_used': '100', 'sets_completed': '4',
+    'reps_completed': '10', 'difficulty': 3, 'exercise_notes': ''
+}
+
+# (name, setup, function); setup runs untimed before every call
+MICRO_BENCHMARKS = [
+    ('database.get_exercises_and_muscle_groups', None, database.get_exercises_and_muscle_groups),
+    ('database.get_muscle_groups', None, database.get_muscle_groups),
+    ('database.create_tables', None, database.create_tables),
+    ('catalog_cache.get_muscle_groups', None, catalog_cache.get_muscle_groups),
+    ('exercise_search.search_exercises', None, lambda: exercise_search.search_exercises('bench pres')),
+    ('log_workouts.read_curr_workout_data', seed_workout, lambda: log_workouts.read_curr_workout_data(database.connect_db().cursor(), USER_ID)),
+    ('log_workouts.load_log_workout_page (seeding)', lambda: log_workouts.delete_curr_workout(USER_ID), lambda: log_workouts.load_log_workout_page(USER_ID, TODAY, 'Monday')),
+    ('log_workouts.load_log_workout_page (existing)', None, lambda: log_workouts.load_log_workout_page(USER_ID, TODAY, 'Monday')),
+    ('log_workouts.update_curr_workout_date', None, lambda: log_workouts.update_curr_workout_date(USER_ID, TODAY)),
+    ('log_workouts.update_curr_workout_exercise', None, lambda: log_workouts.update_curr_workout_exercise(USER_ID, 'squat', 100, 4, 10, 3, '')),
+    ('log_workouts.update_curr_workout_muscle_group', None, lambda: log_workouts.update_curr_workout_muscle_group(USER_ID, 'glutes', 3, 1, 5, '')),
+    ('log_workouts.update_curr_workout_overall', None, lambda: log_workouts.update_curr_workout_overall(USER_ID, 1, 60, 'legs', 3, 3, '')),
+    ('log_workouts.apply_curr_workout_patches (10)', None, lambda: log_workouts.apply_curr_workout_patches(USER_ID, [EXERCISE_PATCH] * 10)),
+    ('log_workouts.bulk_add_exercises_to_log (20)', seed_workout, lambda: log_workouts.bulk_add_exercises_to_log(USER_ID, [(i, '', '3', '10') for i in range(6, 26)])),
+    ('log_workouts.add_muscle_group_to_log', lambda: log_workouts.delete_curr_muscle_group(USER_ID, 'biceps'), lambda: log_workouts.add_muscle_group_to_log(USER_ID, 'biceps', 3, 1, 5)),
+    ('log_workouts.delete_curr_workout_exercise', seed_workout, lambda: log_workouts.delete_curr_workout_exercise(USER_ID, 'squat')),
+    ('log_workouts.finish_curr_workout', seed_workout, lambda: log_workouts.finish_curr_workout(USER_ID, TODAY)),
+    ('weekly_schedule.get_planned_workouts', None, lambda: weekly_schedule.get_planned_workouts(USER_ID)),
+    ('schedule_cache.get_schedule', None, lambda: schedule_cache.get_schedule(USER_ID)),
+    ('weekly_schedule.bulk_add_exercises_from_library (20)', None, lambda: weekly_schedule.bulk_add_exercises_from_library(USER_ID, 'Sunday', [(i, '3', '10') for i in range(1, 21)])),
+    ('weekly_schedule.delete_exercise_from_schedule', lambda: weekly_schedule.bulk_add_exercises_from_library(USER_ID, 'Sunday', [(1, '3', '10')]), lambda: weekly_schedule.delete_exercise_from_schedule(USER_ID, 1, 'Sunday')),
+]
+
+ROUTES = [
+    ('GET /log-workout', lambda client: client.get('/log-workout')),
+    ('GET /schedule', lambda client: client.get('/schedule')),
+    ('GET /logs', lambda client: client.get('/logs')),
+    ('GET /api/exercises/search', lambda client: client.get('/api/exercises/search?q=squat')),
+    ('POST /update_curr_workout_exercise', lambda client: client.post('/update_curr_workout_exercise', json={k: v for k, v in EXERCISE_PATCH.items() if k != 'type'})),
+    ('POST /update_curr_workout_muscle_group', lambda client: client.post('/update_curr_workout_muscle_group', json={'muscle_group_name': 'glutes', 'pump_level': 3, 'pre_workout_soreness': 1, 'pre_workout_recovery': 5, 'muscle_group_notes': ''})),
+    ('POST /update_curr_workout_overall', lambda client: client.post('/update_curr_workout_overall', json={'workout_id': 1, 'workout_duration': 60, 'workout_type': 'legs', 'performance_rating': 3, 'fatigue_induced': 3, 'workout_notes': ''})),
+    ('POST /update_curr_workout_date', lambda client: client.post('/update_curr_workout_date', json={'workout_date': TODAY})),
+    ('POST /update_curr_workout_batch (10)', lambda client: client.post('/update_curr_workout_batch', json={'patches': [EXERCISE_PATCH] * 10})),
+]
+
+def summarize(timings, wall_time):
+    timings = sorted(timings)
+    def percentile(p):
+        return timings[min(len(timings) - 1, int(len(timings) * p))] * 1000
+    return {
+        'ops_per_sec': round(len(timings) / wall_time, 1),
+        'p50_ms': round(percentile(0.50), 3),
+        'p95_ms': round(percentile(0.95), 3),
+        'p99_ms': round(percentile(0.99), 3),
+        'mean_ms': round(statistics.fmean(timings) * 1000, 3)
+    }
+
+def run_micro_benchmarks(iterations):
+    results = {}
+    for name, setup, func in MICRO_BENCHMARKS:
+        timings = []
+        for _ in range(iterations):
+            if setup:
+                setup()
+            start = time.perf_counter()
+            func()
+            timings.append(time.perf_counter() - start)
+        results[name] = summarize(timings, sum(timings))
+    return results
+
+def run_route_benchmarks(requests_per_route, concurrency, users):
+    results = {}
+    app_module.app.config['TESTING'] = True
+    app_module.app.config['USER_SWITCHING'] = True
+
+    # Each client logs in as one of the synthetic lifters, so with --users
+    # above 1 the clients work on separate current workouts
+    clients = []
+    for i in range(concurrency):
+        client = app_module.app.test_client()
+        client.post('/switch_user', data={'user_name': 'default' if i % users == 0 else f'lifter {i % users + 1}'})
+        client.get('/log-workout')
+        clients.append(client)
+
+    for name, send in ROUTES:
+        timings = []
+        timings_lock = threading.Lock()
+        failures = []
+
+        def worker(client, count):
+            local = []
+            for _ in range(count):
+                start = time.perf_counter()
+                response = send(client)
+                local.append(time.perf_counter() - start)
+                if response.status_code >= 400:
+                    failures.append(response.status_code)
+            with timings_lock:
+                timings.extend(local)
+
+        per_worker = max(requests_per_route // concurrency, 1)
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            list(pool.map(worker, clients, [per_worker] * concurrency))
+        results[name] = summarize(timings, time.perf_counter() - start)
+        results[name]['errors'] = len(failures)
+    return results
+
+def compare(results, baseline, tolerance):
+    regressions = []
+    for section in ('micro', 'routes'):
+        for name, current in results[section].items():
+            previous = baseline.get(section, {}).get(name)
+            if previous and current['p50_ms'] > previous['p50_ms'] * (1 + tolerance):
+                regressions.append(f"{section}: {name} p50 {previous['p50_ms']}ms -> {current['p50_ms']}ms")
+    return regressions
+
+def print_results(title, results):
+    print(f"\n{title}")
+    print(f"{'':<56}{'ops/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for name, result in results.items():
+        print(f"{name:<56}{result['ops_per_sec']:>10}{result['p50_ms']:>10}{result['p95_ms']:>10}{result['p99_ms']:>10}")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark the data-access layer and main routes against a synthetic database')
+    parser.add_argument('--years', type=int, default=2, help='years of synthetic history')
+    parser.add_argument('--catalog-size', type=int, default=100, help='number of exercises in the catalog')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--iterations', type=int, default=200, help='calls per micro-benchmark')
+    parser.add_argument('--requests', type=int, default=400, help='requests per route')
+    parser.add_argument('--concurrency', type=int, default=4, help='concurrent clients per route')
+    parser.add_argument('--users', type=int, default=1, help='lifters in the synthetic database, shared out among the clients')
+    parser.add_argument('--save', help='write the results as a JSON baseline')
+    parser.add_argument('--compare', help='JSON baseline to check for regressions')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed p50 slowdown before flagging a regression')
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix='wtt-bench-')
+    os.chdir(work_dir)
+    sets_written = build_synthetic_db(os.path.join(work_dir, 'weight_training_tracker.db'), args.years, args.catalog_size, args.seed, args.users)
+    print(f"Synthetic database: {args.years} years, {args.users} users, {args.catalog_size} exercises, {sets_written:,} logged sets")
+
+    results = {
+        'config': vars(args),
+        'micro': run_micro_benchmarks(args.iterations),
+        'routes': run_route_benchmarks(args.requests, args.concurrency, args.users)
+    }
+    print_results('Data access', results['micro'])
+    print_results(f"Routes ({args.concurrency} concurrent clients)", results['routes'])
+
+    if args.save:
+        with open(args.save, 'w') as file:
+            json.dump(results, file, indent=2)
+        print(f"\nSaved baseline to {args.save}")
+
+    if args.compare:
+        with open(args.compare) as file:
+            regressions = compare(results, json.load(file), args.tolerance)
+        if regressions:
+            print('\nRegressions:')
+            for regression in regressions:
+                print(f"  {regression}")
+            sys.exit(1)
+        print('\nNo regressions against the baseline')
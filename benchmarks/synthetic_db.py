@@ -0,0 +1,47 @@
+from datetime import date, timedelta
+import os
+import sys
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_DIR)
+
+import database
+from database import connect_db, create_tables, load_data_from_folder
+from generate_history import generate_history, write_history_to_database
+from progress import rebuild_progress_rollups
+from recommendations import rebuild_recommendations
+from recovery import rebuild_muscle_group_fatigue
+
+def add_catalog_exercises(cursor, catalog_size):
+    # Pads the baseline catalog with variants of its exercises
+    cursor.execute('SELECT name, exercise_type, primary_muscle_group_id FROM exercises ORDER BY id')
+    baseline = cursor.fetchall()
+    extra = catalog_size - len(baseline)
+    if extra <= 0:
+        return
+    cursor.executemany('''
+        INSERT INTO exercises (name, exercise_type, primary_muscle_group_id)
+        VALUES (?, ?, ?)
+    ''', [(f"{baseline[i % len(baseline)][0]} variation {i // len(baseline) + 1}", *baseline[i % len(baseline)][1:]) for i in range(extra)])
+
+def build_synthetic_db(path, years=2, catalog_size=100, seed=0, lifters=1):
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+    database.DATABASE = path
+
+    create_tables()
+    load_data_from_folder(os.path.join(REPO_DIR, 'baseline_data'))
+
+    conn = connect_db()
+    cursor = conn.cursor()
+    with conn:
+        add_catalog_exercises(cursor, catalog_size)
+        database.bump_data_version(cursor, 'catalog')
+    history = generate_history(date.today() - timedelta(days=365 * years), 365 * years, seed, lifters, os.path.join(REPO_DIR, 'baseline_data'))
+    rows_written = write_history_to_database(history)
+    rebuild_progress_rollups()
+    rebuild_recommendations()
+    rebuild_muscle_group_fatigue()
+
+    return rows_written['workout_exercises']
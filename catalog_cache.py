@@ -0,0 +1,50 @@
+import threading
+
+from flask import g, has_app_context
+
+import database
+from database import connect_db, get_data_version
+
+# Entries are stamped with the catalog version they were loaded at. Any
+# process that writes to the catalog bumps the version in data_versions,
+# so stale entries are reloaded on the next read in every worker. Checking
+# the version is still a query, but only one per request: the catalog is
+# only written by imports, never while a request is being served.
+_entries = {}
+_lock = threading.Lock()
+_stats = {'hits': 0, 'misses': 0}
+
+def catalog_version(cursor):
+    if not has_app_context():
+        return get_data_version(cursor, 'catalog')
+    if 'catalog_version' not in g:
+        g.catalog_version = get_data_version(cursor, 'catalog')
+    return g.catalog_version
+
+def cached_catalog(key, loader):
+    conn = connect_db()
+    cursor = conn.cursor()
+
+    # Read the version before loading: if the catalog changes in between,
+    # the entry is simply reloaded next time rather than served stale
+    version = catalog_version(cursor)
+    entry = _entries.get(key)
+    if entry is not None and entry[0] == version:
+        with _lock:
+            _stats['hits'] += 1
+        return entry[1]
+
+    value = loader()
+    _entries[key] = (version, value)
+    with _lock:
+        _stats['misses'] += 1
+    return value
+
+def cache_stats():
+    with _lock:
+        stats = dict(_stats)
+    stats['entries'] = len(_entries)
+    return stats
+
+def get_muscle_groups():
+    return cached_catalog('muscle_groups', database.get_muscle_groups)
@@ -1,14 +1,113 @@
 import sqlite3
 import csv
+import functools
 import os
+import random
+import threading
+import time
+
+import logging
+
+import metrics
+from metrics import InstrumentedConnection
+
+try:
+    import fcntl
+except ImportError:
+    # Without flock (Windows) initialization is not serialized, so run a
+    # single process there
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+DATABASE = 'weight_training_tracker.db'
+
+BUSY_TIMEOUT_MS = 10000
+BUSY_RETRIES = 5
+BUSY_RETRY_DELAY_SECONDS = 0.05
+# Primary result codes; extended codes such as SQLITE_BUSY_SNAPSHOT share
+# them in their low byte
+SQLITE_BUSY = 5
+SQLITE_LOCKED = 6
+
+# Applied once when a connection is opened, not on every helper call
+PRAGMAS = (
+    f'PRAGMA busy_timeout = {BUSY_TIMEOUT_MS}',
+    'PRAGMA synchronous = NORMAL',
+    'PRAGMA cache_size = -16000',
+    'PRAGMA mmap_size = 134217728',
+    'PRAGMA temp_store = MEMORY',
+)
+# Stored in the database file, so create_tables() sets it once instead of
+# every connection taking a lock to set it again
+JOURNAL_MODE = 'PRAGMA journal_mode = WAL'
+
+_thread_local = threading.local()
+
+def open_connection(database=None):
+    conn = sqlite3.connect(database or DATABASE, factory=InstrumentedConnection)
+    for pragma in PRAGMAS:
+        conn.execute(pragma)
+    return conn
 
 def connect_db():
-    return sqlite3.connect('weight_training_tracker.db')
+    # Each thread keeps a single connection open for its lifetime, across
+    # requests as well as in scripts, so the pragmas run once per thread.
+    # The connection is closed when its thread exits.
+    conn = getattr(_thread_local, 'conn', None)
+    if conn is None:
+        conn = _thread_local.conn = open_connection()
+    return conn
+
+def is_busy_error(error):
+    code = getattr(error, 'sqlite_errorcode', None)
+    if code is None:
+        return 'locked' in str(error) or 'busy' in str(error)
+    return code & 0xff in (SQLITE_BUSY, SQLITE_LOCKED)
+
+def retry_on_busy(write):
+    # busy_timeout makes writers wait for each other, but a transaction that
+    # read before writing fails with SQLITE_BUSY at once if another process
+    # committed in between, since it would write over a stale snapshot.
+    # Write helpers open and commit their own transaction, so they are
+    # rolled back and run again from the start.
+    @functools.wraps(write)
+    def wrapper(*args, **kwargs):
+        for attempt in range(BUSY_RETRIES):
+            try:
+                return write(*args, **kwargs)
+            except sqlite3.OperationalError as e:
+                if not is_busy_error(e) or attempt == BUSY_RETRIES - 1:
+                    raise
+                conn = connect_db()
+                if conn.in_transaction:
+                    conn.rollback()
+                metrics.increment('sqlite_busy_retries_total', {'function': write.__name__})
+                time.sleep(BUSY_RETRY_DELAY_SECONDS * 2 ** attempt * random.uniform(0.5, 1.5))
+    return wrapper
+
+def close_db(exception=None):
+    # Registered as an app teardown. The connection outlives the request, so
+    # only a transaction the request left open is rolled back.
+    conn = getattr(_thread_local, 'conn', None)
+    if conn is not None and conn.in_transaction:
+        conn.rollback()
+
+def schema_is_current(cursor):
+    cursor.execute('PRAGMA user_version')
+    return cursor.fetchone()[0] == len(MIGRATIONS)
 
 def create_tables():
     conn = connect_db()
     cursor = conn.cursor()
 
+    cursor.execute(JOURNAL_MODE)
+
+    # A database that has run every migration already has every table, so
+    # a warm start reads one pragma instead of running the DDL
+    if schema_is_current(cursor):
+        return
+
     cursor.executescript('''
     CREATE TABLE IF NOT EXISTS exercises (
         id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -115,36 +214,414 @@ def create_tables():
     );
     ''')
 
-    # Commit and close the connection
     conn.commit()
-    conn.close()
 
-    print("Database and tables created successfully!")
+    migrate(conn)
+
+    logger.info("Database and tables created successfully!")
+
+# Each entry moves the schema up one PRAGMA user_version. Existing databases
+# only run the entries past their current version, so append new migrations
+# to the end and never edit one that has already shipped.
+MIGRATIONS = [
+    '''
+    DELETE FROM weekly_schedule
+    WHERE id NOT IN (
+        SELECT MIN(id)
+        FROM weekly_schedule
+        GROUP BY weekday_int, exercise_id
+    );
+    CREATE UNIQUE INDEX IF NOT EXISTS idx_weekly_schedule_weekday_exercise
+        ON weekly_schedule (weekday_int, exercise_id);
+
+    CREATE UNIQUE INDEX IF NOT EXISTS idx_muscle_groups_muscle_group
+        ON muscle_groups (muscle_group);
+    CREATE INDEX IF NOT EXISTS idx_exercises_name
+        ON exercises (name);
+    CREATE INDEX IF NOT EXISTS idx_exercise_secondary_muscle_groups_exercise
+        ON exercise_secondary_muscle_groups (exercise_id, secondary_muscle_group_id);
+
+    DELETE FROM current_workout_exercises
+    WHERE rowid NOT IN (
+        SELECT MIN(rowid)
+        FROM current_workout_exercises
+        GROUP BY exercise_name
+    );
+    CREATE UNIQUE INDEX IF NOT EXISTS idx_current_workout_exercises_exercise_name
+        ON current_workout_exercises (exercise_name);
+
+    DELETE FROM current_workout_muscle_groups
+    WHERE rowid NOT IN (
+        SELECT MIN(rowid)
+        FROM current_workout_muscle_groups
+        GROUP BY muscle_group
+    );
+    CREATE UNIQUE INDEX IF NOT EXISTS idx_current_workout_muscle_groups_muscle_group
+        ON current_workout_muscle_groups (muscle_group);
 
-def load_data_from_folder(folder_path):
+    ALTER TABLE workout_exercises ADD COLUMN workout_id INTEGER REFERENCES workout(id);
+    CREATE INDEX IF NOT EXISTS idx_workout_exercises_workout
+        ON workout_exercises (workout_id);
+    CREATE INDEX IF NOT EXISTS idx_workout_exercises_exercise
+        ON workout_exercises (exercise_id);
+    CREATE INDEX IF NOT EXISTS idx_muscle_groups_worked_workout
+        ON muscle_groups_worked (workout_id);
+    CREATE INDEX IF NOT EXISTS idx_workout_date
+        ON workout (date, id);
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS exercise_progress (
+        exercise_id INTEGER NOT NULL,
+        period TEXT NOT NULL CHECK(period IN ('day', 'week')),
+        period_start TEXT NOT NULL,
+        volume REAL NOT NULL,
+        best_e1rm REAL NOT NULL,
+        best_weight REAL NOT NULL,
+        best_reps INTEGER NOT NULL,
+        sessions INTEGER NOT NULL,
+        PRIMARY KEY (exercise_id, period, period_start),
+        FOREIGN KEY (exercise_id) REFERENCES exercises(id)
+    ) WITHOUT ROWID;
+
+    CREATE TABLE IF NOT EXISTS muscle_group_progress (
+        muscle_group_id INTEGER NOT NULL,
+        period TEXT NOT NULL CHECK(period IN ('day', 'week')),
+        period_start TEXT NOT NULL,
+        volume REAL NOT NULL,
+        sets INTEGER NOT NULL,
+        sessions INTEGER NOT NULL,
+        PRIMARY KEY (muscle_group_id, period, period_start),
+        FOREIGN KEY (muscle_group_id) REFERENCES muscle_groups(id)
+    ) WITHOUT ROWID;
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS data_versions (
+        name TEXT PRIMARY KEY,
+        version INTEGER NOT NULL
+    ) WITHOUT ROWID;
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS users (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT NOT NULL UNIQUE
+    );
+    INSERT OR IGNORE INTO users (id, name)
+    VALUES (1, 'default');
+
+    ALTER TABLE current_workout_date ADD COLUMN user_id INTEGER NOT NULL DEFAULT 1;
+    ALTER TABLE current_workout_exercises ADD COLUMN user_id INTEGER NOT NULL DEFAULT 1;
+    ALTER TABLE current_workout_muscle_groups ADD COLUMN user_id INTEGER NOT NULL DEFAULT 1;
+    ALTER TABLE current_workout_overall ADD COLUMN user_id INTEGER NOT NULL DEFAULT 1;
+    ALTER TABLE weekly_schedule ADD COLUMN user_id INTEGER NOT NULL DEFAULT 1;
+    ALTER TABLE workout ADD COLUMN user_id INTEGER NOT NULL DEFAULT 1;
+
+    DELETE FROM current_workout_date
+    WHERE rowid NOT IN (
+        SELECT MIN(rowid)
+        FROM current_workout_date
+        GROUP BY user_id
+    );
+    CREATE UNIQUE INDEX IF NOT EXISTS idx_current_workout_date_user
+        ON current_workout_date (user_id);
+
+    DROP INDEX IF EXISTS idx_current_workout_exercises_exercise_name;
+    CREATE UNIQUE INDEX IF NOT EXISTS idx_current_workout_exercises_user_exercise_name
+        ON current_workout_exercises (user_id, exercise_name);
+
+    DROP INDEX IF EXISTS idx_current_workout_muscle_groups_muscle_group;
+    CREATE UNIQUE INDEX IF NOT EXISTS idx_current_workout_muscle_groups_user_muscle_group
+        ON current_workout_muscle_groups (user_id, muscle_group);
+
+    CREATE INDEX IF NOT EXISTS idx_current_workout_overall_user
+        ON current_workout_overall (user_id, workout_id);
+
+    DROP INDEX IF EXISTS idx_weekly_schedule_weekday_exercise;
+    CREATE UNIQUE INDEX IF NOT EXISTS idx_weekly_schedule_user_weekday_exercise
+        ON weekly_schedule (user_id, weekday_int, exercise_id);
+
+    DROP INDEX IF EXISTS idx_workout_date;
+    CREATE INDEX IF NOT EXISTS idx_workout_user_date
+        ON workout (user_id, date, id);
+
+    ALTER TABLE exercise_progress RENAME TO exercise_progress_old;
+    CREATE TABLE exercise_progress (
+        user_id INTEGER NOT NULL,
+        exercise_id INTEGER NOT NULL,
+        period TEXT NOT NULL CHECK(period IN ('day', 'week')),
+        period_start TEXT NOT NULL,
+        volume REAL NOT NULL,
+        best_e1rm REAL NOT NULL,
+        best_weight REAL NOT NULL,
+        best_reps INTEGER NOT NULL,
+        sessions INTEGER NOT NULL,
+        PRIMARY KEY (user_id, exercise_id, period, period_start),
+        FOREIGN KEY (user_id) REFERENCES users(id),
+        FOREIGN KEY (exercise_id) REFERENCES exercises(id)
+    ) WITHOUT ROWID;
+    INSERT INTO exercise_progress (user_id, exercise_id, period, period_start, volume, best_e1rm, best_weight, best_reps, sessions)
+    SELECT 1, exercise_id, period, period_start, volume, best_e1rm, best_weight, best_reps, sessions
+    FROM exercise_progress_old;
+    DROP TABLE exercise_progress_old;
+
+    ALTER TABLE muscle_group_progress RENAME TO muscle_group_progress_old;
+    CREATE TABLE muscle_group_progress (
+        user_id INTEGER NOT NULL,
+        muscle_group_id INTEGER NOT NULL,
+        period TEXT NOT NULL CHECK(period IN ('day', 'week')),
+        period_start TEXT NOT NULL,
+        volume REAL NOT NULL,
+        sets INTEGER NOT NULL,
+        sessions INTEGER NOT NULL,
+        PRIMARY KEY (user_id, muscle_group_id, period, period_start),
+        FOREIGN KEY (user_id) REFERENCES users(id),
+        FOREIGN KEY (muscle_group_id) REFERENCES muscle_groups(id)
+    ) WITHOUT ROWID;
+    INSERT INTO muscle_group_progress (user_id, muscle_group_id, period, period_start, volume, sets, sessions)
+    SELECT 1, muscle_group_id, period, period_start, volume, sets, sessions
+    FROM muscle_group_progress_old;
+    DROP TABLE muscle_group_progress_old;
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS exercise_recommendations (
+        user_id INTEGER NOT NULL,
+        exercise_id INTEGER NOT NULL,
+        recent_sessions TEXT NOT NULL,
+        weight_trend REAL NOT NULL,
+        weight REAL,
+        sets INTEGER NOT NULL,
+        reps INTEGER NOT NULL,
+        PRIMARY KEY (user_id, exercise_id),
+        FOREIGN KEY (user_id) REFERENCES users(id),
+        FOREIGN KEY (exercise_id) REFERENCES exercises(id)
+    ) WITHOUT ROWID;
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS muscle_group_fatigue (
+        user_id INTEGER NOT NULL,
+        muscle_group_id INTEGER NOT NULL,
+        fatigue REAL NOT NULL,
+        updated_on TEXT NOT NULL,
+        PRIMARY KEY (user_id, muscle_group_id),
+        FOREIGN KEY (user_id) REFERENCES users(id),
+        FOREIGN KEY (muscle_group_id) REFERENCES muscle_groups(id)
+    ) WITHOUT ROWID;
+    ''',
+]
+
+# Catalog tables are reference data cached in-process by catalog_cache.py
+CATALOG_TABLES = ('muscle_groups', 'exercises', 'exercise_secondary_muscle_groups')
+
+def get_data_version(cursor, name):
+    cursor.execute('''
+        SELECT version FROM data_versions
+        WHERE name = ?
+    ''', (name,))
+    result = cursor.fetchone()
+    return result[0] if result else 0
+
+def get_data_versions(cursor, names):
+    cursor.execute(f'''
+        SELECT name, version FROM data_versions
+        WHERE name IN ({', '.join(['?'] * len(names))})
+    ''', names)
+    versions = dict(cursor.fetchall())
+    return [versions.get(name, 0) for name in names]
+
+def bump_data_version(cursor, name):
+    # Every process compares against the stored version, so bumping it here
+    # invalidates cached copies in all workers, not just this one
+    cursor.execute('''
+        INSERT INTO data_versions (name, version)
+        VALUES (?, 1)
+        ON CONFLICT (name) DO UPDATE
+        SET version = version + 1
+    ''', (name,))
+
+def bump_user_data_versions(cursor, table_name, prefix):
+    # Bumps prefix + user_id for every user with rows in table_name, using
+    # the same keys as weekly_schedule.bump_schedule_version and
+    # log_workouts.bump_history_version
+    cursor.execute(f'''
+        INSERT INTO data_versions (name, version)
+        SELECT DISTINCT '{prefix}' || user_id, 1
+        FROM {table_name}
+        WHERE true
+        ON CONFLICT (name) DO UPDATE
+        SET version = version + 1
+    ''')
+
+def migrate(conn):
+    cursor = conn.cursor()
+
+    cursor.execute('PRAGMA user_version')
+    current_version = cursor.fetchone()[0]
+
+    for version, script in enumerate(MIGRATIONS[current_version:], start=current_version + 1):
+        try:
+            cursor.executescript(f'''
+                BEGIN;
+                {script}
+                PRAGMA user_version = {version};
+                COMMIT;
+            ''')
+        except sqlite3.Error:
+            if conn.in_transaction:
+                conn.rollback()
+            raise
+        logger.info(f"Database migrated to version {version}")
+
+# Parents are loaded before the tables that reference them
+TABLE_LOAD_ORDER = [
+    'users',
+    'muscle_groups',
+    'exercises',
+    'exercise_secondary_muscle_groups',
+    'weekly_schedule',
+    'notes',
+    'workout',
+    'workout_exercises',
+    'muscle_groups_worked',
+]
+
+IMPORT_CHUNK_SIZE = 5000
+
+# Columns a row is no use without besides the schema's NOT NULL ones;
+# weekly_schedule.csv lists a rest day as a weekday with no exercise
+REQUIRED_IMPORT_COLUMNS = {
+    'weekly_schedule': {'exercise_id'}
+}
+
+def column_converter(declared_type):
+    # Mirrors SQLite's type affinity rules for the declared column type
+    declared_type = declared_type.upper()
+
+    if 'INT' in declared_type:
+        return int
+    if 'CHAR' in declared_type or 'CLOB' in declared_type or 'TEXT' in declared_type:
+        return str
+    if 'REAL' in declared_type or 'FLOA' in declared_type or 'DOUB' in declared_type:
+        return float
+
+    def to_numeric(value):
+        try:
+            return int(value)
+        except ValueError:
+            try:
+                return float(value)
+            except ValueError:
+                return value
+    return to_numeric
+
+def load_csv(cursor, table_name, file_path, chunk_size=IMPORT_CHUNK_SIZE, progress=None):
+    cursor.execute(f'PRAGMA table_info({table_name})')
+    columns = cursor.fetchall()
+    column_types = {row[1]: row[2] for row in columns}
+    # NOT NULL columns with no default and that aren't the rowid
+    required_columns = {row[1] for row in columns if row[3] and row[4] is None and not row[5]}
+    required_columns |= REQUIRED_IMPORT_COLUMNS.get(table_name, set())
+
+    with open(file_path, 'r', newline='') as file:
+        reader = csv.reader(file)
+        fields = next(reader)
+        converters = [column_converter(column_types.get(field, '')) for field in fields]
+        required_indexes = [i for i, field in enumerate(fields) if field in required_columns]
+
+        placeholders = ', '.join(['?'] * len(fields))
+        insert_query = f'INSERT INTO {table_name} ({",".join(fields)}) VALUES ({placeholders})'
+
+        rows_loaded = 0
+        rows_skipped = 0
+        chunk = []
+        for row in reader:
+            values = [convert(value) if value != '' else None for convert, value in zip(converters, row)]
+            # Placeholder rows, like the empty Sunday in weekly_schedule.csv,
+            # leave a required column empty
+            if any(values[i] is None for i in required_indexes):
+                rows_skipped += 1
+                continue
+
+            chunk.append(values)
+            if len(chunk) == chunk_size:
+                cursor.executemany(insert_query, chunk)
+                rows_loaded += len(chunk)
+                chunk = []
+                if progress:
+                    progress(table_name, rows_loaded)
+
+        if chunk:
+            cursor.executemany(insert_query, chunk)
+            rows_loaded += len(chunk)
+            if progress:
+                progress(table_name, rows_loaded)
+
+    return rows_loaded, rows_skipped
+
+def load_data_from_folder(folder_path, chunk_size=IMPORT_CHUNK_SIZE, bulk_load=False, progress=None):
     conn = connect_db()
     cursor = conn.cursor()
 
-    for file_name in os.listdir(folder_path):
-        if file_name.endswith('.csv'):
-            table_name = file_name.replace('.csv', '')
-            file_path = os.path.join(folder_path, file_name)
-        
-            with open(file_path, 'r') as file:
-                reader = csv.DictReader(file)
-                fields = reader.fieldnames
+    csv_files = {
+        file_name.replace('.csv', ''): os.path.join(folder_path, file_name)
+        for file_name in os.listdir(folder_path)
+        if file_name.endswith('.csv')
+    }
+    table_names = [table_name for table_name in TABLE_LOAD_ORDER if table_name in csv_files]
+    table_names += sorted(table_name for table_name in csv_files if table_name not in TABLE_LOAD_ORDER)
 
-                placeholders = ', '.join(['?'] * len(fields))
-                insert_query = f'INSERT INTO {table_name} ({",".join(fields)}) VALUES ({placeholders})'
+    # Without a journal a crash mid-import can corrupt the database, so this
+    # is only meant for loading into a fresh file
+    if bulk_load:
+        cursor.execute('PRAGMA journal_mode = OFF')
+        cursor.execute('PRAGMA synchronous = OFF')
 
-                for row in reader:
-                    values = [row[field] for field in fields]
-                    cursor.execute(insert_query, values)
-                
-            print(f"Data loaded successfully from {file_name} into {table_name}")
+    try:
+        with conn:
+            cursor.execute('BEGIN')
+            for table_name in table_names:
+                rows_loaded, rows_skipped = load_csv(cursor, table_name, csv_files[table_name], chunk_size, progress)
+                logger.info(f"Data loaded successfully from {table_name}.csv into {table_name} ({rows_loaded} rows, {rows_skipped} skipped)")
 
-    conn.commit()
-    conn.close()
+            if any(table_name in CATALOG_TABLES for table_name in table_names):
+                bump_data_version(cursor, 'catalog')
+            for table_name, prefix in (('weekly_schedule', 'schedule:'), ('workout', 'history:')):
+                if table_name in table_names:
+                    bump_user_data_versions(cursor, table_name, prefix)
+    finally:
+        if bulk_load:
+            for pragma in (JOURNAL_MODE, *PRAGMAS):
+                cursor.execute(pragma)
+
+INIT_LOCK_SUFFIX = '.init.lock'
+SEED_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline_data')
+
+def catalog_loaded(cursor):
+    cursor.execute('SELECT EXISTS (SELECT 1 FROM exercises)')
+    return bool(cursor.fetchone()[0])
+
+def init_database(seed_folder=SEED_FOLDER):
+    # Every worker process runs this on startup. The first one to take the
+    # lock migrates the schema and, if the catalog is empty, loads the seed
+    # data; the others wait and then find nothing left to do. Once that is
+    # done, later starts skip the lock as well.
+    if database_ready():
+        return
+
+    with open(DATABASE + INIT_LOCK_SUFFIX, 'w') as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+
+        create_tables()
+        if not catalog_loaded(connect_db().cursor()):
+            logger.info(f"Empty database, loading {seed_folder}")
+            load_data_from_folder(seed_folder)
+
+def database_ready():
+    try:
+        cursor = connect_db().cursor()
+        return schema_is_current(cursor) and catalog_loaded(cursor)
+    except sqlite3.Error:
+        logger.exception("Readiness check failed")
+        return False
 
 def get_exercises_and_muscle_groups():
     conn = connect_db()
@@ -159,8 +636,6 @@ def get_exercises_and_muscle_groups():
     ''')
     exercises = [{'id': row[0], 'name': row[1], 'primary_muscle_group': row[2]} for row in cursor.fetchall()]
 
-    conn.close()
-
     return exercises
 
 def get_muscle_groups():
@@ -174,6 +649,22 @@ def get_muscle_groups():
     ''')
     muscle_groups = [{'id': row[0], 'muscle_group': row[1]} for row in cursor.fetchall()]
 
-    conn.close()
+    return muscle_groups
+
+if __name__ == '__main__':
+    import argparse
+
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+
+    parser = argparse.ArgumentParser(description='Load CSV files named after their tables into the database')
+    parser.add_argument('folder', nargs='?', default='baseline_data')
+    parser.add_argument('--chunk-size', type=int, default=IMPORT_CHUNK_SIZE)
+    parser.add_argument('--bulk-load', action='store_true', help='disable the journal while loading into a fresh database')
+    args = parser.parse_args()
+
+    def print_progress(table_name, rows_loaded):
+        if rows_loaded % (args.chunk_size * 20) == 0:
+            print(f"{table_name}: {rows_loaded} rows loaded")
 
-    return muscle_groups
\ No newline at end of file
+    create_tables()
+    load_data_from_folder(args.folder, chunk_size=args.chunk_size, bulk_load=args.bulk_load, progress=print_progress)
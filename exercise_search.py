@@ -0,0 +1,162 @@
+import bisect
+import re
+from collections import defaultdict
+
+from catalog_cache import cached_catalog
+from database import connect_db
+
+# The index is a catalog cache entry, so it is built once per catalog version
+# and rebuilt in every worker after a catalog write. Apart from the catalog
+# version check (one data_versions read per request, shared with the page
+# ETag), searching doesn't touch the database: query terms are matched
+# against the index vocabulary exactly, by prefix and by trigram similarity,
+# and each match is scored by the field the token came from.
+FIELD_WEIGHTS = {
+    'name': 3.0,
+    'primary_muscle_group': 2.0,
+    'exercise_type': 1.0,
+    'secondary_muscle_groups': 1.0
+}
+PREFIX_MATCH = 0.8
+FUZZY_MATCH = 0.6
+MIN_TRIGRAM_SIMILARITY = 0.3
+# Added when the whole query is the exercise's name, or the start of it
+EXACT_NAME_BONUS = 1.0
+NAME_PREFIX_BONUS = 0.5
+SEARCH_PAGE_SIZE = 20
+MAX_SEARCH_PAGE_SIZE = 100
+
+def tokenize(text):
+    return re.findall(r'[a-z0-9]+', text.lower())
+
+def trigrams(token):
+    padded = f'  {token} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+def load_search_documents():
+    conn = connect_db()
+    cursor = conn.cursor()
+
+    cursor.execute('''
+        SELECT t1.id, t1.name, t1.exercise_type, t2.muscle_group
+        FROM exercises t1
+        INNER JOIN muscle_groups t2
+            ON t1.primary_muscle_group_id = t2.id
+        ORDER BY t1.name, t1.id
+    ''')
+    documents = [
+        {'id': row[0], 'name': row[1], 'exercise_type': row[2], 'primary_muscle_group': row[3], 'secondary_muscle_groups': []}
+        for row in cursor.fetchall()
+    ]
+
+    positions = {document['id']: position for position, document in enumerate(documents)}
+    cursor.execute('''
+        SELECT t1.exercise_id, t2.muscle_group
+        FROM exercise_secondary_muscle_groups t1
+        INNER JOIN muscle_groups t2
+            ON t1.secondary_muscle_group_id = t2.id
+        ORDER BY t2.muscle_group
+    ''')
+    for exercise_id, muscle_group in cursor.fetchall():
+        if exercise_id in positions:
+            documents[positions[exercise_id]]['secondary_muscle_groups'].append(muscle_group)
+
+    return documents
+
+def build_search_index(documents):
+    # postings: token -> {document position: best field weight}
+    postings = defaultdict(dict)
+    for position, document in enumerate(documents):
+        for field, weight in FIELD_WEIGHTS.items():
+            values = document[field] if field == 'secondary_muscle_groups' else [document[field]]
+            for value in values:
+                for token in tokenize(value or ''):
+                    postings[token][position] = max(postings[token].get(position, 0), weight)
+
+    trigram_tokens = defaultdict(set)
+    for token in postings:
+        for trigram in trigrams(token):
+            trigram_tokens[trigram].add(token)
+
+    return {
+        'documents': documents,
+        'name_keys': [' '.join(tokenize(document['name'])) for document in documents],
+        'postings': dict(postings),
+        'vocabulary': sorted(postings),
+        'trigram_tokens': dict(trigram_tokens)
+    }
+
+def get_search_index():
+    return cached_catalog('search_index', lambda: build_search_index(load_search_documents()))
+
+def match_term(index, term):
+    # {token: match quality} for every vocabulary token the term matches
+    matches = {}
+    if term in index['postings']:
+        matches[term] = 1.0
+
+    vocabulary = index['vocabulary']
+    position = bisect.bisect_left(vocabulary, term)
+    while position < len(vocabulary) and vocabulary[position].startswith(term):
+        matches.setdefault(vocabulary[position], PREFIX_MATCH)
+        position += 1
+
+    # Typos: Jaccard similarity of trigram sets, counted from the tokens
+    # that share at least one trigram with the term
+    term_trigrams = trigrams(term)
+    shared = defaultdict(int)
+    for trigram in term_trigrams:
+        for token in index['trigram_tokens'].get(trigram, ()):
+            shared[token] += 1
+    for token, count in shared.items():
+        similarity = count / (len(term_trigrams) + len(trigrams(token)) - count)
+        if similarity >= MIN_TRIGRAM_SIMILARITY:
+            matches.setdefault(token, FUZZY_MATCH * similarity)
+
+    return matches
+
+def search_exercises(query, offset=0, limit=SEARCH_PAGE_SIZE):
+    index = get_search_index()
+    documents = index['documents']
+    limit = max(1, min(limit, MAX_SEARCH_PAGE_SIZE))
+    offset = max(0, offset)
+
+    terms = tokenize(query or '')
+    if not terms:
+        # No query lists the whole catalog by name
+        ranked = [(position, 0.0) for position in range(len(documents))]
+    else:
+        # Every term has to match somewhere; a document's score is the sum
+        # over terms of its best match
+        scores = None
+        for term in terms:
+            term_scores = {}
+            for token, quality in match_term(index, term).items():
+                for position, weight in index['postings'][token].items():
+                    term_scores[position] = max(term_scores.get(position, 0), quality * weight)
+
+            if scores is None:
+                scores = term_scores
+            else:
+                scores = {position: score + term_scores[position] for position, score in scores.items() if position in term_scores}
+            if not scores:
+                break
+
+        query_key = ' '.join(terms)
+        for position in scores:
+            name_key = index['name_keys'][position]
+            if name_key == query_key:
+                scores[position] += EXACT_NAME_BONUS
+            elif name_key.startswith(query_key):
+                scores[position] += NAME_PREFIX_BONUS
+
+        # Documents are stored in name order, so ties stay alphabetical
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+
+    results = []
+    for position, score in ranked[offset:offset + limit]:
+        result = dict(documents[position])
+        result['score'] = round(score, 3)
+        results.append(result)
+
+    return {'results': results, 'total': len(ranked), 'offset': offset, 'limit': limit}
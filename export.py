@@ -0,0 +1,201 @@
+import csv
+import io
+import json
+import zlib
+
+from database import open_connection
+
+EXPORT_FETCH_SIZE = 500
+
+EXPORT_FORMATS = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson'
+}
+
+CSV_COLUMNS = [
+    'workout_id', 'date', 'duration_in_minutes', 'workout_type', 'performance', 'fatigue_induced', 'workout_note',
+    'record', 'name', 'weight', 'sets', 'reps', 'difficulty', 'pump', 'soreness_before_workout', 'recovery_before_workout', 'note'
+]
+
+def iter_workout_history(user_id, start_date=None, end_date=None, exercise_ids=None, fetch_size=EXPORT_FETCH_SIZE):
+    # Walks idx_workout_user_date in order and pulls each batch's children with
+    # two IN queries, so only fetch_size workouts are ever held at once. The
+    # export gets its own connection because a response can outlive its request.
+    conn = open_connection()
+    try:
+        cursor = conn.cursor()
+        child_cursor = conn.cursor()
+
+        filters = ['t1.user_id = ?']
+        params = [user_id]
+        if start_date is not None:
+            filters.append('t1.date >= ?')
+            params.append(start_date)
+        if end_date is not None:
+            filters.append('t1.date <= ?')
+            params.append(end_date)
+
+        exercise_filter = ''
+        exercise_params = []
+        if exercise_ids:
+            exercise_placeholders = ', '.join(['?'] * len(exercise_ids))
+            filters.append(f'''EXISTS (
+                SELECT 1 FROM workout_exercises t3
+                WHERE t3.workout_id = t1.id AND t3.exercise_id IN ({exercise_placeholders})
+            )''')
+            params.extend(exercise_ids)
+            exercise_filter = f'AND t1.exercise_id IN ({exercise_placeholders})'
+            exercise_params = list(exercise_ids)
+
+        cursor.execute(f'''
+            SELECT t1.id, t1.date, t1.duration_in_minutes, t1.workout_type, t1.performance, t1.fatigue_induced, t2.note
+            FROM workout t1
+            LEFT JOIN notes t2
+                ON t1.note_id = t2.id
+            WHERE {' AND '.join(filters)}
+            ORDER BY t1.date, t1.id
+        ''', params)
+
+        while True:
+            rows = cursor.fetchmany(fetch_size)
+            if not rows:
+                break
+
+            workouts = {}
+            for workout_id, workout_date, duration, workout_type, performance, fatigue_induced, note in rows:
+                workouts[workout_id] = {
+                    'id': workout_id,
+                    'date': workout_date,
+                    'duration_in_minutes': duration,
+                    'workout_type': workout_type,
+                    'performance': performance,
+                    'fatigue_induced': fatigue_induced,
+                    'note': note,
+                    'exercises': [],
+                    'muscle_groups': []
+                }
+            placeholders = ', '.join(['?'] * len(workouts))
+
+            child_cursor.execute(f'''
+                SELECT t1.workout_id, t2.name, t1.weight, t1.sets, t1.reps, t1.difficulty, t3.note
+                FROM workout_exercises t1
+                INNER JOIN exercises t2
+                    ON t1.exercise_id = t2.id
+                LEFT JOIN notes t3
+                    ON t1.note_id = t3.id
+                WHERE t1.workout_id IN ({placeholders}) {exercise_filter}
+                ORDER BY t1.workout_id, t1.id
+            ''', list(workouts) + exercise_params)
+            for workout_id, exercise_name, weight, sets, reps, difficulty, note in child_cursor:
+                workouts[workout_id]['exercises'].append({
+                    'exercise': exercise_name,
+                    'weight': weight,
+                    'sets': sets,
+                    'reps': reps,
+                    'difficulty': difficulty,
+                    'note': note
+                })
+
+            child_cursor.execute(f'''
+                SELECT t1.workout_id, t2.muscle_group, t1.pump, t1.soreness_before_workout, t1.recovery_before_workout, t3.note
+                FROM muscle_groups_worked t1
+                INNER JOIN muscle_groups t2
+                    ON t1.muscle_group_id = t2.id
+                LEFT JOIN notes t3
+                    ON t1.note_id = t3.id
+                WHERE t1.workout_id IN ({placeholders})
+                ORDER BY t1.workout_id, t1.id
+            ''', list(workouts))
+            for workout_id, muscle_group, pump, soreness_before_workout, recovery_before_workout, note in child_cursor:
+                workouts[workout_id]['muscle_groups'].append({
+                    'muscle_group': muscle_group,
+                    'pump': pump,
+                    'soreness_before_workout': soreness_before_workout,
+                    'recovery_before_workout': recovery_before_workout,
+                    'note': note
+                })
+
+            yield list(workouts.values())
+    finally:
+        conn.close()
+
+def csv_chunks(batches):
+    # One row per exercise or muscle group, with the workout repeated on each
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    # The header goes out on its own, so an empty history is still a valid CSV
+    writer.writerow(CSV_COLUMNS)
+    yield buffer.getvalue().encode('utf-8')
+    buffer.seek(0)
+    buffer.truncate()
+
+    for workouts in batches:
+        for workout in workouts:
+            workout_columns = [
+                workout['id'], workout['date'], workout['duration_in_minutes'], workout['workout_type'],
+                workout['performance'], workout['fatigue_induced'], workout['note']
+            ]
+            for exercise in workout['exercises']:
+                writer.writerow(workout_columns + [
+                    'exercise', exercise['exercise'], exercise['weight'], exercise['sets'], exercise['reps'],
+                    exercise['difficulty'], None, None, None, exercise['note']
+                ])
+            for muscle_group in workout['muscle_groups']:
+                writer.writerow(workout_columns + [
+                    'muscle_group', muscle_group['muscle_group'], None, None, None, None, muscle_group['pump'],
+                    muscle_group['soreness_before_workout'], muscle_group['recovery_before_workout'], muscle_group['note']
+                ])
+
+        yield buffer.getvalue().encode('utf-8')
+        buffer.seek(0)
+        buffer.truncate()
+
+def ndjson_chunks(batches):
+    # One JSON object per workout with its exercises and muscle groups nested
+    for workouts in batches:
+        yield ''.join(json.dumps(workout) + '\n' for workout in workouts).encode('utf-8')
+
+def gzip_chunks(chunks):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+def export_history(user_id, export_format, start_date=None, end_date=None, exercise_ids=None, compress=False):
+    batches = iter_workout_history(user_id, start_date, end_date, exercise_ids)
+    chunks = csv_chunks(batches) if export_format == 'csv' else ndjson_chunks(batches)
+    return gzip_chunks(chunks) if compress else chunks
+
+if __name__ == '__main__':
+    import argparse
+    import sys
+    from datetime import date
+
+    parser = argparse.ArgumentParser(description='Stream the full workout history as CSV or NDJSON')
+    parser.add_argument('--format', choices=sorted(EXPORT_FORMATS), default='csv')
+    parser.add_argument('--user-id', type=int, default=1)
+    parser.add_argument('--start-date', type=date.fromisoformat)
+    parser.add_argument('--end-date', type=date.fromisoformat)
+    parser.add_argument('--exercise-id', type=int, action='append', help='only workouts with this exercise; repeatable')
+    parser.add_argument('--gzip', action='store_true')
+    parser.add_argument('-o', '--output', help='defaults to stdout')
+    args = parser.parse_args()
+
+    chunks = export_history(
+        args.user_id,
+        args.format,
+        args.start_date and args.start_date.isoformat(),
+        args.end_date and args.end_date.isoformat(),
+        args.exercise_id,
+        args.gzip
+    )
+
+    output = open(args.output, 'wb') if args.output else sys.stdout.buffer
+    try:
+        for chunk in chunks:
+            output.write(chunk)
+    finally:
+        if args.output:
+            output.close()
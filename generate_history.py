@@ -0,0 +1,281 @@
+import csv
+import logging
+import os
+import random
+from datetime import date, timedelta
+
+from database import bump_data_version, connect_db, IMPORT_CHUNK_SIZE
+from users import DEFAULT_USER_ID
+
+logger = logging.getLogger(__name__)
+
+HISTORY_TABLES = {
+    'users': ('id', 'name'),
+    'notes': ('id', 'note', 'note_type'),
+    'workout': ('id', 'date', 'duration_in_minutes', 'workout_type', 'performance', 'fatigue_induced', 'user_id', 'note_id'),
+    'workout_exercises': ('id', 'weight', 'sets', 'reps', 'difficulty', 'exercise_id', 'note_id', 'workout_id'),
+    'muscle_groups_worked': ('id', 'pump', 'soreness_before_workout', 'recovery_before_workout', 'muscle_group_id', 'workout_id', 'note_id'),
+}
+
+MISSED_DAY_CHANCE = 0.12
+BREAK_CHANCE = 0.01
+BREAK_DAYS = (5, 21)
+NOTE_CHANCE = 0.04
+DELOAD_EVERY_WEEKS = 8
+
+WORKOUT_NOTES = ['felt strong today', 'short on sleep', 'gym was packed', 'great pump', 'rushed this one']
+EXERCISE_NOTES = ['form felt solid', 'grip gave out', 'slight tweak, went lighter', 'new gear helped', 'last rep was a grind']
+MUSCLE_GROUP_NOTES = ['still sore from last time', 'tight, needed extra warmup', 'felt fully recovered']
+
+def read_catalog(folder_path):
+    def read_rows(file_name):
+        with open(os.path.join(folder_path, file_name), 'r', newline='') as file:
+            return list(csv.DictReader(file))
+
+    exercises = {int(row['id']): row for row in read_rows('exercises.csv')}
+
+    secondary_muscle_groups = {}
+    for row in read_rows('exercise_secondary_muscle_groups.csv'):
+        secondary_muscle_groups.setdefault(int(row['exercise_id']), []).append(int(row['secondary_muscle_group_id']))
+
+    schedule = {}
+    for row in read_rows('weekly_schedule.csv'):
+        if row['exercise_id']:
+            schedule.setdefault(int(row['weekday_int']), []).append(
+                (int(row['exercise_id']), int(row['target_sets'] or 3), int(row['target_reps_or_duration'] or 10))
+            )
+
+    return exercises, secondary_muscle_groups, schedule
+
+class ExerciseProgression:
+    # Double progression: reps climb toward the top of the range, then the
+    # weight goes up and reps drop back to the target
+    def __init__(self, rng, target_reps):
+        self.weight = rng.randrange(20, 140, 5)
+        self.increment = 5 if self.weight >= 60 else 2.5
+        self.target_reps = target_reps
+        self.reps = target_reps
+
+    def session(self, rng, deload):
+        if deload:
+            return round(self.weight * 0.6 / 2.5) * 2.5, self.target_reps, 1
+
+        difficulty = rng.choices([2, 3, 4, 5], weights=[2, 4, 3, 1])[0]
+        if difficulty <= 3 and rng.random() < 0.7:
+            self.reps += 1
+            if self.reps > self.target_reps + 2:
+                self.weight += self.increment
+                self.reps = self.target_reps
+        elif difficulty == 5 and rng.random() < 0.5:
+            self.reps = max(self.reps - 1, 1)
+
+        return self.weight, self.reps, difficulty
+
+def generate_history(start_date, days, seed=0, lifters=1, folder_path='baseline_data'):
+    # Yields one (workout, exercises, muscle_groups) tuple per session without
+    # ids, so memory only grows with the catalog and the number of lifters.
+    # Notes are carried as text and numbered by the writer. Lifter n is logged
+    # as user n, so the first lifter's history belongs to the default user.
+    exercises, secondary_muscle_groups, schedule = read_catalog(folder_path)
+    rng = random.Random(seed)
+
+    progressions = [{} for _ in range(lifters)]
+    back_on = [start_date] * lifters
+
+    for offset in range(days):
+        day = start_date + timedelta(days=offset)
+        planned = schedule.get((day.weekday() + 1) % 7)
+        if not planned:
+            continue
+        deload = (offset // 7) % DELOAD_EVERY_WEEKS == DELOAD_EVERY_WEEKS - 1
+
+        for lifter in range(lifters):
+            if day < back_on[lifter]:
+                continue
+            if rng.random() < BREAK_CHANCE:
+                back_on[lifter] = day + timedelta(days=rng.randint(*BREAK_DAYS))
+                continue
+            if rng.random() < MISSED_DAY_CHANCE:
+                continue
+
+            exercise_rows = []
+            muscle_group_ids = {}
+            for exercise_id, target_sets, target_reps in planned:
+                progression = progressions[lifter].get(exercise_id)
+                if progression is None:
+                    progression = progressions[lifter][exercise_id] = ExerciseProgression(rng, target_reps)
+
+                weight, reps, difficulty = progression.session(rng, deload)
+                sets = target_sets - (rng.random() < 0.1)
+                note = rng.choice(EXERCISE_NOTES) if rng.random() < NOTE_CHANCE else None
+                exercise_rows.append((weight, sets, reps, difficulty, exercise_id, note))
+
+                muscle_group_ids.setdefault(int(exercises[exercise_id]['primary_muscle_group_id']), None)
+                for muscle_group_id in secondary_muscle_groups.get(exercise_id, []):
+                    muscle_group_ids.setdefault(muscle_group_id, None)
+
+            muscle_group_rows = [
+                (
+                    rng.randint(2, 5), rng.randint(1, 4), rng.randint(2, 5), muscle_group_id,
+                    rng.choice(MUSCLE_GROUP_NOTES) if rng.random() < NOTE_CHANCE else None
+                )
+                for muscle_group_id in muscle_group_ids
+            ]
+
+            workout_type = exercises[planned[0][0]]['exercise_type']
+            workout = (
+                day.isoformat(), len(planned) * 10 + rng.randint(-5, 15), workout_type,
+                rng.randint(2, 5) if not deload else 3, rng.randint(1, 5) if not deload else 2, lifter + 1,
+                rng.choice(WORKOUT_NOTES) if rng.random() < NOTE_CHANCE else None
+            )
+
+            yield workout, exercise_rows, muscle_group_rows
+
+def number_history(history, next_ids):
+    # Assigns ids and turns inline note text into rows of the notes table,
+    # yielding (table_name, row) pairs in foreign key order
+    def add_note(note, note_type):
+        if note is None:
+            return None
+        note_id = next_ids['notes']
+        next_ids['notes'] += 1
+        return note_id, ('notes', (note_id, note, note_type))
+
+    users_seen = {DEFAULT_USER_ID}
+    for workout, exercise_rows, muscle_group_rows in history:
+        user_id = workout[-2]
+        if user_id not in users_seen:
+            users_seen.add(user_id)
+            yield 'users', (user_id, f'lifter {user_id}')
+
+        workout_id = next_ids['workout']
+        next_ids['workout'] += 1
+
+        note = add_note(workout[-1], 'workout')
+        if note:
+            yield note[1]
+        yield 'workout', (workout_id, *workout[:-1], note and note[0])
+
+        for *values, note_text in exercise_rows:
+            note = add_note(note_text, 'workout exercises')
+            if note:
+                yield note[1]
+            yield 'workout_exercises', (next_ids['workout_exercises'], *values, note and note[0], workout_id)
+            next_ids['workout_exercises'] += 1
+
+        for *values, note_text in muscle_group_rows:
+            note = add_note(note_text, 'muscle groups')
+            if note:
+                yield note[1]
+            yield 'muscle_groups_worked', (next_ids['muscle_groups_worked'], *values, workout_id, note and note[0])
+            next_ids['muscle_groups_worked'] += 1
+
+def write_history_to_database(history, chunk_size=IMPORT_CHUNK_SIZE, progress=None):
+    conn = connect_db()
+    cursor = conn.cursor()
+
+    next_ids = {}
+    for table_name in ('notes', 'workout', 'workout_exercises', 'muscle_groups_worked'):
+        cursor.execute(f'SELECT COALESCE(MAX(id), 0) + 1 FROM {table_name}')
+        next_ids[table_name] = cursor.fetchone()[0]
+
+    insert_queries = {
+        table_name: f'INSERT INTO {table_name} ({", ".join(columns)}) VALUES ({", ".join(["?"] * len(columns))})'
+        for table_name, columns in HISTORY_TABLES.items()
+    }
+    # Lifters that already exist as users keep their name
+    insert_queries['users'] = 'INSERT OR IGNORE INTO users (id, name) VALUES (?, ?)'
+
+    # Each chunk is its own transaction, with parents flushed before children
+    # so a crash leaves whole chunks behind rather than dangling references
+    chunks = {table_name: [] for table_name in HISTORY_TABLES}
+    rows_written = {table_name: 0 for table_name in HISTORY_TABLES}
+
+    def flush():
+        with conn:
+            user_ids = {row[HISTORY_TABLES['workout'].index('user_id')] for row in chunks['workout']}
+            for table_name, rows in chunks.items():
+                cursor.executemany(insert_queries[table_name], rows)
+                rows_written[table_name] += len(rows)
+                rows.clear()
+            # Same keys as log_workouts.bump_history_version
+            for user_id in user_ids:
+                bump_data_version(cursor, f'history:{user_id}')
+        if progress:
+            progress(rows_written)
+
+    for table_name, row in number_history(history, next_ids):
+        chunks[table_name].append(row)
+        if len(chunks['workout_exercises']) >= chunk_size:
+            flush()
+    flush()
+
+    return rows_written
+
+def write_history_to_csv(history, folder_path, first_id=1, progress=None, progress_every=IMPORT_CHUNK_SIZE):
+    # The files can be loaded with database.py like any other CSV folder
+    os.makedirs(folder_path, exist_ok=True)
+    files = {}
+    writers = {}
+    rows_written = {table_name: 0 for table_name in HISTORY_TABLES}
+    try:
+        for table_name, columns in HISTORY_TABLES.items():
+            files[table_name] = open(os.path.join(folder_path, f'{table_name}.csv'), 'w', newline='')
+            writers[table_name] = csv.writer(files[table_name])
+            writers[table_name].writerow(columns)
+
+        next_ids = {table_name: first_id for table_name in HISTORY_TABLES}
+        for table_name, row in number_history(history, next_ids):
+            writers[table_name].writerow(row)
+            rows_written[table_name] += 1
+            if progress and table_name == 'workout_exercises' and rows_written[table_name] % progress_every == 0:
+                progress(rows_written)
+    finally:
+        for file in files.values():
+            file.close()
+
+    return rows_written
+
+if __name__ == '__main__':
+    import argparse
+
+    from database import create_tables, load_data_from_folder
+    from progress import rebuild_progress_rollups
+    from recommendations import rebuild_recommendations
+    from recovery import rebuild_muscle_group_fatigue
+
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+
+    parser = argparse.ArgumentParser(description='Generate synthetic workout history from the weekly schedule and exercise catalog')
+    parser.add_argument('--years', type=float, default=1)
+    parser.add_argument('--lifters', type=int, default=1, help='independent histories generated side by side')
+    parser.add_argument('--start-date', type=date.fromisoformat, help='defaults to --years before today')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--catalog', default='baseline_data', help='folder with the exercise catalog and weekly schedule CSVs')
+    parser.add_argument('--csv', metavar='FOLDER', help='write CSV files to this folder instead of the database')
+    parser.add_argument('--chunk-size', type=int, default=IMPORT_CHUNK_SIZE, help='workout_exercises rows per transaction')
+    args = parser.parse_args()
+
+    days = int(args.years * 365)
+    start_date = args.start_date or date.today() - timedelta(days=days)
+    history = generate_history(start_date, days, args.seed, args.lifters, args.catalog)
+
+    def print_progress(rows_written):
+        if rows_written['workout_exercises'] % (args.chunk_size * 20) < args.chunk_size:
+            print(f"{rows_written['workout_exercises']} workout_exercises rows written")
+
+    if args.csv:
+        rows_written = write_history_to_csv(history, args.csv, progress=print_progress, progress_every=args.chunk_size)
+    else:
+        create_tables()
+        conn = connect_db()
+        if conn.execute('SELECT COUNT(*) FROM exercises').fetchone()[0] == 0:
+            load_data_from_folder(args.catalog)
+        rows_written = write_history_to_database(history, args.chunk_size, progress=print_progress)
+        logger.info("Rebuilding progress rollups, recommendations and muscle group fatigue")
+        rebuild_progress_rollups()
+        rebuild_recommendations()
+        rebuild_muscle_group_fatigue()
+
+    for table_name, count in rows_written.items():
+        logger.info(f"{table_name}: {count} rows")
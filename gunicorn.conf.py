@@ -0,0 +1,36 @@
+import multiprocessing
+import os
+import secrets
+
+# gunicorn -c gunicorn.conf.py wsgi:app
+chdir = os.path.dirname(os.path.abspath(__file__))
+bind = os.environ.get('BIND', '0.0.0.0:8000')
+
+# One process per core. In WAL mode readers in every process run alongside
+# the single writer; writers wait on busy_timeout and retry on SQLITE_BUSY.
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count()))
+# Threads let a worker keep live-sync streams open while serving requests;
+# each open /log-workout page holds one
+worker_class = 'gthread'
+threads = int(os.environ.get('THREADS', 8))
+# Streams past this limit get a 503 and the page retries later, so at least
+# half of each worker's threads stay free for normal requests. Raise THREADS
+# to keep more pages live per worker.
+os.environ.setdefault('LIVE_SYNC_MAX_STREAMS', str(max(threads // 2, 1)))
+
+# Each worker imports the app itself, so no SQLite connection or writer
+# thread is ever shared across a fork. create_app() serializes the
+# schema and seed setup with a file lock.
+preload_app = False
+# Time for the write-behind queue to flush when a worker stops
+graceful_timeout = 30
+
+# Sessions are signed with SECRET_KEY, so all workers need the same one.
+# Set it in the environment to keep sessions across restarts; otherwise one
+# is made here, in the master, and inherited by every worker.
+if not os.environ.get('SECRET_KEY'):
+    os.environ['SECRET_KEY'] = secrets.token_hex(32)
+
+def worker_exit(server, worker):
+    import write_behind
+    write_behind.stop()
@@ -0,0 +1,101 @@
+import functools
+import hashlib
+import os
+from datetime import date
+
+from flask import g, make_response, request
+
+from catalog_cache import catalog_version
+from database import connect_db, get_data_versions
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+STATIC_MAX_AGE = 365 * 24 * 60 * 60
+
+_file_hashes = {}
+
+def file_hash(path):
+    # Read on first use and again only once the file's mtime moves; None
+    # when the file doesn't exist
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return None
+    entry = _file_hashes.get(path)
+    if entry is None or entry[0] != mtime:
+        with open(path, 'rb') as file:
+            entry = _file_hashes[path] = (mtime, hashlib.sha1(file.read()).hexdigest())
+    return entry[1]
+
+def static_file_hash(filename):
+    digest = file_hash(os.path.join(APP_DIR, 'static', filename))
+    return digest[:12] if digest else None
+
+@functools.cache
+def asset_version():
+    # Changes whenever a template or static file does, so a deploy
+    # invalidates every page ETag even though no data version moved. Taken
+    # on the first conditional page rather than at import.
+    digest = hashlib.sha1()
+    for folder in ('templates', 'static'):
+        for root, dirs, files in os.walk(os.path.join(APP_DIR, folder)):
+            dirs.sort()
+            for file_name in sorted(files):
+                digest.update(file_name.encode())
+                digest.update((file_hash(os.path.join(root, file_name)) or '').encode())
+    return digest.hexdigest()
+
+def page_etag(version_names):
+    conn = connect_db()
+    cursor = conn.cursor()
+
+    # The catalog version is shared with catalog_cache for the request
+    other_names = [name for name in version_names if name != 'catalog']
+    other_versions = dict(zip(other_names, get_data_versions(cursor, other_names) if other_names else []))
+    versions = [catalog_version(cursor) if name == 'catalog' else other_versions[name] for name in version_names]
+    # Pages default to today's date, so they are also revalidated daily
+    parts = (asset_version(), g.user_id, request.full_path, date.today().isoformat(), *zip(version_names, versions))
+    return hashlib.sha1(repr(parts).encode()).hexdigest()
+
+def conditional_page(version_names=lambda: []):
+    # version_names() lists the data_versions entries the page is built
+    # from. A request whose If-None-Match still matches gets a 304 without
+    # the view running; otherwise the tag is taken again after the view, in
+    # case rendering the page wrote to the database (as seeding does).
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            etag = page_etag(version_names())
+            if request.if_none_match.contains(etag):
+                response = make_response('', 304)
+            else:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+                etag = page_etag(version_names())
+
+            response.set_etag(etag)
+            response.headers['Cache-Control'] = 'private, no-cache'
+            response.vary.add('Cookie')
+            return response
+        return wrapper
+    return decorator
+
+def init_app(app):
+    @app.url_defaults
+    def add_static_hash(endpoint, values):
+        if endpoint == 'static' and 'filename' in values and 'v' not in values:
+            # A missing file keeps its plain URL and 404s like any other
+            digest = static_file_hash(values['filename'])
+            if digest:
+                values['v'] = digest
+
+    @app.after_request
+    def cache_hashed_static(response):
+        # A hashed URL always names the same bytes, so it can be cached for
+        # good; a new file gets a new URL
+        if request.endpoint == 'static' and 'v' in request.args and response.status_code in (200, 304):
+            response.cache_control.no_cache = None
+            response.cache_control.public = True
+            response.cache_control.max_age = STATIC_MAX_AGE
+            response.cache_control.immutable = True
+        return response
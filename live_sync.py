@@ -0,0 +1,138 @@
+import json
+import os
+import threading
+
+from database import get_data_version, open_connection
+from log_workouts import read_curr_workout_data
+
+# Open /log-workout pages subscribe to a stream of their user's staging rows.
+# Writers only call notify(); each stream then checks the user's curr_workout
+# version and, if it moved, reads the staging rows once and sends the rows
+# that differ from what it last sent. The heartbeat also re-checks the
+# version, which picks up writes made by other worker processes.
+HEARTBEAT_SECONDS = 15
+# Each open stream holds a server thread for as long as the page is open, so
+# only this many run at once in a process; the rest are turned away and
+# the page tries again later. Keep it below the worker's thread count
+# (gunicorn.conf.py sets it to half of THREADS).
+MAX_STREAMS = int(os.environ.get('LIVE_SYNC_MAX_STREAMS', 4))
+STREAM_RETRY_SECONDS = 30
+
+_stream_slots = threading.BoundedSemaphore(MAX_STREAMS)
+
+_changes = {}
+_condition = threading.Condition()
+
+def notify(user_id):
+    with _condition:
+        _changes[user_id] = _changes.get(user_id, 0) + 1
+        _condition.notify_all()
+
+def change_count(user_id):
+    with _condition:
+        return _changes.get(user_id, 0)
+
+def acquire_stream_slot():
+    return _stream_slots.acquire(blocking=False)
+
+def release_stream_slot():
+    _stream_slots.release()
+
+def wait_for_change(user_id, seen, timeout):
+    with _condition:
+        _condition.wait_for(lambda: _changes.get(user_id, 0) != seen, timeout)
+        return _changes.get(user_id, 0)
+
+def staged_rows(cursor, user_id):
+    # Keyed the same way log_workout.js keys its patches
+    curr_workout = read_curr_workout_data(cursor, user_id)
+
+    rows = {}
+    if curr_workout['workout_date'] is not None:
+        rows['date'] = ('date', (curr_workout['workout_date'],))
+    for exercise in curr_workout['exercises']:
+        rows[f'exercise:{exercise[0]}'] = ('exercise', exercise)
+    for muscle_group in curr_workout['muscle_groups']:
+        rows[f'muscle_group:{muscle_group[0]}'] = ('muscle_group', muscle_group)
+    for overall in curr_workout['overall_workout_data']:
+        rows[f'overall:{overall[0]}'] = ('overall', overall)
+    return rows
+
+def row_values(kind, row):
+    # Field values by the name of the input or select showing them
+    if kind == 'date':
+        return {'workout_date': row[0]}
+    if kind == 'exercise':
+        return {
+            'weight_used': row[1],
+            'sets_completed': row[2],
+            'reps_completed': row[4],
+            'difficulty': row[6],
+            'exercise_notes': row[7]
+        }
+    if kind == 'muscle_group':
+        return {
+            'pump_level': row[1],
+            'pre_workout_soreness': row[2],
+            'pre_workout_recovery': row[3],
+            'muscle_group_notes': row[4]
+        }
+    return {
+        'workout_duration': row[1],
+        'workout_type': row[2],
+        'performance_rating': row[3],
+        'fatigue_induced': row[4],
+        'workout_notes': row[5]
+    }
+
+def read_snapshot(conn, user_id):
+    cursor = conn.cursor()
+    with conn:
+        cursor.execute('BEGIN')
+        version = get_data_version(cursor, f'curr_workout:{user_id}')
+        rows = staged_rows(cursor, user_id)
+    return version, rows
+
+def workout_event(version, old_rows, new_rows, render_row, reset=False):
+    # render_row(kind, row) returns the markup for a row the page doesn't
+    # have yet; rows it already shows only get their changed values
+    changed = []
+    for key, (kind, row) in new_rows.items():
+        if key in old_rows and old_rows[key][1] == row:
+            continue
+        change = {'key': key, 'kind': kind, 'values': row_values(kind, row)}
+        if key not in old_rows and kind != 'date':
+            change['html'] = render_row(kind, row)
+        changed.append(change)
+    removed = [key for key in old_rows if key not in new_rows]
+
+    data = json.dumps({'version': version, 'reset': reset, 'changed': changed, 'removed': removed})
+    return f'id: {version}\nevent: workout\ndata: {data}\n\n'
+
+def workout_events(user_id, since_version, render_row):
+    # since_version is the version the page was rendered at (or the last
+    # event id, when the browser reconnects). If the rows have moved on
+    # since, the first event resends all of them and the page drops
+    # whatever it shows that is no longer staged.
+    conn = open_connection()
+    try:
+        seen = change_count(user_id)
+        version, rows = read_snapshot(conn, user_id)
+        if version != since_version:
+            yield workout_event(version, {}, rows, render_row, reset=True)
+
+        while True:
+            notified = wait_for_change(user_id, seen, HEARTBEAT_SECONDS)
+            timed_out = notified == seen
+            seen = notified
+
+            if get_data_version(conn.cursor(), f'curr_workout:{user_id}') == version:
+                if timed_out:
+                    yield ': keepalive\n\n'
+                continue
+
+            new_version, new_rows = read_snapshot(conn, user_id)
+            yield workout_event(new_version, rows, new_rows, render_row)
+            version, rows = new_version, new_rows
+    finally:
+        conn.close()
@@ -1,4 +1,8 @@
-from database import connect_db
+from catalog_cache import get_muscle_groups
+from database import bump_data_version, connect_db, get_data_version, retry_on_busy
+from progress import update_progress_rollups
+from recommendations import update_recommendations
+from recovery import recovery_cte, update_muscle_group_fatigue
 
 weekday_ints = {
     'Sunday': 0,
@@ -10,98 +14,55 @@ weekday_ints = {
     'Saturday': 6
 }
 
-def get_secondary_muscle_groups(exercise_ids):
-    conn = connect_db()
-    cursor = conn.cursor()
-
-    placeholders = ', '.join(['?'] * len(exercise_ids))
-
-    sql = f"""
-        SELECT t1.muscle_group
-        FROM muscle_groups t1
-        INNER JOIN exercise_secondary_muscle_groups t2
-            ON t1.id = t2.secondary_muscle_group_id
-        WHERE t2.exercise_id IN ({placeholders})
-    """
-
-    cursor.execute(sql, exercise_ids)
+# Every write to a user's current workout bumps its version, and finishing
+# one also bumps the user's history version; pages use both as validators
+def bump_curr_workout_version(cursor, user_id):
+    bump_data_version(cursor, f'curr_workout:{user_id}')
 
-    muscle_groups = []
-    for row in cursor.fetchall():
-        muscle_groups.append(row[0])
-    conn.close()
-    return muscle_groups
-
-def get_weekday_exercises(weekday):
-    conn = connect_db()
-    cursor = conn.cursor()
+def bump_history_version(cursor, user_id):
+    bump_data_version(cursor, f'history:{user_id}')
 
+def curr_workout_exists(cursor, user_id):
     cursor.execute('''
-        SELECT 
-            t1.exercise_id, t2.name, t1.target_sets,
-            t1.target_reps_or_duration, t3.muscle_group
-        FROM weekly_schedule t1
-        INNER JOIN exercises t2
-            ON t1.exercise_id = t2.id
-        INNER JOIN muscle_groups t3
-            ON t2.primary_muscle_group_id = t3.id
-        WHERE t1.weekday_int = ?
-    ''', (weekday_ints[weekday],))
-
-    exercises = []
-
-    for row in cursor.fetchall():
-        exercise_id, exercise_name, target_sets, target_reps_or_duration, primary_muscle_group = row
-        exercises.append({
-            'exercise_name': exercise_name,
-            'exercise_id': exercise_id,
-            'target_sets': target_sets,
-            'target_reps': target_reps_or_duration,
-            'primary_muscle_group': primary_muscle_group
-        })
-
-    conn.close()
-    return exercises
-
-def check_current_workout_exists():
-    conn = connect_db()
-    cursor = conn.cursor()
-
-    cursor.execute('SELECT COUNT(*) FROM current_workout_overall')
+        SELECT EXISTS (
+            SELECT 1 FROM current_workout_overall
+            WHERE user_id = ?
+        )
+    ''', (user_id,))
+    return bool(cursor.fetchone()[0])
+
+def read_curr_workout_data(cursor, user_id):
+    cursor.execute('''
+        SELECT date FROM current_workout_date
+        WHERE user_id = ?
+    ''', (user_id,))
     result = cursor.fetchone()
-    print(f"result: {result}")
-    count = result[0] if result else 0
+    workout_date = result[0] if result else None
 
-    conn.close()
-    return count > 0
+    cursor.execute('''
+        SELECT exercise_name, weight, sets, target_sets, reps, target_reps, difficulty, note
+        FROM current_workout_exercises
+        WHERE user_id = ?
+        ORDER BY rowid
+    ''', (user_id,))
+    exercises = cursor.fetchall()
 
-def get_curr_workout_data():
-    conn = connect_db()
-    cursor = conn.cursor()
+    cursor.execute('''
+        SELECT muscle_group, pump, soreness_before_workout, recovery_before_workout, note
+        FROM current_workout_muscle_groups
+        WHERE user_id = ?
+        ORDER BY rowid
+    ''', (user_id,))
+    muscle_groups = cursor.fetchall()
 
-    cursor.execute('SELECT * FROM current_workout_date')
-    result = cursor.fetchone()
-    workout_date = result[0] if result else None
+    cursor.execute('''
+        SELECT workout_id, duration_in_minutes, workout_type, performance, fatigue_induced, note
+        FROM current_workout_overall
+        WHERE user_id = ?
+        ORDER BY workout_id
+    ''', (user_id,))
+    overall_workout_data = cursor.fetchall()
 
-    exercises = []
-    cursor.execute('SELECT * FROM current_workout_exercises')
-    for row in cursor.fetchall():
-        exercise_name, weight, sets, target_sets, reps, target_reps, difficulty, exercise_note = row
-        exercises.append((exercise_name, weight, sets, target_sets, reps, target_reps, difficulty, exercise_note))
-    
-    muscle_groups = []
-    cursor.execute('SELECT * FROM current_workout_muscle_groups')
-    for row in cursor.fetchall():
-        muscle_group, pump, soreness_before_workout, recovery_before_workout, muscle_group_note = row
-        muscle_groups.append((muscle_group, pump, soreness_before_workout, recovery_before_workout, muscle_group_note))
-    
-    overall_workout_data = []
-    cursor.execute('SELECT * FROM current_workout_overall')
-    for row in cursor.fetchall():
-        workout_id, duration, workout_type, performance, fatigue_induced, workout_note = row
-        overall_workout_data.append((workout_id, duration, workout_type, performance, fatigue_induced, workout_note))
-
-    conn.close()
     return {
         'workout_date': workout_date,
         'exercises': exercises,
@@ -109,208 +70,505 @@ def get_curr_workout_data():
         'overall_workout_data': overall_workout_data
     }
 
-def save_curr_workout_data(workout_date, exercises, muscle_groups, overall_workout_data):
+# A new current workout is seeded from the schedule for its weekday.
+# Exercises with a history start from their recommended weight, and their
+# suggested sets and reps replace the schedule's targets.
+SEED_EXERCISES_SQL = '''
+    INSERT OR IGNORE INTO current_workout_exercises (user_id, exercise_name, weight, target_sets, target_reps, difficulty, note)
+    SELECT
+        t1.user_id, t2.name, t3.weight,
+        COALESCE(t3.sets, t1.target_sets), COALESCE(t3.reps, t1.target_reps_or_duration),
+        3, ''
+    FROM weekly_schedule t1
+    INNER JOIN exercises t2
+        ON t1.exercise_id = t2.id
+    LEFT JOIN exercise_recommendations t3
+        ON t3.user_id = t1.user_id AND t3.exercise_id = t1.exercise_id
+    WHERE t1.user_id = ? AND t1.weekday_int = ?
+'''
+
+# Pre-workout recovery comes from the fatigue model as of the workout date,
+# passed in as a recovery_cte() table
+SEED_MUSCLE_GROUPS_SQL = '''
+    WITH {recovery_sql}
+    INSERT OR IGNORE INTO current_workout_muscle_groups (user_id, muscle_group, pump, soreness_before_workout, recovery_before_workout, note)
+    SELECT ?, t3.muscle_group, 3, 1, COALESCE(t5.recovery_before_workout, 5), ''
+    FROM muscle_groups t3
+    LEFT JOIN recovery t5
+        ON t5.muscle_group_id = t3.id
+    WHERE t3.id IN (
+        SELECT t2.primary_muscle_group_id
+        FROM weekly_schedule t1
+        INNER JOIN exercises t2
+            ON t1.exercise_id = t2.id
+        WHERE t1.user_id = ? AND t1.weekday_int = ?
+        UNION
+        SELECT t4.secondary_muscle_group_id
+        FROM weekly_schedule t1
+        INNER JOIN exercise_secondary_muscle_groups t4
+            ON t1.exercise_id = t4.exercise_id
+        WHERE t1.user_id = ? AND t1.weekday_int = ?
+    )
+'''
+
+def seed_curr_workout(cursor, user_id, workout_date, weekday):
+    weekday_int = weekday_ints[weekday]
+
+    cursor.execute('''
+        INSERT OR IGNORE INTO current_workout_date (user_id, date)
+        VALUES (?, ?)
+    ''', (user_id, workout_date))
+
+    cursor.execute(SEED_EXERCISES_SQL, (user_id, weekday_int))
+
+    recovery_sql, recovery_params = recovery_cte(cursor, user_id, workout_date)
+    cursor.execute(SEED_MUSCLE_GROUPS_SQL.format(recovery_sql=recovery_sql), (*recovery_params, user_id, user_id, weekday_int, user_id, weekday_int))
+
+    cursor.execute('''
+        INSERT INTO current_workout_overall (user_id, workout_type, performance, fatigue_induced, note)
+        VALUES (?, 'Push', 4, 3, '')
+    ''', (user_id,))
+
+@retry_on_busy
+def load_log_workout_page(user_id, workout_date, weekday):
     conn = connect_db()
     cursor = conn.cursor()
 
-    cursor.execute('''
-        INSERT INTO current_workout_date
-        VALUES (?)
-    ''', (workout_date,))
+    # Everything the /log-workout page shows is read (and, for a new day,
+    # seeded) inside one transaction so the page sees a single snapshot. A
+    # read transaction can't become a write once another process has
+    # committed (SQLITE_BUSY_SNAPSHOT), so seeding starts over under
+    # BEGIN IMMEDIATE, which takes the write lock up front.
+    curr_workout = None
+    with conn:
+        cursor.execute('BEGIN')
+        if curr_workout_exists(cursor, user_id):
+            curr_workout = read_curr_workout_data(cursor, user_id)
+            # The page's live stream starts from this version
+            version = get_data_version(cursor, f'curr_workout:{user_id}')
+
+    if curr_workout is None:
+        with conn:
+            cursor.execute('BEGIN IMMEDIATE')
+            if not curr_workout_exists(cursor, user_id):
+                seed_curr_workout(cursor, user_id, workout_date, weekday)
+                bump_curr_workout_version(cursor, user_id)
+            curr_workout = read_curr_workout_data(cursor, user_id)
+            version = get_data_version(cursor, f'curr_workout:{user_id}')
+
+    # The muscle groups come from the in-process cache; only the staging
+    # rows above had to be read from the database. Exercises are searched
+    # from the page through /api/exercises/search.
+    logged_muscle_groups = {muscle_group[0] for muscle_group in curr_workout['muscle_groups']}
+    muscle_groups_in_db = [muscle_group['muscle_group'] for muscle_group in get_muscle_groups() if muscle_group['muscle_group'] not in logged_muscle_groups]
 
-    for exercise in exercises:
-        cursor.execute('''
-            INSERT INTO current_workout_exercises
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-        ''', exercise)
-    
-    for muscle_group in muscle_groups:
-        cursor.execute('''
-            INSERT INTO current_workout_muscle_groups
-            VALUES (?, ?, ?, ?, ?)
-        ''', muscle_group)
-    
-    for overall_data in overall_workout_data:
-        cursor.execute('''
-            INSERT INTO current_workout_overall
-            VALUES (NULL, ?, ?, ?, ?, ?)
-        ''', overall_data)
-    
-    conn.commit()
-    conn.close()
+    return {
+        'workout_date': curr_workout['workout_date'],
+        'exercises': curr_workout['exercises'],
+        'muscle_groups': curr_workout['muscle_groups'],
+        'overall': curr_workout['overall_workout_data'],
+        'muscle_groups_in_db': muscle_groups_in_db,
+        'version': version
+    }
 
-def delete_curr_workout_exercise(exercise_name):
+@retry_on_busy
+def delete_curr_workout_exercise(user_id, exercise_name):
     conn = connect_db()
     cursor = conn.cursor()
 
     cursor.execute('''
         DELETE FROM current_workout_exercises
-        WHERE exercise_name = ?
-    ''', (exercise_name,))
+        WHERE user_id = ? AND exercise_name = ?
+    ''', (user_id, exercise_name))
 
+    bump_curr_workout_version(cursor, user_id)
     conn.commit()
-    conn.close()
 
-def delete_curr_muscle_group(muscle_group):
+@retry_on_busy
+def delete_curr_muscle_group(user_id, muscle_group):
     conn = connect_db()
     cursor = conn.cursor()
 
     cursor.execute('''
         DELETE FROM current_workout_muscle_groups
-        WHERE muscle_group = ?
-    ''', (muscle_group,))
+        WHERE user_id = ? AND muscle_group = ?
+    ''', (user_id, muscle_group))
 
+    bump_curr_workout_version(cursor, user_id)
     conn.commit()
-    conn.close()
 
-def delete_curr_overall_workout(workout_id):
+@retry_on_busy
+def delete_curr_overall_workout(user_id, workout_id):
     conn = connect_db()
     cursor = conn.cursor()
 
     cursor.execute('''
         DELETE FROM current_workout_overall
-        WHERE workout_id = ?
-    ''', (workout_id,))
+        WHERE user_id = ? AND workout_id = ?
+    ''', (user_id, workout_id))
 
+    bump_curr_workout_version(cursor, user_id)
     conn.commit()
-    conn.close()
 
-def update_curr_workout_date(workout_date):
+@retry_on_busy
+def update_curr_workout_date(user_id, workout_date):
     conn = connect_db()
     cursor = conn.cursor()
 
     cursor.execute('''
         UPDATE current_workout_date
         SET date = ?
-    ''', (workout_date,))
+        WHERE user_id = ?
+    ''', (workout_date, user_id))
 
+    bump_curr_workout_version(cursor, user_id)
     conn.commit()
-    conn.close()
 
-def update_curr_workout_exercise(exercise_name, weight, sets, reps, difficulty, note):
+@retry_on_busy
+def update_curr_workout_exercise(user_id, exercise_name, weight, sets, reps, difficulty, note):
     conn = connect_db()
     cursor = conn.cursor()
 
     cursor.execute('''
         UPDATE current_workout_exercises
         SET weight = ?, sets = ?, reps = ?, difficulty = ?, note = ?
-        WHERE exercise_name = ?
-    ''', (weight, sets, reps, difficulty, note, exercise_name))
+        WHERE user_id = ? AND exercise_name = ?
+    ''', (weight, sets, reps, difficulty, note, user_id, exercise_name))
 
+    bump_curr_workout_version(cursor, user_id)
     conn.commit()
-    conn.close()
 
-def update_curr_workout_muscle_group(muscle_group, pump, soreness_before_workout, recovery_before_workout, note):
+@retry_on_busy
+def update_curr_workout_muscle_group(user_id, muscle_group, pump, soreness_before_workout, recovery_before_workout, note):
     conn = connect_db()
     cursor = conn.cursor()
 
     cursor.execute('''
         UPDATE current_workout_muscle_groups
         SET pump = ?, soreness_before_workout = ?, recovery_before_workout = ?, note = ?
-        WHERE muscle_group = ?
-    ''', (pump, soreness_before_workout, recovery_before_workout, note, muscle_group))
+        WHERE user_id = ? AND muscle_group = ?
+    ''', (pump, soreness_before_workout, recovery_before_workout, note, user_id, muscle_group))
 
+    bump_curr_workout_version(cursor, user_id)
     conn.commit()
-    conn.close()
 
-def update_curr_workout_overall(workout_id, duration, type, performance, fatigue, note):
+@retry_on_busy
+def update_curr_workout_overall(user_id, workout_id, duration, type, performance, fatigue, note):
     conn = connect_db()
     cursor = conn.cursor()
 
     cursor.execute('''
         UPDATE current_workout_overall
         SET duration_in_minutes = ?, workout_type = ?, performance = ?, fatigue_induced = ?, note = ?
-        WHERE workout_id = ?
-    ''', (duration, type, performance, fatigue, note, workout_id))
+        WHERE user_id = ? AND workout_id = ?
+    ''', (duration, type, performance, fatigue, note, user_id, workout_id))
 
+    bump_curr_workout_version(cursor, user_id)
     conn.commit()
-    conn.close()
 
-def delete_curr_workout():
+# Each patch type and the field naming the staged row it updates
+PATCH_ROW_FIELDS = {
+    'date': None,
+    'exercise': 'exercise_name',
+    'muscle_group': 'muscle_group_name',
+    'overall': 'workout_id'
+}
+
+def curr_workout_patch_key(patch):
+    patch_type = patch.get('type')
+    if patch_type not in PATCH_ROW_FIELDS:
+        raise ValueError(f"Unknown patch type: {patch_type}")
+
+    row_field = PATCH_ROW_FIELDS[patch_type]
+    return patch_type, patch.get(row_field) if row_field else None
+
+def validate_curr_workout_patches(patches):
+    # Checked before a batch is written or queued, so a malformed one is the
+    # client's 400 rather than a failure on the write-behind thread
+    if not isinstance(patches, list):
+        raise ValueError("patches must be a list")
+    for patch in patches:
+        if not isinstance(patch, dict):
+            raise ValueError("Each patch must be an object")
+        curr_workout_patch_key(patch)
+        if not all(value is None or isinstance(value, (str, int, float)) for value in patch.values()):
+            raise ValueError("Patch values must be strings, numbers or null")
+
+@retry_on_busy
+def apply_curr_workout_patches(user_id, patches):
+    conn = connect_db()
+    cursor = conn.cursor()
+
+    with conn:
+        write_curr_workout_patches(cursor, user_id, patches)
+
+def write_curr_workout_patches(cursor, user_id, patches):
+    # Only the last patch for each row matters, so coalesce before writing
+    dates = []
+    exercises = {}
+    muscle_groups = {}
+    overall = {}
+    for patch in patches:
+        patch_type = patch.get('type')
+        if patch_type == 'date':
+            dates.append((patch.get('workout_date'), user_id))
+        elif patch_type == 'exercise':
+            exercises[patch.get('exercise_name')] = (
+                patch.get('weight_used'), patch.get('sets_completed'), patch.get('reps_completed'),
+                patch.get('difficulty'), patch.get('exercise_notes'), user_id, patch.get('exercise_name')
+            )
+        elif patch_type == 'muscle_group':
+            muscle_groups[patch.get('muscle_group_name')] = (
+                patch.get('pump_level'), patch.get('pre_workout_soreness'), patch.get('pre_workout_recovery'),
+                patch.get('muscle_group_notes'), user_id, patch.get('muscle_group_name')
+            )
+        elif patch_type == 'overall':
+            overall[patch.get('workout_id')] = (
+                patch.get('workout_duration'), patch.get('workout_type'), patch.get('performance_rating'),
+                patch.get('fatigue_induced'), patch.get('workout_notes'), user_id, patch.get('workout_id')
+            )
+        else:
+            raise ValueError(f"Unknown patch type: {patch_type}")
+
+    if dates:
+        cursor.execute('''
+            UPDATE current_workout_date
+            SET date = ?
+            WHERE user_id = ?
+        ''', dates[-1])
+
+    cursor.executemany('''
+        UPDATE current_workout_exercises
+        SET weight = ?, sets = ?, reps = ?, difficulty = ?, note = ?
+        WHERE user_id = ? AND exercise_name = ?
+    ''', exercises.values())
+
+    cursor.executemany('''
+        UPDATE current_workout_muscle_groups
+        SET pump = ?, soreness_before_workout = ?, recovery_before_workout = ?, note = ?
+        WHERE user_id = ? AND muscle_group = ?
+    ''', muscle_groups.values())
+
+    cursor.executemany('''
+        UPDATE current_workout_overall
+        SET duration_in_minutes = ?, workout_type = ?, performance = ?, fatigue_induced = ?, note = ?
+        WHERE user_id = ? AND workout_id = ?
+    ''', overall.values())
+
+    bump_curr_workout_version(cursor, user_id)
+
+@retry_on_busy
+def delete_curr_workout(user_id):
     conn = connect_db()
     cursor = conn.cursor()
 
-    cursor.execute('DELETE FROM current_workout_date')
-    cursor.execute('DELETE FROM current_workout_exercises')
-    cursor.execute('DELETE FROM current_workout_muscle_groups')
-    cursor.execute('DELETE FROM current_workout_overall')
+    clear_curr_workout(cursor, user_id)
 
+    bump_curr_workout_version(cursor, user_id)
     conn.commit()
-    conn.close()
 
-def add_exercise_to_log(exercise_id, weight, sets, reps):
+def clear_curr_workout(cursor, user_id):
+    for table_name in ('current_workout_date', 'current_workout_exercises', 'current_workout_muscle_groups', 'current_workout_overall'):
+        cursor.execute(f'''
+            DELETE FROM {table_name}
+            WHERE user_id = ?
+        ''', (user_id,))
+
+# Staged rows that become history when a workout is finished. Each exposes
+# staged_rowid so notes and rows can be matched up by position, and is bound
+# to the finishing user through the :user_id parameter.
+FINISHED_OVERALL_SQL = '''
+    SELECT workout_id AS staged_rowid, *
+    FROM current_workout_overall
+    WHERE workout_id = (
+        SELECT MIN(workout_id) FROM current_workout_overall
+        WHERE user_id = :user_id
+    )
+'''
+
+FINISHED_EXERCISES_SQL = '''
+    SELECT t1.rowid AS staged_rowid, t1.*, t2.id AS exercise_id
+    FROM current_workout_exercises t1
+    INNER JOIN (
+        SELECT name, MIN(id) AS id
+        FROM exercises
+        GROUP BY name
+    ) t2
+        ON t1.exercise_name = t2.name
+    WHERE t1.user_id = :user_id AND CAST(t1.sets AS INTEGER) > 0
+'''
+
+FINISHED_MUSCLE_GROUPS_SQL = '''
+    SELECT t1.rowid AS staged_rowid, t1.*, t2.id AS muscle_group_id
+    FROM current_workout_muscle_groups t1
+    INNER JOIN muscle_groups t2
+        ON t1.muscle_group = t2.muscle_group
+    WHERE t1.user_id = :user_id
+'''
+
+# The n-th staged row with a note gets the n-th note inserted for it
+STAGED_NOTE_ID_SQL = '''
+    CASE WHEN TRIM(COALESCE(note, '')) <> ''
+        THEN :first_note_id - 1 + SUM(TRIM(COALESCE(note, '')) <> '') OVER (ORDER BY staged_rowid)
+    END
+'''
+
+INSERT_STAGED_NOTES_SQL = '''
+    INSERT INTO notes (note, note_type)
+    SELECT TRIM(note), :note_type
+    FROM ({staged_rows_sql})
+    WHERE TRIM(COALESCE(note, '')) <> ''
+    ORDER BY staged_rowid
+'''
+
+# The history tables only accept ratings from 1 to 5, so values outside that
+# range (e.g. a "phenomenal" performance) are clamped
+INSERT_FINISHED_WORKOUT_SQL = f'''
+    INSERT INTO workout (user_id, date, duration_in_minutes, workout_type, performance, fatigue_induced, note_id)
+    SELECT
+        :user_id,
+        COALESCE((SELECT date FROM current_workout_date WHERE user_id = :user_id), :default_date),
+        COALESCE(CAST(NULLIF(duration_in_minutes, '') AS REAL), 0),
+        LOWER(COALESCE(workout_type, 'push')),
+        MIN(MAX(COALESCE(performance, 3), 1), 5),
+        MIN(MAX(COALESCE(fatigue_induced, 3), 1), 5),
+        {STAGED_NOTE_ID_SQL}
+    FROM ({FINISHED_OVERALL_SQL})
+'''
+
+INSERT_FINISHED_EXERCISES_SQL = f'''
+    INSERT INTO workout_exercises (weight, sets, reps, difficulty, exercise_id, note_id, workout_id)
+    SELECT
+        COALESCE(CAST(NULLIF(weight, '') AS REAL), 0),
+        CAST(sets AS INTEGER),
+        COALESCE(CAST(NULLIF(reps, '') AS INTEGER), 0),
+        MIN(MAX(COALESCE(difficulty, 3), 1), 5),
+        exercise_id,
+        {STAGED_NOTE_ID_SQL},
+        :workout_id
+    FROM ({FINISHED_EXERCISES_SQL})
+'''
+
+INSERT_FINISHED_MUSCLE_GROUPS_SQL = f'''
+    INSERT INTO muscle_groups_worked (pump, soreness_before_workout, recovery_before_workout, muscle_group_id, workout_id, note_id)
+    SELECT
+        MIN(MAX(COALESCE(pump, 3), 1), 5),
+        MIN(MAX(COALESCE(soreness_before_workout, 1), 1), 5),
+        MIN(MAX(COALESCE(recovery_before_workout, 5), 1), 5),
+        muscle_group_id,
+        :workout_id,
+        {STAGED_NOTE_ID_SQL}
+    FROM ({FINISHED_MUSCLE_GROUPS_SQL})
+'''
+
+def insert_staged_notes(cursor, user_id, staged_rows_sql, note_type):
+    cursor.execute(INSERT_STAGED_NOTES_SQL.format(staged_rows_sql=staged_rows_sql), {'user_id': user_id, 'note_type': note_type})
+
+    # Rows from a single INSERT ... SELECT get consecutive ids
+    return cursor.lastrowid - cursor.rowcount + 1
+
+@retry_on_busy
+def finish_curr_workout(user_id, default_date):
     conn = connect_db()
     cursor = conn.cursor()
 
-    sets = int(sets) if sets != '' else 0
-    sets = max(sets, 0)
-    reps = int(reps) if reps != '' else 0
-    reps = max(reps, 0)
+    with conn:
+        cursor.execute('BEGIN IMMEDIATE')
 
-    cursor.execute('''
-        SELECT name FROM exercises
-        WHERE id = ?
-    ''', (exercise_id,))
-    result = cursor.fetchone()
-    exercise_name = result[0] if result else None
+        if not curr_workout_exists(cursor, user_id):
+            return None
 
-    cursor.execute('''
-        INSERT INTO current_workout_exercises (exercise_name, weight, target_sets, target_reps, difficulty)
-        VALUES (?, ?, ?, ?, 3)
-    ''', (exercise_name, weight, sets, reps))
+        first_note_id = insert_staged_notes(cursor, user_id, FINISHED_OVERALL_SQL, 'workout')
+        cursor.execute(INSERT_FINISHED_WORKOUT_SQL, {'user_id': user_id, 'default_date': default_date, 'first_note_id': first_note_id})
+        workout_id = cursor.lastrowid
 
-    cursor.execute('''
-        SELECT primary_muscle_group_id FROM exercises
-        WHERE id = ?
-    ''', (exercise_id,))
-    result = cursor.fetchone()
-    primary_muscle_group_id = result[0] if result else None
+        first_note_id = insert_staged_notes(cursor, user_id, FINISHED_EXERCISES_SQL, 'workout exercises')
+        cursor.execute(INSERT_FINISHED_EXERCISES_SQL, {'user_id': user_id, 'workout_id': workout_id, 'first_note_id': first_note_id})
 
-    if primary_muscle_group_id:
-        cursor.execute('''
-            WITH primary_muscle_group_cte AS (
-                SELECT muscle_group
-                FROM muscle_groups
-                WHERE id = ?
-            )
-            SELECT muscle_group
-            FROM primary_muscle_group_cte
-            WHERE muscle_group NOT IN (
-                SELECT muscle_group
-                FROM current_workout_muscle_groups
-            )
-        ''', (primary_muscle_group_id,))
-        result = cursor.fetchone()
-        primary_muscle_group = result[0] if result else None
+        first_note_id = insert_staged_notes(cursor, user_id, FINISHED_MUSCLE_GROUPS_SQL, 'muscle groups')
+        cursor.execute(INSERT_FINISHED_MUSCLE_GROUPS_SQL, {'user_id': user_id, 'workout_id': workout_id, 'first_note_id': first_note_id})
 
-    conn.commit()
-    conn.close()
+        update_progress_rollups(cursor, workout_id)
+        update_recommendations(cursor, user_id, workout_id)
+        update_muscle_group_fatigue(cursor, user_id, workout_id)
 
-    if primary_muscle_group:
-        add_muscle_group_to_log(primary_muscle_group, 3, 0, 5)
+        clear_curr_workout(cursor, user_id)
+        bump_curr_workout_version(cursor, user_id)
+        bump_history_version(cursor, user_id)
 
+    return workout_id
 
+@retry_on_busy
+def bulk_add_exercises_to_log(user_id, exercises):
+    if not exercises:
+        return
 
-def add_muscle_group_to_log(muscle_group, pump, soreness_before_workout, recovery_before_workout):
+    conn = connect_db()
+    cursor = conn.cursor()
+
+    selection = []
+    for exercise_id, weight, sets, reps in exercises:
+        sets = int(sets) if sets != '' else 0
+        sets = max(sets, 0)
+        reps = int(reps) if reps != '' else 0
+        reps = max(reps, 0)
+        selection.extend((exercise_id, weight, sets, reps))
+
+    # The whole selection is passed as one VALUES list and joined against the
+    # catalog, so adding n exercises is two statements rather than 4n
+    selection_cte = f'''
+        WITH selection (exercise_id, weight, sets, reps) AS (
+            VALUES {', '.join(['(?, ?, ?, ?)'] * len(exercises))}
+        )
+    '''
+
+    with conn:
+        recovery_sql, recovery_params = recovery_cte(cursor, user_id)
+
+        cursor.execute(selection_cte + '''
+            INSERT OR IGNORE INTO current_workout_exercises (user_id, exercise_name, weight, target_sets, target_reps, difficulty)
+            SELECT ?, t2.name, t1.weight, t1.sets, t1.reps, 3
+            FROM selection t1
+            INNER JOIN exercises t2
+                ON t1.exercise_id = t2.id
+        ''', (*selection, user_id))
+
+        cursor.execute(selection_cte + f''', {recovery_sql}
+            INSERT OR IGNORE INTO current_workout_muscle_groups (user_id, muscle_group, pump, soreness_before_workout, recovery_before_workout)
+            SELECT DISTINCT ?, t3.muscle_group, 3, 0, COALESCE(t4.recovery_before_workout, 5)
+            FROM selection t1
+            INNER JOIN exercises t2
+                ON t1.exercise_id = t2.id
+            INNER JOIN muscle_groups t3
+                ON t2.primary_muscle_group_id = t3.id
+            LEFT JOIN recovery t4
+                ON t4.muscle_group_id = t3.id
+        ''', (*selection, *recovery_params, user_id))
+
+        bump_curr_workout_version(cursor, user_id)
+
+@retry_on_busy
+def add_muscle_group_to_log(user_id, muscle_group, pump, soreness_before_workout, recovery_before_workout):
     conn = connect_db()
     cursor = conn.cursor()
 
     cursor.execute('''
-        INSERT INTO current_workout_muscle_groups (muscle_group, pump, soreness_before_workout, recovery_before_workout)
-        VALUES (?, ?, ?, ?)
-    ''', (muscle_group, pump, soreness_before_workout, recovery_before_workout))
+        INSERT OR IGNORE INTO current_workout_muscle_groups (user_id, muscle_group, pump, soreness_before_workout, recovery_before_workout)
+        VALUES (?, ?, ?, ?, ?)
+    ''', (user_id, muscle_group, pump, soreness_before_workout, recovery_before_workout))
 
+    bump_curr_workout_version(cursor, user_id)
     conn.commit()
-    conn.close()
 
-def add_overall_workout_to_log(duration, workout_type, performance, fatigue_induced):
+@retry_on_busy
+def add_overall_workout_to_log(user_id, duration, workout_type, performance, fatigue_induced):
     conn = connect_db()
     cursor = conn.cursor()
 
     cursor.execute('''
-        INSERT INTO current_workout_overall (duration_in_minutes, workout_type, performance, fatigue_induced)
-        VALUES (?, ?, ?, ?)
-    ''', (duration, workout_type, performance, fatigue_induced))
+        INSERT INTO current_workout_overall (user_id, duration_in_minutes, workout_type, performance, fatigue_induced)
+        VALUES (?, ?, ?, ?, ?)
+    ''', (user_id, duration, workout_type, performance, fatigue_induced))
 
-    conn.commit()
-    conn.close()
\ No newline at end of file
+    bump_curr_workout_version(cursor, user_id)
+    conn.commit()
\ No newline at end of file
@@ -0,0 +1,146 @@
+import bisect
+import collections
+import re
+import sqlite3
+import threading
+import time
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+SLOW_QUERY_SECONDS = 0.01
+SLOW_QUERY_SAMPLES = 100
+
+_lock = threading.Lock()
+_histograms = {}
+_counters = collections.Counter()
+slow_queries = collections.deque(maxlen=SLOW_QUERY_SAMPLES)
+
+class Histogram:
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.bucket_counts = [0] * (len(buckets) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.bucket_counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.total += value
+        self.count += 1
+
+def observe(name, labels, value):
+    key = (name, tuple(sorted(labels.items())))
+    with _lock:
+        histogram = _histograms.get(key)
+        if histogram is None:
+            histogram = _histograms[key] = Histogram()
+        histogram.observe(value)
+
+def increment(name, labels=None, amount=1):
+    with _lock:
+        _counters[(name, tuple(sorted((labels or {}).items())))] += amount
+
+_STATEMENT_TABLE = re.compile(r'\b(?:FROM|INTO|UPDATE|TABLE)\s+(\w+)', re.IGNORECASE)
+
+def statement_label(sql):
+    # Groups statements by verb and first table so the label set stays small
+    words = sql.split(None, 1)
+    verb = words[0].upper() if words else ''
+    table = _STATEMENT_TABLE.search(sql)
+    return f"{verb} {table.group(1)}" if table else verb
+
+def record_statement(sql, seconds):
+    observe('sqlite_statement_duration_seconds', {'statement': statement_label(sql)}, seconds)
+    if seconds >= SLOW_QUERY_SECONDS:
+        slow_queries.append({
+            'statement': ' '.join(sql.split()),
+            'seconds': round(seconds, 6),
+            'at': time.time()
+        })
+
+class InstrumentedCursor(sqlite3.Cursor):
+    def execute(self, sql, parameters=()):
+        start = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            record_statement(sql, time.perf_counter() - start)
+
+    def executemany(self, sql, seq_of_parameters):
+        start = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            record_statement(sql, time.perf_counter() - start)
+
+    def executescript(self, sql_script):
+        start = time.perf_counter()
+        try:
+            return super().executescript(sql_script)
+        finally:
+            record_statement('SCRIPT', time.perf_counter() - start)
+
+class InstrumentedConnection(sqlite3.Connection):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # The trace callback also sees statements the cursor wrapper cannot,
+        # such as each statement inside executescript and implicit BEGINs
+        self.set_trace_callback(lambda statement: increment('sqlite_statements_traced_total'))
+
+    def cursor(self, factory=InstrumentedCursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+def format_labels(labels):
+    if not labels:
+        return ''
+    escaped = (f'{key}="{str(value).replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"' for key, value in labels)
+    return '{' + ','.join(escaped) + '}'
+
+def render_prometheus(extra_counters=None):
+    with _lock:
+        histograms = {key: (list(h.bucket_counts), h.total, h.count, h.buckets) for key, h in _histograms.items()}
+        counters = dict(_counters)
+    for name, value in (extra_counters or {}).items():
+        counters[(name, ())] = value
+
+    lines = []
+    seen_types = set()
+    for (name, labels), (bucket_counts, total, count, buckets) in sorted(histograms.items()):
+        if name not in seen_types:
+            lines.append(f'# TYPE {name} histogram')
+            seen_types.add(name)
+        cumulative = 0
+        for bound, bucket_count in zip(list(buckets) + ['+Inf'], bucket_counts):
+            cumulative += bucket_count
+            lines.append(f'{name}_bucket{format_labels(labels + (("le", bound),))} {cumulative}')
+        lines.append(f'{name}_sum{format_labels(labels)} {total}')
+        lines.append(f'{name}_count{format_labels(labels)} {count}')
+
+    for (name, labels), value in sorted(counters.items()):
+        if name not in seen_types:
+            lines.append(f'# TYPE {name} counter')
+            seen_types.add(name)
+        lines.append(f'{name}{format_labels(labels)} {value}')
+
+    return '\n'.join(lines) + '\n'
+
+def init_app(app):
+    from flask import g, request
+
+    @app.before_request
+    def start_request_timer():
+        g.request_start = time.perf_counter()
+
+    @app.after_request
+    def record_request(response):
+        start = g.pop('request_start', None)
+        if start is not None:
+            route = request.url_rule.rule if request.url_rule else 'unmatched'
+            observe('http_request_duration_seconds', {'route': route, 'method': request.method}, time.perf_counter() - start)
+            increment('http_responses_total', {'route': route, 'status': response.status_code})
+        return response
@@ -0,0 +1,171 @@
+from database import bump_user_data_versions, connect_db
+
+# Estimated one-rep max, shared with analytics.py so /progress and the
+# analytics PRs agree. A single is its own 1RM; sets past MAX_E1RM_REPS say
+# too little about a max to estimate one (Brzycki divides by zero at 37
+# reps), so they get none.
+EPLEY_REPS_DIVISOR = 30.0
+MAX_E1RM_REPS = 20
+
+def e1rm_sql(weight, reps):
+    return f'''
+        CASE
+            WHEN {reps} = 1 THEN {weight}
+            WHEN {reps} BETWEEN 2 AND {MAX_E1RM_REPS} THEN {weight} * (1 + {reps} / {EPLEY_REPS_DIVISOR})
+        END
+    '''
+
+# Rollups are keyed by the first day of their period; weeks start on Monday
+PERIOD_STARTS = {
+    'day': 't2.date',
+    'week': "date(t2.date, '-6 days', 'weekday 1')"
+}
+
+def update_progress_rollups(cursor, workout_id=None):
+    # Folds one finished workout (or, with no id, the whole history) into the
+    # rollup tables so /progress never has to aggregate the raw history
+    if workout_id is None:
+        workout_filter, params = 't2.id IS NOT NULL', ()
+    else:
+        workout_filter, params = 't2.id = ?', (workout_id,)
+
+    for period, period_start in PERIOD_STARTS.items():
+        # best_weight and best_reps are taken from the row with the highest
+        # estimate, which SQLite guarantees for a lone MAX() aggregate. A
+        # period with no estimate at all is stored as 0.
+        cursor.execute(f'''
+            INSERT INTO exercise_progress (user_id, exercise_id, period, period_start, volume, best_e1rm, best_weight, best_reps, sessions)
+            SELECT
+                t2.user_id, t1.exercise_id, '{period}', {period_start},
+                SUM(t1.weight * t1.sets * t1.reps),
+                COALESCE(MAX({e1rm_sql('t1.weight', 't1.reps')}), 0), t1.weight, t1.reps,
+                COUNT(DISTINCT t1.workout_id)
+            FROM workout_exercises t1
+            INNER JOIN workout t2
+                ON t1.workout_id = t2.id
+            WHERE {workout_filter}
+            GROUP BY t2.user_id, t1.exercise_id, {period_start}
+            ON CONFLICT (user_id, exercise_id, period, period_start) DO UPDATE
+            SET volume = volume + excluded.volume,
+                best_weight = CASE WHEN excluded.best_e1rm > best_e1rm THEN excluded.best_weight ELSE best_weight END,
+                best_reps = CASE WHEN excluded.best_e1rm > best_e1rm THEN excluded.best_reps ELSE best_reps END,
+                best_e1rm = MAX(best_e1rm, excluded.best_e1rm),
+                sessions = sessions + excluded.sessions
+        ''', params)
+
+        cursor.execute(f'''
+            INSERT INTO muscle_group_progress (user_id, muscle_group_id, period, period_start, volume, sets, sessions)
+            SELECT
+                t2.user_id, t3.primary_muscle_group_id, '{period}', {period_start},
+                SUM(t1.weight * t1.sets * t1.reps),
+                SUM(t1.sets),
+                COUNT(DISTINCT t1.workout_id)
+            FROM workout_exercises t1
+            INNER JOIN workout t2
+                ON t1.workout_id = t2.id
+            INNER JOIN exercises t3
+                ON t1.exercise_id = t3.id
+            WHERE {workout_filter}
+            GROUP BY t2.user_id, t3.primary_muscle_group_id, {period_start}
+            ON CONFLICT (user_id, muscle_group_id, period, period_start) DO UPDATE
+            SET volume = volume + excluded.volume,
+                sets = sets + excluded.sets,
+                sessions = sessions + excluded.sessions
+        ''', params)
+
+def rebuild_progress_rollups():
+    conn = connect_db()
+    cursor = conn.cursor()
+
+    with conn:
+        cursor.execute('DELETE FROM exercise_progress')
+        cursor.execute('DELETE FROM muscle_group_progress')
+        update_progress_rollups(cursor)
+        # /progress is cached against each user's history version
+        bump_user_data_versions(cursor, 'workout', 'history:')
+
+def get_progress_catalog(user_id):
+    conn = connect_db()
+    cursor = conn.cursor()
+
+    cursor.execute('''
+        SELECT t1.id, t1.name
+        FROM exercises t1
+        WHERE EXISTS (
+            SELECT 1
+            FROM exercise_progress t2
+            WHERE t2.user_id = ? AND t2.exercise_id = t1.id
+        )
+        ORDER BY t1.name
+    ''', (user_id,))
+    exercises = [{'id': row[0], 'name': row[1]} for row in cursor.fetchall()]
+
+    cursor.execute('''
+        SELECT t1.id, t1.muscle_group
+        FROM muscle_groups t1
+        WHERE EXISTS (
+            SELECT 1
+            FROM muscle_group_progress t2
+            WHERE t2.user_id = ? AND t2.muscle_group_id = t1.id
+        )
+        ORDER BY t1.muscle_group
+    ''', (user_id,))
+    muscle_groups = [{'id': row[0], 'muscle_group': row[1]} for row in cursor.fetchall()]
+
+    return {
+        'exercises': exercises,
+        'muscle_groups': muscle_groups
+    }
+
+def get_exercise_progress(user_id, exercise_id, period='week'):
+    conn = connect_db()
+    cursor = conn.cursor()
+
+    cursor.execute('''
+        SELECT period_start, volume, best_e1rm, best_weight, best_reps, sessions
+        FROM exercise_progress
+        WHERE user_id = ? AND exercise_id = ? AND period = ?
+        ORDER BY period_start
+    ''', (user_id, exercise_id, period))
+
+    progress = []
+    for row in cursor.fetchall():
+        period_start, volume, best_e1rm, best_weight, best_reps, sessions = row
+        has_e1rm = best_e1rm > 0
+        progress.append({
+            'period_start': period_start,
+            'volume': volume,
+            'best_e1rm': round(best_e1rm, 1) if has_e1rm else None,
+            'best_weight': best_weight if has_e1rm else None,
+            'best_reps': best_reps if has_e1rm else None,
+            'sessions': sessions
+        })
+
+    return progress
+
+def get_muscle_group_progress(user_id, muscle_group_id, period='week'):
+    conn = connect_db()
+    cursor = conn.cursor()
+
+    cursor.execute('''
+        SELECT period_start, volume, sets, sessions
+        FROM muscle_group_progress
+        WHERE user_id = ? AND muscle_group_id = ? AND period = ?
+        ORDER BY period_start
+    ''', (user_id, muscle_group_id, period))
+
+    progress = []
+    for row in cursor.fetchall():
+        period_start, volume, sets, sessions = row
+        progress.append({
+            'period_start': period_start,
+            'volume': volume,
+            'sets': sets,
+            'sessions': sessions
+        })
+
+    return progress
+
+if __name__ == '__main__':
+    rebuild_progress_rollups()
+    print("Progress rollups rebuilt successfully!")
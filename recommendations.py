@@ -0,0 +1,127 @@
+import json
+
+from database import connect_db
+
+# Each lifter's last few sessions of every exercise are kept with the
+# suggestion for the next one, so seeding a day is a join against this table
+# rather than a scan of workout_exercises
+RECENT_SESSIONS = 5
+WEIGHT_STEP = 2.5
+WEIGHT_INCREASE = 0.025
+DELOAD_FACTOR = 0.9
+# Hard sessions in a row, without the weight going up, before a deload
+STALL_SESSIONS = 3
+
+def round_weight(weight):
+    return round(weight / WEIGHT_STEP) * WEIGHT_STEP
+
+def weight_trend(sessions):
+    # Least-squares change in weight per session
+    if len(sessions) < 2:
+        return 0.0
+
+    weights = [session[1] or 0 for session in sessions]
+    mean_x = (len(weights) - 1) / 2
+    mean_y = sum(weights) / len(weights)
+    covariance = sum((x - mean_x) * (y - mean_y) for x, y in enumerate(weights))
+    variance = sum((x - mean_x) ** 2 for x in range(len(weights)))
+    return covariance / variance
+
+def recommend_next(sessions):
+    # Double progression driven by the difficulty rating: easy sessions add
+    # weight, medium ones add a rep, hard ones are repeated and a run of hard
+    # sessions that isn't moving the weight up is deloaded
+    _, weight, sets, reps, difficulty = sessions[-1]
+
+    stalled = (
+        len(sessions) >= STALL_SESSIONS
+        and all(session[4] >= 4 for session in sessions[-STALL_SESSIONS:])
+        and weight_trend(sessions[-STALL_SESSIONS:]) <= 0
+    )
+
+    if not weight:
+        # Bodyweight or timed exercises only progress by reps
+        return None, sets, reps + 1 if difficulty <= 3 else reps
+    if difficulty == 5 or stalled:
+        return round_weight(weight * DELOAD_FACTOR), sets, reps
+    if difficulty <= 2:
+        return weight + max(WEIGHT_STEP, round_weight(weight * WEIGHT_INCREASE)), sets, reps
+    if difficulty == 3:
+        return weight, sets, reps + 1
+    return weight, sets, reps
+
+def fold_session(recent_sessions, session):
+    # Sessions are kept in date order, so a backdated workout still lands in
+    # the right place (or drops off if it is older than all of them)
+    recent_sessions = sorted(recent_sessions + [session], key=lambda recent_session: recent_session[0])
+    return recent_sessions[-RECENT_SESSIONS:]
+
+def recommendation_row(user_id, exercise_id, recent_sessions):
+    weight, sets, reps = recommend_next(recent_sessions)
+    return (user_id, exercise_id, json.dumps(recent_sessions), weight_trend(recent_sessions), weight, sets, reps)
+
+def save_recommendations(cursor, rows):
+    cursor.executemany('''
+        INSERT INTO exercise_recommendations (user_id, exercise_id, recent_sessions, weight_trend, weight, sets, reps)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT (user_id, exercise_id) DO UPDATE
+        SET recent_sessions = excluded.recent_sessions,
+            weight_trend = excluded.weight_trend,
+            weight = excluded.weight,
+            sets = excluded.sets,
+            reps = excluded.reps
+    ''', rows)
+
+def update_recommendations(cursor, user_id, workout_id):
+    # Folds one finished workout into the state of the exercises it contains
+    cursor.execute('''
+        SELECT t1.exercise_id, t2.date, t1.weight, t1.sets, t1.reps, t1.difficulty, t3.recent_sessions
+        FROM workout_exercises t1
+        INNER JOIN workout t2
+            ON t1.workout_id = t2.id
+        LEFT JOIN exercise_recommendations t3
+            ON t3.user_id = t2.user_id AND t3.exercise_id = t1.exercise_id
+        WHERE t1.workout_id = ?
+        ORDER BY t1.id
+    ''', (workout_id,))
+
+    states = {}
+    for exercise_id, workout_date, weight, sets, reps, difficulty, recent_sessions in cursor.fetchall():
+        if exercise_id not in states:
+            states[exercise_id] = json.loads(recent_sessions) if recent_sessions else []
+        states[exercise_id] = fold_session(states[exercise_id], [workout_date, weight, sets, reps, difficulty])
+
+    save_recommendations(cursor, [
+        recommendation_row(user_id, exercise_id, recent_sessions)
+        for exercise_id, recent_sessions in states.items()
+    ])
+
+def rebuild_recommendations():
+    conn = connect_db()
+    cursor = conn.cursor()
+
+    with conn:
+        cursor.execute('DELETE FROM exercise_recommendations')
+        cursor.execute('''
+            SELECT t2.user_id, t1.exercise_id, t2.date, t1.weight, t1.sets, t1.reps, t1.difficulty
+            FROM workout_exercises t1
+            INNER JOIN workout t2
+                ON t1.workout_id = t2.id
+            ORDER BY t2.date, t2.id, t1.id
+        ''')
+
+        states = {}
+        for user_id, exercise_id, workout_date, weight, sets, reps, difficulty in cursor:
+            recent_sessions = states.setdefault((user_id, exercise_id), [])
+            recent_sessions.append([workout_date, weight, sets, reps, difficulty])
+            if len(recent_sessions) > RECENT_SESSIONS:
+                del recent_sessions[0]
+
+        save_recommendations(cursor, [
+            recommendation_row(user_id, exercise_id, recent_sessions)
+            for (user_id, exercise_id), recent_sessions in states.items()
+        ])
+
+if __name__ == '__main__':
+    rebuild_recommendations()
+    print("Exercise recommendations rebuilt successfully!")
@@ -0,0 +1,148 @@
+from datetime import date
+
+from database import connect_db
+
+# Every set adds to the fatigue of the muscle groups it trains, weighted by
+# its difficulty, and fatigue halves every FATIGUE_HALF_LIFE_DAYS. Only the
+# fatigue as of the last workout is stored; decay up to a given day is
+# applied when reading, so the table changes only when workouts are finished.
+FATIGUE_HALF_LIFE_DAYS = 2.0
+# Share of a set's load that lands on each secondary muscle group
+SECONDARY_WEIGHT = 0.5
+# Fatigue that costs one point of pre-workout recovery; 5 is fully recovered
+FATIGUE_PER_RECOVERY_POINT = 4.0
+FULL_RECOVERY = 5
+
+WORKOUT_LOAD_SQL = '''
+    SELECT t3.user_id, t3.date, t3.id AS workout_id, t4.muscle_group_id, SUM(t4.load) AS load
+    FROM workout t3
+    INNER JOIN (
+        SELECT t1.workout_id, t2.primary_muscle_group_id AS muscle_group_id, t1.sets * t1.difficulty / 3.0 AS load
+        FROM workout_exercises t1
+        INNER JOIN exercises t2
+            ON t1.exercise_id = t2.id
+        UNION ALL
+        SELECT t1.workout_id, t2.secondary_muscle_group_id, t1.sets * t1.difficulty / 3.0 * :secondary_weight
+        FROM workout_exercises t1
+        INNER JOIN exercise_secondary_muscle_groups t2
+            ON t1.exercise_id = t2.exercise_id
+    ) t4
+        ON t4.workout_id = t3.id
+    WHERE {workout_filter}
+    GROUP BY t3.id, t4.muscle_group_id
+    ORDER BY t3.date, t3.id
+'''
+
+def decay(fatigue, from_date, to_date):
+    days = (date.fromisoformat(to_date) - date.fromisoformat(from_date)).days
+    return fatigue * 0.5 ** (days / FATIGUE_HALF_LIFE_DAYS)
+
+def fold_load(state, load, workout_date):
+    # state is (fatigue, updated_on) or None. A backdated workout has its
+    # load decayed forward instead of moving the state back in time.
+    if state is None:
+        return load, workout_date
+
+    fatigue, updated_on = state
+    if workout_date >= updated_on:
+        return decay(fatigue, updated_on, workout_date) + load, workout_date
+    return fatigue + decay(load, workout_date, updated_on), updated_on
+
+def recovery_score(fatigue):
+    return max(1, FULL_RECOVERY - int(fatigue // FATIGUE_PER_RECOVERY_POINT))
+
+def save_fatigue(cursor, rows):
+    cursor.executemany('''
+        INSERT INTO muscle_group_fatigue (user_id, muscle_group_id, fatigue, updated_on)
+        VALUES (?, ?, ?, ?)
+        ON CONFLICT (user_id, muscle_group_id) DO UPDATE
+        SET fatigue = excluded.fatigue,
+            updated_on = excluded.updated_on
+    ''', rows)
+
+def read_fatigue(cursor, user_id):
+    cursor.execute('''
+        SELECT muscle_group_id, fatigue, updated_on
+        FROM muscle_group_fatigue
+        WHERE user_id = ?
+    ''', (user_id,))
+    return {muscle_group_id: (fatigue, updated_on) for muscle_group_id, fatigue, updated_on in cursor.fetchall()}
+
+def update_muscle_group_fatigue(cursor, user_id, workout_id):
+    # Folds one finished workout into the user's fatigue state
+    cursor.execute(WORKOUT_LOAD_SQL.format(workout_filter='t3.id = :workout_id'), {
+        'workout_id': workout_id,
+        'secondary_weight': SECONDARY_WEIGHT
+    })
+    loads = cursor.fetchall()
+
+    states = read_fatigue(cursor, user_id)
+    rows = []
+    for _, workout_date, _, muscle_group_id, load in loads:
+        fatigue, updated_on = fold_load(states.get(muscle_group_id), load, workout_date)
+        rows.append((user_id, muscle_group_id, fatigue, updated_on))
+    save_fatigue(cursor, rows)
+
+def rebuild_muscle_group_fatigue():
+    conn = connect_db()
+    cursor = conn.cursor()
+
+    with conn:
+        cursor.execute('DELETE FROM muscle_group_fatigue')
+        cursor.execute(WORKOUT_LOAD_SQL.format(workout_filter='1'), {'secondary_weight': SECONDARY_WEIGHT})
+
+        states = {}
+        for user_id, workout_date, _, muscle_group_id, load in cursor:
+            key = (user_id, muscle_group_id)
+            states[key] = fold_load(states.get(key), load, workout_date)
+
+        save_fatigue(cursor, [(*key, *state) for key, state in states.items()])
+
+def get_recovery_scores(cursor, user_id, on_date=None):
+    # {muscle_group_id: pre-workout recovery} for muscle groups with any
+    # history; the rest are fully recovered
+    on_date = on_date or date.today().isoformat()
+
+    scores = {}
+    for muscle_group_id, (fatigue, updated_on) in read_fatigue(cursor, user_id).items():
+        scores[muscle_group_id] = recovery_score(decay(fatigue, updated_on, max(on_date, updated_on)))
+    return scores
+
+def recovery_cte(cursor, user_id, on_date=None):
+    # A "recovery (muscle_group_id, recovery_before_workout)" table for a
+    # WITH clause. The (NULL, NULL) row keeps VALUES valid with no history.
+    scores = get_recovery_scores(cursor, user_id, on_date)
+    values = ', '.join(['(?, ?)'] * len(scores) + ['(NULL, NULL)'])
+    params = [value for score in scores.items() for value in score]
+    return f'recovery (muscle_group_id, recovery_before_workout) AS (VALUES {values})', params
+
+def get_muscle_group_recovery(user_id, on_date=None):
+    conn = connect_db()
+    cursor = conn.cursor()
+
+    on_date = on_date or date.today().isoformat()
+    states = read_fatigue(cursor, user_id)
+
+    cursor.execute('''
+        SELECT id, muscle_group
+        FROM muscle_groups
+        ORDER BY muscle_group
+    ''')
+
+    recovery = []
+    for muscle_group_id, muscle_group in cursor.fetchall():
+        fatigue, updated_on = states.get(muscle_group_id, (0.0, on_date))
+        fatigue = decay(fatigue, updated_on, max(on_date, updated_on))
+        recovery.append({
+            'muscle_group_id': muscle_group_id,
+            'muscle_group': muscle_group,
+            'fatigue': round(fatigue, 2),
+            'last_trained': updated_on if muscle_group_id in states else None,
+            'recovery': recovery_score(fatigue)
+        })
+
+    return recovery
+
+if __name__ == '__main__':
+    rebuild_muscle_group_fatigue()
+    print("Muscle group fatigue rebuilt successfully!")
@@ -0,0 +1,61 @@
+import threading
+
+from database import connect_db
+from weekly_schedule import SCHEDULE_DAYS, get_planned_workouts, get_schedule_version
+
+# Like catalog_cache.py, entries carry the version they were built from and
+# are rebuilt once data_versions moves past it. Schedules and rendered days
+# are both stamped with the user's schedule version; a day renders nothing
+# but its scheduled exercises, so catalog imports leave them cached.
+_schedules = {}
+_fragments = {}
+_lock = threading.Lock()
+_stats = {'schedule_hits': 0, 'schedule_misses': 0, 'fragment_hits': 0, 'fragment_misses': 0}
+
+def _count(stat):
+    with _lock:
+        _stats[stat] += 1
+
+def get_schedule(user_id):
+    conn = connect_db()
+    cursor = conn.cursor()
+
+    version = get_schedule_version(cursor, user_id)
+    entry = _schedules.get(user_id)
+    if entry is not None and entry[0] == version:
+        _count('schedule_hits')
+        return entry[1]
+
+    schedule_data = get_planned_workouts(user_id)
+    _schedules[user_id] = (version, schedule_data)
+    _count('schedule_misses')
+    return schedule_data
+
+def get_schedule_fragments(user_id, render_day):
+    # Returns the rendered HTML for each day; render_day(day, exercises) is
+    # only called for days whose cached fragment is out of date
+    conn = connect_db()
+    cursor = conn.cursor()
+
+    version = get_schedule_version(cursor, user_id)
+    fragments = []
+    for day in SCHEDULE_DAYS:
+        entry = _fragments.get((user_id, day))
+        if entry is not None and entry[0] == version:
+            _count('fragment_hits')
+            fragments.append(entry[1])
+            continue
+
+        fragment = render_day(day, get_schedule(user_id)[day])
+        _fragments[(user_id, day)] = (version, fragment)
+        _count('fragment_misses')
+        fragments.append(fragment)
+
+    return fragments
+
+def schedule_cache_stats():
+    with _lock:
+        stats = dict(_stats)
+    stats['schedules'] = len(_schedules)
+    stats['fragments'] = len(_fragments)
+    return stats
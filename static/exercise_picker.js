@@ -0,0 +1,174 @@
+// Exercise pickers fetch the library a page at a time from the search API
+// instead of having the whole catalog rendered into every page. A picker is
+// a .exercise-picker element holding a search input, a list and a "More"
+// button; its data attributes say which inputs each exercise gets.
+document.addEventListener('DOMContentLoaded', function() {
+    const SEARCH_DELAY_MS = 150;
+
+    const FIELD_PLACEHOLDERS = {
+        weight: 'Weight',
+        sets: 'Sets',
+        reps: 'Reps'
+    };
+
+    function isLogged(exerciseName) {
+        return Array.from(document.querySelectorAll('[data-row-key]')).some(row => row.dataset.rowKey === 'exercise:' + exerciseName);
+    }
+
+    function renderSelectable(exercise, fields) {
+        const item = document.createElement('li');
+        item.className = 'list-group-item';
+        item.dataset.exerciseId = exercise.id;
+
+        const checkbox = document.createElement('input');
+        checkbox.type = 'checkbox';
+        checkbox.name = 'selected_exercises';
+        checkbox.value = exercise.id;
+        item.appendChild(checkbox);
+        item.appendChild(document.createTextNode(' ' + exercise.name + ' - ' + exercise.primary_muscle_group));
+
+        const inputs = document.createElement('div');
+        const exerciseId = document.createElement('input');
+        exerciseId.type = 'number';
+        exerciseId.name = 'exercise_id';
+        exerciseId.value = exercise.id;
+        exerciseId.style.display = 'none';
+        inputs.appendChild(exerciseId);
+
+        fields.forEach(field => {
+            const input = document.createElement('input');
+            input.type = 'number';
+            input.name = field;
+            input.placeholder = FIELD_PLACEHOLDERS[field];
+            input.min = field === 'weight' ? '0' : '1';
+            input.style.width = '75px';
+            inputs.appendChild(input);
+        });
+        item.appendChild(inputs);
+
+        return item;
+    }
+
+    function renderEntry(exercise) {
+        const item = document.createElement('li');
+        item.className = 'list-group-item';
+        item.dataset.exerciseId = exercise.id;
+
+        const name = document.createElement('strong');
+        name.textContent = exercise.name;
+        item.appendChild(name);
+
+        let details = ' - Primary: ' + exercise.primary_muscle_group;
+        if (exercise.secondary_muscle_groups.length > 0) {
+            details += ', Secondary: ' + exercise.secondary_muscle_groups.join(', ');
+        }
+        if (exercise.exercise_type) {
+            details += ' (' + exercise.exercise_type + ')';
+        }
+        item.appendChild(document.createTextNode(details));
+
+        return item;
+    }
+
+    function isChosen(item) {
+        const checkbox = item.querySelector('input[type="checkbox"]');
+        if (checkbox && checkbox.checked) {
+            return true;
+        }
+        return Array.from(item.querySelectorAll('input[type="number"]:not([name="exercise_id"])')).some(input => input.value !== '');
+    }
+
+    function setUpPicker(picker) {
+        const searchInput = picker.querySelector('.exercise-search');
+        const list = picker.querySelector('.exercise-results');
+        const moreButton = picker.querySelector('.exercise-more');
+        const fields = picker.dataset.fields ? picker.dataset.fields.split(',') : [];
+        const selectable = picker.dataset.selectable === 'true';
+        const excludeLogged = 'excludeLogged' in picker.dataset;
+
+        let query = '';
+        let nextOffset = 0;
+        let request = 0;
+        let loaded = false;
+        let searchTimer = null;
+
+        function load(append) {
+            const thisRequest = ++request;
+            const offset = append ? nextOffset : 0;
+            const url = picker.dataset.searchUrl + '?q=' + encodeURIComponent(query) + '&offset=' + offset;
+
+            return fetch(url)
+            .then(response => {
+                if (response.status === 200) {
+                    return response.json();
+                } else {
+                    throw new Error('Search failed');
+                }
+            })
+            .then(page => {
+                // A newer search may have been sent while this one was running
+                if (thisRequest !== request) {
+                    return;
+                }
+
+                // Exercises already picked stay in the list across searches
+                if (!append) {
+                    Array.from(list.children).forEach(item => {
+                        if (!isChosen(item)) {
+                            item.remove();
+                        }
+                    });
+                }
+                const shown = new Set(Array.from(list.children).map(item => item.dataset.exerciseId));
+
+                page.results.forEach(exercise => {
+                    if (shown.has(String(exercise.id)) || (excludeLogged && isLogged(exercise.name))) {
+                        return;
+                    }
+                    list.appendChild(selectable ? renderSelectable(exercise, fields) : renderEntry(exercise));
+                });
+
+                nextOffset = page.offset + page.results.length;
+                moreButton.style.display = nextOffset < page.total ? '' : 'none';
+            })
+            .catch((error) => {
+                console.error('Error:', error);
+            });
+        }
+
+        function loadOnce() {
+            if (!loaded) {
+                loaded = true;
+                load(false);
+            }
+        }
+
+        searchInput.addEventListener('input', function() {
+            clearTimeout(searchTimer);
+            searchTimer = setTimeout(() => {
+                query = searchInput.value.trim();
+                loaded = true;
+                load(false);
+            }, SEARCH_DELAY_MS);
+        });
+
+        moreButton.addEventListener('click', function() {
+            load(true);
+        });
+
+        // Pickers inside modals only search once they are first shown
+        if (window.IntersectionObserver) {
+            const observer = new IntersectionObserver(entries => {
+                if (entries.some(entry => entry.isIntersecting)) {
+                    observer.disconnect();
+                    loadOnce();
+                }
+            });
+            observer.observe(picker);
+        } else {
+            loadOnce();
+        }
+    }
+
+    document.querySelectorAll('.exercise-picker').forEach(setUpPicker);
+});
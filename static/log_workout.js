@@ -1,21 +1,31 @@
+const liveSyncScript = document.currentScript;
+
 document.addEventListener('DOMContentLoaded', function() {
-    function debounce(func, delay) {
-        let debounceTimer;
-        return function() {
-            const context = this;
-            const args = arguments;
-            clearTimeout(debounceTimer);
-            debounceTimer = setTimeout(() => func.apply(context, args), delay);
-        };
+    // Edits are buffered per row and sent together, so a burst of changes
+    // costs one request and one commit instead of one per field
+    const FLUSH_INTERVAL_MS = 2000;
+    let pendingPatches = new Map();
+    // The batch currently on its way to the server, if any
+    let inFlight = Promise.resolve();
+
+    function queuePatch(key, patch) {
+        pendingPatches.set(key, Object.assign({}, patch));
     }
 
-    function sendUpdate(endpoint, data) {
-        return fetch(endpoint, {
+    function flushPatches(keepalive = false) {
+        if (pendingPatches.size === 0) {
+            return Promise.resolve();
+        }
+        const batch = pendingPatches;
+        pendingPatches = new Map();
+
+        inFlight = fetch('/update_curr_workout_batch', {
             method: 'POST',
+            keepalive: keepalive,
             headers: {
                 'Content-Type': 'application/json'
             },
-            body: JSON.stringify(data)
+            body: JSON.stringify({ patches: Array.from(batch.values()) })
         })
         .then(response => {
             if (response.status === 200) {
@@ -24,27 +34,62 @@ document.addEventListener('DOMContentLoaded', function() {
                 throw new Error('Update failed');
             }
         })
+        .catch((error) => {
+            // Retry on the next flush unless the row was edited again meanwhile
+            batch.forEach((patch, key) => {
+                if (!pendingPatches.has(key)) {
+                    pendingPatches.set(key, patch);
+                }
+            });
+            console.error('Error:', error);
+        });
+        return inFlight;
     }
 
+    setInterval(flushPatches, FLUSH_INTERVAL_MS);
+    document.addEventListener('visibilitychange', function() {
+        if (document.visibilityState === 'hidden') {
+            flushPatches(true);
+        }
+    });
+    window.addEventListener('pagehide', function() {
+        flushPatches(true);
+    });
+    // Forms (finish, clear, delete...) read the staged workout on the
+    // server, so they are held until every buffered edit has been written.
+    // Listening on the document also covers the delete forms of rows added
+    // by live sync.
+    document.addEventListener('submit', function(event) {
+        const form = event.target;
+        const submitter = event.submitter;
+        event.preventDefault();
+
+        Promise.all([inFlight, flushPatches()]).then(() => {
+            if (pendingPatches.size > 0) {
+                alert('Your latest changes could not be saved. Please try again.');
+                return;
+            }
+            // form.submit() ignores the button, so carry its formaction over
+            if (submitter && submitter.hasAttribute('formaction')) {
+                form.action = submitter.formAction;
+            }
+            form.submit();
+        });
+    });
+
     const workoutDateInput = document.getElementById('workout-date');
     if (workoutDateInput) {
 
-        workoutDateInput.addEventListener('input', debounce(function() {
-            const oldValue = this.defaultValue;
-            sendUpdate('/update_curr_workout_date', {
+        workoutDateInput.addEventListener('input', function() {
+            queuePatch('date', {
+                type: 'date',
                 workout_date: this.value
-            })
-            .catch((error) => {
-                this.value = oldValue;
-                alert(error.message);
-                console.error('Error:', error);
-                throw error;
             });
-        }, 500));
+        });
     }
 
 
-    difficultyMapping = {
+    const difficultyMapping = {
         'very-easy': 1,
         'easy': 2,
         'medium': 3,
@@ -52,61 +97,6 @@ document.addEventListener('DOMContentLoaded', function() {
         'very-hard': 5
     };
 
-    const exerciseContainers = document.querySelectorAll('.exercise-info');
-    exerciseContainers.forEach(container => {
-        const exerciseName = container.querySelector('p').innerText.trim();
-        const weightInput = container.querySelector('input[name="weight_used"]');
-        const setsInput = container.querySelector('input[name="sets_completed"]');
-        const repsInput = container.querySelector('input[name="reps_completed"]');
-        const difficultySelect = container.querySelector('select[name="difficulty"]');
-        const notesTextarea = container.querySelector('textarea[name="exercise_notes"]');
-        
-        let exercise_info = {
-            exercise_name: exerciseName,
-            weight_used: weightInput ? weightInput.value : null,
-            sets_completed: setsInput ? setsInput.value : null,
-            reps_completed: repsInput ? repsInput.value : null,
-            difficulty: difficultySelect ? difficultyMapping[difficultySelect.value] : null,
-            exercise_notes: notesTextarea ? notesTextarea.value : null
-        }
-
-        if (weightInput) {
-            weightInput.addEventListener('change', debounce(function() {
-                exercise_info.weight_used = this.value;
-                sendUpdate('/update_curr_workout_exercise', exercise_info);
-            }, 500));
-        }
-
-        if (setsInput) {
-            setsInput.addEventListener('change', debounce(function() {
-                exercise_info.sets_completed = this.value;
-                sendUpdate('/update_curr_workout_exercise', exercise_info);
-            }, 500));
-        }
-        
-        if (repsInput) {
-            repsInput.addEventListener('change', debounce(function() {
-                exercise_info.reps_completed = this.value;
-                sendUpdate('/update_curr_workout_exercise', exercise_info);
-            }, 500));
-        }
-        
-        if (difficultySelect) {
-            difficultySelect.addEventListener('change', debounce(function() {
-                exercise_info.difficulty = difficultyMapping[this.value];
-                sendUpdate('/update_curr_workout_exercise', exercise_info);
-            }, 500));
-        }
-        
-        if (notesTextarea) {
-            notesTextarea.addEventListener('change', debounce(function() {
-                exercise_info.exercise_notes = this.value.trim();
-                sendUpdate('/update_curr_workout_exercise', exercise_info);
-            }, 500));
-        }
-    })
-
-
     const pumpMapping = {
         'none': 1,
         'low': 2,
@@ -132,51 +122,6 @@ document.addEventListener('DOMContentLoaded', function() {
         'overly-recovered': 6
     };
 
-    const muscleGroupContainers = document.querySelectorAll('.muscle-group-info');
-    muscleGroupContainers.forEach(container => {
-        const muscleGroupName = container.querySelector('p').innerText.trim();
-        const pumpLevelSelect = container.querySelector('select[name="pump_level"]');
-        const sorenessLevelSelect = container.querySelector('select[name="pre_workout_soreness"]');
-        const recoveryLevelSelect = container.querySelector('select[name="pre_workout_recovery"]');
-        const notesTextarea = container.querySelector('textarea[name="muscle_group_notes"]');
-
-        let muscle_info = {
-            muscle_group_name: muscleGroupName,
-            pump_level: pumpLevelSelect ? pumpMapping[pumpLevelSelect.value] : null,
-            pre_workout_soreness: sorenessLevelSelect ? sorenessMapping[sorenessLevelSelect.value] : null,
-            pre_workout_recovery: recoveryLevelSelect ? recoveryMapping[recoveryLevelSelect.value] : null,
-            muscle_group_notes: notesTextarea ? notesTextarea.value : null
-        }
-
-        if (pumpLevelSelect) {
-            pumpLevelSelect.addEventListener('change', debounce(function() {
-                muscle_info.pump_level = pumpMapping[this.value];
-                sendUpdate('/update_curr_workout_muscle_group', muscle_info);
-            }, 500));
-        }
-        
-        if (sorenessLevelSelect) {
-            sorenessLevelSelect.addEventListener('change', debounce(function() {
-                muscle_info.pre_workout_soreness = sorenessMapping[this.value];
-                sendUpdate('/update_curr_workout_muscle_group', muscle_info);
-            }, 500));
-        }
-        
-        if (recoveryLevelSelect) {
-            recoveryLevelSelect.addEventListener('change', debounce(function() {
-                muscle_info.pre_workout_recovery = recoveryMapping[this.value];
-                sendUpdate('/update_curr_workout_muscle_group', muscle_info);
-            }, 500));
-        }
-        
-        if (notesTextarea) {
-            notesTextarea.addEventListener('change', debounce(function() {
-                muscle_info.muscle_group_notes = this.value.trim();
-                sendUpdate('/update_curr_workout_muscle_group', muscle_info);
-            }, 500));
-        }
-    })
-
     const performanceMapping = {
         'very-poor': 1,
         'poor': 2,
@@ -194,58 +139,188 @@ document.addEventListener('DOMContentLoaded', function() {
         'severe': 5
     };
 
-    const overallWorkoutContainers = document.querySelectorAll('.overall-workout-info');
-    overallWorkoutContainers.forEach(container => {
-        const workoutId = container.querySelector('input[name="workout_id"]')?.value;
-        const durationInput = container.querySelector('input[name="workout_duration"]');
-        const typeSelect = container.querySelector('select[name="workout_type"]');
-        const performanceSelect = container.querySelector('select[name="performance_rating"]');
-        const fatigueSelect = container.querySelector('select[name="fatigue_induced"]');
-        const notesTextarea = container.querySelector('textarea[name="workout_notes"]');
-
-        workout_info = {
-            workout_id: workoutId,
-            workout_duration: durationInput ? durationInput.value : null,
-            workout_type: typeSelect ? typeSelect.value : null,
-            performance_rating: performanceSelect ? performanceMapping[performanceSelect.value] : null,
-            fatigue_induced: fatigueSelect ? fatigueInducedMapping[fatigueSelect.value] : null,
-            workout_notes: notesTextarea ? notesTextarea.value : null
+    // Selects whose options stand for the numbers stored in the database
+    const fieldMappings = {
+        difficulty: difficultyMapping,
+        pump_level: pumpMapping,
+        pre_workout_soreness: sorenessMapping,
+        pre_workout_recovery: recoveryMapping,
+        performance_rating: performanceMapping,
+        fatigue_induced: fatigueInducedMapping
+    };
+
+    function fieldValue(container, name) {
+        const field = container.querySelector('[name="' + name + '"]');
+        if (!field) {
+            return null;
+        }
+        return fieldMappings[name] ? fieldMappings[name][field.value] : field.value;
+    }
+
+    // Each row's patch is read from its fields when one of them changes, so
+    // values written into the row by live sync are sent back unchanged
+    const rowPatches = {
+        exercise: container => ({
+            type: 'exercise',
+            exercise_name: container.querySelector('p').innerText.trim(),
+            weight_used: fieldValue(container, 'weight_used'),
+            sets_completed: fieldValue(container, 'sets_completed'),
+            reps_completed: fieldValue(container, 'reps_completed'),
+            difficulty: fieldValue(container, 'difficulty'),
+            exercise_notes: fieldValue(container, 'exercise_notes').trim()
+        }),
+        muscle_group: container => ({
+            type: 'muscle_group',
+            muscle_group_name: container.querySelector('p').innerText.trim(),
+            pump_level: fieldValue(container, 'pump_level'),
+            pre_workout_soreness: fieldValue(container, 'pre_workout_soreness'),
+            pre_workout_recovery: fieldValue(container, 'pre_workout_recovery'),
+            muscle_group_notes: fieldValue(container, 'muscle_group_notes').trim()
+        }),
+        overall: container => ({
+            type: 'overall',
+            workout_id: fieldValue(container, 'workout_id'),
+            workout_duration: fieldValue(container, 'workout_duration'),
+            workout_type: fieldValue(container, 'workout_type'),
+            performance_rating: fieldValue(container, 'performance_rating'),
+            fatigue_induced: fieldValue(container, 'fatigue_induced'),
+            workout_notes: fieldValue(container, 'workout_notes').trim()
+        })
+    };
+
+    function rowKind(container) {
+        const key = container.dataset.rowKey;
+        return key.slice(0, key.indexOf(':'));
+    }
+
+    function bindRow(container) {
+        const key = container.dataset.rowKey;
+        const buildPatch = rowPatches[rowKind(container)];
+        container.querySelectorAll('input:not([type="hidden"]), select, textarea').forEach(field => {
+            field.addEventListener('change', function() {
+                queuePatch(key, buildPatch(container));
+            });
+        });
+    }
+
+    document.querySelectorAll('[data-row-key]').forEach(bindRow);
+
+
+    // Live sync: the server streams the staged rows that changed, from this
+    // or any other open copy of the page, and they are patched in place
+    const rowLists = {
+        exercise: document.getElementById('log-exercises'),
+        muscle_group: document.getElementById('log-muscle-groups'),
+        overall: document.getElementById('log-overall')
+    };
+
+    const emptyMessages = {
+        exercise: document.getElementById('no-exercises'),
+        muscle_group: document.getElementById('no-muscle-groups')
+    };
+
+    function findRow(key) {
+        return Array.from(document.querySelectorAll('[data-row-key]')).find(row => row.dataset.rowKey === key);
+    }
+
+    function updateEmptyMessage(kind) {
+        if (!emptyMessages[kind]) {
+            return;
         }
+        const hasRows = rowLists[kind].querySelector('[data-row-key]') !== null;
+        rowLists[kind].style.display = hasRows ? '' : 'none';
+        emptyMessages[kind].style.display = hasRows ? 'none' : '';
+    }
 
-        if (durationInput) {
-            durationInput.addEventListener('change', debounce(function() {
-                workout_info.workout_duration = this.value;
-                sendUpdate('/update_curr_workout_overall', workout_info);
-            }, 500));
+    function setFieldValue(field, name, value) {
+        // Never overwrite what is being typed here
+        if (!field || field === document.activeElement) {
+            return;
         }
-        
-        if (typeSelect) {
-            typeSelect.addEventListener('change', debounce(function() {
-                workout_info.workout_type = this.value;
-                sendUpdate('/update_curr_workout_overall', workout_info);
-            }, 500));
+        if (fieldMappings[name]) {
+            value = Object.keys(fieldMappings[name]).find(option => fieldMappings[name][option] === value);
         }
-        
-        if (performanceSelect) {
-            performanceSelect.addEventListener('change', debounce(function() {
-                workout_info.performance_rating = performanceMapping[this.value];
-                sendUpdate('/update_curr_workout_overall', workout_info);
-            }, 500));
+        value = value ?? '';
+        if (field.tagName === 'SELECT' && !Array.from(field.options).some(option => option.value === value)) {
+            return;
         }
-        
-        if (fatigueSelect) {
-            fatigueSelect.addEventListener('change', debounce(function() {
-                workout_info.fatigue_induced = fatigueInducedMapping[this.value];
-                sendUpdate('/update_curr_workout_overall', workout_info);
-            }, 500));
+        field.value = value;
+    }
+
+    function insertRow(change) {
+        const template = document.createElement('template');
+        template.innerHTML = change.html;
+        const row = template.content.querySelector('[data-row-key]');
+        rowLists[change.kind].appendChild(row);
+        bindRow(row);
+        updateEmptyMessage(change.kind);
+    }
+
+    function removeRow(key) {
+        const row = findRow(key);
+        if (row) {
+            const kind = rowKind(row);
+            row.remove();
+            updateEmptyMessage(kind);
         }
-        
-        if (notesTextarea) {
-            notesTextarea.addEventListener('change', debounce(function() {
-                workout_info.workout_notes = this.value.trim();
-                sendUpdate('/update_curr_workout_overall', workout_info);
-            }, 500));
+    }
+
+    function applyWorkoutUpdate(event) {
+        const update = JSON.parse(event.data);
+
+        // A reset lists every staged row; anything else shown is stale
+        if (update.reset) {
+            const staged = new Set(update.changed.map(change => change.key));
+            document.querySelectorAll('[data-row-key]').forEach(row => {
+                if (!staged.has(row.dataset.rowKey)) {
+                    removeRow(row.dataset.rowKey);
+                }
+            });
         }
-    })
+        update.removed.forEach(removeRow);
+
+        update.changed.forEach(change => {
+            // Local edits not yet sent win over what the server has
+            if (pendingPatches.has(change.key)) {
+                return;
+            }
+            if (change.kind === 'date') {
+                setFieldValue(workoutDateInput, 'workout_date', change.values.workout_date);
+                return;
+            }
+
+            const row = findRow(change.key);
+            if (!row) {
+                if (change.html) {
+                    insertRow(change);
+                }
+                return;
+            }
+            Object.entries(change.values).forEach(([name, value]) => {
+                setFieldValue(row.querySelector('[name="' + name + '"]'), name, value);
+            });
+        });
+    }
+
+    // EventSource reconnects by itself after a dropped connection, but not
+    // after an error response, e.g. when the server has no stream slots free
+    const STREAM_RETRY_MS = 30000;
+
+    function openStream(version) {
+        const source = new EventSource(liveSyncScript.dataset.streamUrl + '?version=' + encodeURIComponent(version));
+        source.addEventListener('workout', function(event) {
+            version = event.lastEventId || version;
+            applyWorkoutUpdate(event);
+        });
+        source.addEventListener('error', function() {
+            if (source.readyState === EventSource.CLOSED) {
+                setTimeout(() => openStream(version), STREAM_RETRY_MS);
+            }
+        });
+    }
+
+    if (liveSyncScript && window.EventSource) {
+        openStream(liveSyncScript.dataset.version);
+    }
 
-})
\ No newline at end of file
+})
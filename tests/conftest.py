@@ -0,0 +1,25 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database
+
+@pytest.fixture
+def cursor(tmp_path, monkeypatch):
+    # A fresh, fully migrated database file for each test, on a connection
+    # of this thread's own
+    monkeypatch.setattr(database, 'DATABASE', str(tmp_path / 'weight_training_tracker.db'))
+    monkeypatch.setattr(database, '_thread_local', database.threading.local())
+    database.create_tables()
+    conn = database.connect_db()
+    yield conn.cursor()
+    conn.close()
+
+@pytest.fixture
+def baseline(cursor):
+    # The seed catalog and default user's weekly schedule
+    database.load_data_from_folder(database.SEED_FOLDER)
+    return cursor
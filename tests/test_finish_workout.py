@@ -0,0 +1,104 @@
+import log_workouts
+
+USER_ID = 1
+
+def start_workout(workout_date):
+    # Monday's schedule seeds squat, romanaian deadlift, lunges, calf
+    # raises and plank, and the muscle groups they train
+    page = log_workouts.load_log_workout_page(USER_ID, workout_date, 'Monday')
+    return page['overall'][0][0]
+
+def finished_exercises(cursor, workout_id):
+    cursor.execute('''
+        SELECT t2.name, t1.weight, t1.sets, t1.reps, t1.difficulty, t3.note
+        FROM workout_exercises t1
+        INNER JOIN exercises t2
+            ON t1.exercise_id = t2.id
+        LEFT JOIN notes t3
+            ON t1.note_id = t3.id
+        WHERE t1.workout_id = ?
+        ORDER BY t1.id
+    ''', (workout_id,))
+    return cursor.fetchall()
+
+def finished_muscle_groups(cursor, workout_id):
+    cursor.execute('''
+        SELECT t2.muscle_group, t1.pump, t1.soreness_before_workout, t1.recovery_before_workout, t3.note
+        FROM muscle_groups_worked t1
+        INNER JOIN muscle_groups t2
+            ON t1.muscle_group_id = t2.id
+        LEFT JOIN notes t3
+            ON t1.note_id = t3.id
+        WHERE t1.workout_id = ?
+    ''', (workout_id,))
+    return {row[0]: row[1:] for row in cursor.fetchall()}
+
+def finished_workout(cursor, workout_id):
+    cursor.execute('''
+        SELECT t1.date, t1.duration_in_minutes, t1.workout_type, t1.performance, t1.fatigue_induced, t2.note
+        FROM workout t1
+        LEFT JOIN notes t2
+            ON t1.note_id = t2.id
+        WHERE t1.id = ?
+    ''', (workout_id,))
+    return cursor.fetchone()
+
+def test_notes_follow_their_rows(baseline):
+    cursor = baseline
+    # A finished workout first, so the next one's notes don't start at id 1
+    start_workout('2024-03-04')
+    log_workouts.update_curr_workout_exercise(USER_ID, 'squat', '100', '3', '5', 3, 'first')
+    log_workouts.finish_curr_workout(USER_ID, '2024-03-04')
+
+    overall_workout_id = start_workout('2024-03-11')
+    log_workouts.update_curr_workout_exercise(USER_ID, 'squat', '100', '3', '5', 3, '  heavy  ')
+    log_workouts.update_curr_workout_exercise(USER_ID, 'romanaian deadlift', '80', '3', '8', 3, '')
+    log_workouts.update_curr_workout_exercise(USER_ID, 'lunges', '20', '3', '10', 3, '   ')
+    log_workouts.update_curr_workout_exercise(USER_ID, 'calf raises', '40', '3', '15', 3, 'slow')
+    log_workouts.update_curr_workout_muscle_group(USER_ID, 'calves', 4, 1, 5, 'burning')
+    log_workouts.update_curr_workout_muscle_group(USER_ID, 'glutes', 3, 1, 5, 'pumped')
+    log_workouts.update_curr_workout_overall(USER_ID, overall_workout_id, '60', 'Legs', 4, 3, 'good day')
+    workout_id = log_workouts.finish_curr_workout(USER_ID, '2024-03-11')
+
+    assert [(row[0], row[5]) for row in finished_exercises(cursor, workout_id)] == [
+        ('squat', 'heavy'),
+        ('romanaian deadlift', None),
+        ('lunges', None),
+        ('calf raises', 'slow')
+    ]
+    muscle_groups = finished_muscle_groups(cursor, workout_id)
+    assert muscle_groups['calves'][3] == 'burning'
+    assert muscle_groups['glutes'][3] == 'pumped'
+    assert muscle_groups['quadriceps'][3] is None
+    assert finished_workout(cursor, workout_id) == ('2024-03-11', 60.0, 'legs', 4, 3, 'good day')
+
+    cursor.execute('SELECT note_type, COUNT(*) FROM notes GROUP BY note_type ORDER BY note_type')
+    assert cursor.fetchall() == [('muscle groups', 2), ('workout', 1), ('workout exercises', 3)]
+
+def test_ratings_are_clamped(baseline):
+    cursor = baseline
+    overall_workout_id = start_workout('2024-03-04')
+    log_workouts.update_curr_workout_exercise(USER_ID, 'squat', '100', '3', '5', 9, '')
+    log_workouts.update_curr_workout_exercise(USER_ID, 'lunges', '20', '3', '10', 0, '')
+    log_workouts.update_curr_workout_muscle_group(USER_ID, 'glutes', 6, -1, 0, '')
+    log_workouts.update_curr_workout_overall(USER_ID, overall_workout_id, '', 'Legs', 7, 0, '')
+    workout_id = log_workouts.finish_curr_workout(USER_ID, '2024-03-04')
+
+    assert {row[0]: row[4] for row in finished_exercises(cursor, workout_id)} == {'squat': 5, 'lunges': 1}
+    assert finished_muscle_groups(cursor, workout_id)['glutes'][:3] == (5, 1, 1)
+    assert finished_workout(cursor, workout_id)[1:5] == (0, 'legs', 5, 1)
+
+def test_exercises_without_sets_are_dropped(baseline):
+    cursor = baseline
+    start_workout('2024-03-04')
+    log_workouts.update_curr_workout_exercise(USER_ID, 'squat', '100', '3', '5', 3, '')
+    log_workouts.update_curr_workout_exercise(USER_ID, 'romanaian deadlift', '80', '0', '8', 3, 'skipped')
+    log_workouts.update_curr_workout_exercise(USER_ID, 'lunges', '20', '', '10', 3, '')
+    workout_id = log_workouts.finish_curr_workout(USER_ID, '2024-03-04')
+
+    assert finished_exercises(cursor, workout_id) == [('squat', 100.0, 3, 5, 3, None)]
+    # The dropped exercise's note isn't kept either
+    cursor.execute('SELECT COUNT(*) FROM notes')
+    assert cursor.fetchone()[0] == 0
+    # and the current workout is cleared
+    assert not log_workouts.curr_workout_exists(cursor, USER_ID)
@@ -0,0 +1,42 @@
+import database
+
+def write_csv(tmp_path, table_name, text):
+    path = tmp_path / f'{table_name}.csv'
+    path.write_text(text)
+    return str(path)
+
+def test_one_column_table_loads_every_row(cursor, tmp_path):
+    path = write_csv(tmp_path, 'muscle_groups', 'muscle_group\nquads\nhamstrings\ncalves\n')
+
+    assert database.load_csv(cursor, 'muscle_groups', path) == (3, 0)
+    cursor.execute('SELECT muscle_group FROM muscle_groups ORDER BY id')
+    assert [row[0] for row in cursor.fetchall()] == ['quads', 'hamstrings', 'calves']
+
+def test_rows_with_only_their_required_columns_load(cursor, tmp_path):
+    path = write_csv(tmp_path, 'weekly_schedule', 'exercise_id,weekday_int,target_sets,target_reps_or_duration\n1,2,,\n')
+    assert database.load_csv(cursor, 'weekly_schedule', path) == (1, 0)
+
+    path = write_csv(tmp_path, 'workout', 'date,duration_in_minutes,workout_type,performance,fatigue_induced,note_id\n2024-01-01,45,legs,3,3,\n')
+    assert database.load_csv(cursor, 'workout', path) == (1, 0)
+
+def test_placeholder_rows_are_skipped(cursor, tmp_path):
+    path = write_csv(tmp_path, 'weekly_schedule', 'weekday_int,exercise_id,target_sets,target_reps_or_duration\n0,,,\n1,1,4,10\n')
+
+    assert database.load_csv(cursor, 'weekly_schedule', path) == (1, 1)
+    cursor.execute('SELECT weekday_int, exercise_id, target_sets, target_reps_or_duration FROM weekly_schedule')
+    assert cursor.fetchall() == [(1, 1, 4, 10)]
+
+def test_rows_missing_a_not_null_column_are_skipped(cursor, tmp_path):
+    path = write_csv(tmp_path, 'muscle_groups', 'id,muscle_group\n1,quads\n')
+    database.load_csv(cursor, 'muscle_groups', path)
+    path = write_csv(tmp_path, 'exercises', 'id,name,exercise_type,primary_muscle_group_id\n1,squat,compound,1\n2,lunge,,1\n')
+
+    assert database.load_csv(cursor, 'exercises', path) == (1, 1)
+
+def test_baseline_data_loads(cursor):
+    database.load_data_from_folder(database.SEED_FOLDER)
+
+    cursor.execute('SELECT COUNT(*) FROM weekly_schedule WHERE exercise_id IS NULL')
+    assert cursor.fetchone()[0] == 0
+    cursor.execute('SELECT COUNT(*) FROM exercises')
+    assert cursor.fetchone()[0] > 0
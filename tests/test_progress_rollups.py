@@ -0,0 +1,68 @@
+import log_workouts
+import progress
+
+USER_ID = 1
+
+# (date, [(exercise, weight, sets, reps)]). Two sessions share a day and
+# several share a week, one is backdated, and some sets have no e1RM.
+WORKOUTS = [
+    ('2024-03-04', [('squat', '100', '3', '5'), ('lunges', '20', '3', '12')]),
+    ('2024-03-04', [('squat', '110', '1', '1'), ('calf raises', '40', '3', '25')]),
+    ('2024-03-06', [('squat', '95', '4', '8'), ('romanaian deadlift', '80', '3', '8')]),
+    ('2024-03-11', [('squat', '105', '3', '5'), ('plank', '', '3', '60')]),
+    ('2024-02-26', [('squat', '90', '3', '10'), ('lunges', '25', '3', '10')]),
+]
+
+def log_workout(workout_date, exercises):
+    log_workouts.load_log_workout_page(USER_ID, workout_date, 'Monday')
+    for exercise_name, weight, sets, reps in exercises:
+        log_workouts.update_curr_workout_exercise(USER_ID, exercise_name, weight, sets, reps, 3, '')
+    return log_workouts.finish_curr_workout(USER_ID, workout_date)
+
+def rollups(cursor):
+    cursor.execute('''
+        SELECT user_id, exercise_id, period, period_start, volume, best_e1rm, best_weight, best_reps, sessions
+        FROM exercise_progress
+        ORDER BY user_id, exercise_id, period, period_start
+    ''')
+    exercise_rows = cursor.fetchall()
+    cursor.execute('''
+        SELECT user_id, muscle_group_id, period, period_start, volume, sets, sessions
+        FROM muscle_group_progress
+        ORDER BY user_id, muscle_group_id, period, period_start
+    ''')
+    return exercise_rows, cursor.fetchall()
+
+def test_incremental_rollups_match_a_rebuild(baseline):
+    cursor = baseline
+    for workout_date, exercises in WORKOUTS:
+        log_workout(workout_date, exercises)
+    incremental = rollups(cursor)
+
+    progress.rebuild_progress_rollups()
+
+    assert rollups(cursor) == incremental
+    assert incremental[0] and incremental[1]
+
+def test_weekly_rollup_keeps_the_best_set(baseline):
+    for workout_date, exercises in WORKOUTS:
+        log_workout(workout_date, exercises)
+    cursor = baseline
+    cursor.execute("SELECT id FROM exercises WHERE name = 'squat'")
+    squat_id = cursor.fetchone()[0]
+
+    weeks = {row['period_start']: row for row in progress.get_exercise_progress(USER_ID, squat_id)}
+    # Epley ranks 95x8 (120.3) above 100x5 (116.7) and the 110 single
+    assert weeks['2024-03-04']['best_weight'] == 95
+    assert weeks['2024-03-04']['best_reps'] == 8
+    assert weeks['2024-03-04']['sessions'] == 3
+    assert weeks['2024-03-04']['volume'] == 100 * 3 * 5 + 110 * 1 * 1 + 95 * 4 * 8
+
+def test_sets_past_the_rep_cap_have_no_e1rm(baseline):
+    log_workout('2024-03-04', [('calf raises', '40', '3', '25')])
+    cursor = baseline
+    cursor.execute("SELECT id FROM exercises WHERE name = 'calf raises'")
+
+    [week] = progress.get_exercise_progress(USER_ID, cursor.fetchone()[0])
+    assert week['best_e1rm'] is None
+    assert week['volume'] == 40 * 3 * 25
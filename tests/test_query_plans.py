@@ -0,0 +1,79 @@
+import os
+import re
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database
+import log_workouts
+import recovery
+import workout_logs
+
+# The statements the logs page, seeding and finishing a workout run, taken
+# from the modules that run them. Each one has to be answered from indexes;
+# a plan that scans a history or per-user table means an index was dropped
+# or a query stopped matching one.
+HOT_QUERIES = {
+    'logs first page': workout_logs.WORKOUT_PAGE_SQL.format(workout_filter=workout_logs.FIRST_PAGE_FILTER),
+    'logs next page': workout_logs.WORKOUT_PAGE_SQL.format(workout_filter=workout_logs.NEXT_PAGE_FILTER),
+    'logs exercises': workout_logs.WORKOUT_EXERCISES_SQL.format(placeholders='?, ?, ?'),
+    'logs muscle groups': workout_logs.WORKOUT_MUSCLE_GROUPS_SQL.format(placeholders='?, ?, ?'),
+    'seed exercises': log_workouts.SEED_EXERCISES_SQL,
+    'seed muscle groups': log_workouts.SEED_MUSCLE_GROUPS_SQL.format(
+        recovery_sql='recovery (muscle_group_id, recovery_before_workout) AS (VALUES (?, ?), (NULL, NULL))'
+    ),
+    'finish workout notes': log_workouts.INSERT_STAGED_NOTES_SQL.format(staged_rows_sql=log_workouts.FINISHED_OVERALL_SQL),
+    'finish workout': log_workouts.INSERT_FINISHED_WORKOUT_SQL,
+    'finish exercise notes': log_workouts.INSERT_STAGED_NOTES_SQL.format(staged_rows_sql=log_workouts.FINISHED_EXERCISES_SQL),
+    'finish exercises': log_workouts.INSERT_FINISHED_EXERCISES_SQL,
+    'finish muscle group notes': log_workouts.INSERT_STAGED_NOTES_SQL.format(staged_rows_sql=log_workouts.FINISHED_MUSCLE_GROUPS_SQL),
+    'finish muscle groups': log_workouts.INSERT_FINISHED_MUSCLE_GROUPS_SQL,
+    'finish fatigue load': recovery.WORKOUT_LOAD_SQL.format(workout_filter='t3.id = :workout_id'),
+}
+
+INDEXED_ACCESS = re.compile(r'USING (COVERING )?INDEX|USING (INTEGER )?PRIMARY KEY')
+
+@pytest.fixture(scope='module')
+def cursor(tmp_path_factory):
+    # create_tables() runs the base schema and every migration on a fresh
+    # file, on a connection of this thread's own
+    with pytest.MonkeyPatch.context() as patch:
+        patch.setattr(database, 'DATABASE', str(tmp_path_factory.mktemp('query_plans') / 'weight_training_tracker.db'))
+        patch.setattr(database, '_thread_local', database.threading.local())
+        database.create_tables()
+        conn = database.connect_db()
+        yield conn.cursor()
+        conn.close()
+
+def query_plan(cursor, sql):
+    names = re.findall(r':(\w+)', sql)
+    params = dict.fromkeys(names) if names else [None] * sql.count('?')
+    cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+    return [row[3] for row in cursor.fetchall()]
+
+def scanned_tables(sql, plan):
+    # Plans name tables by their alias; scans of CTEs, subqueries and
+    # constant rows resolve to names that aren't tables
+    aliases = {alias: table for table, alias in re.findall(r'(?:FROM|JOIN)\s+(\w+)\s+(t\d+)\b', sql)}
+    for detail in plan:
+        match = re.match(r'SCAN (\w+)', detail)
+        if match:
+            yield aliases.get(match.group(1), match.group(1))
+
+def test_schema_is_migrated(cursor):
+    assert database.schema_is_current(cursor)
+
+@pytest.mark.parametrize('name', HOT_QUERIES)
+def test_hot_query_uses_an_index(cursor, name):
+    sql = HOT_QUERIES[name]
+    plan = query_plan(cursor, sql)
+
+    # The catalog is small and bounded, so a pass over it is fine
+    cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table'")
+    growing_tables = {row[0] for row in cursor.fetchall()} - set(database.CATALOG_TABLES)
+
+    scans = [table for table in scanned_tables(sql, plan) if table in growing_tables]
+    assert not scans, f'{name} scans {scans}: {plan}'
+    assert any(INDEXED_ACCESS.search(detail) for detail in plan), f'{name} uses no index: {plan}'
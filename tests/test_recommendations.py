@@ -0,0 +1,72 @@
+import log_workouts
+import recommendations
+from recommendations import recommend_next
+
+USER_ID = 1
+
+def session(weight, difficulty, reps=5, workout_date='2024-03-04'):
+    return [workout_date, weight, 3, reps, difficulty]
+
+def test_easy_session_adds_weight():
+    assert recommend_next([session(100, 2)]) == (102.5, 3, 5)
+    assert recommend_next([session(100, 1)]) == (102.5, 3, 5)
+    # Heavier lifts go up by a share of the weight, on the 2.5 grid
+    assert recommend_next([session(200, 2)]) == (205, 3, 5)
+
+def test_medium_session_adds_a_rep():
+    assert recommend_next([session(100, 3)]) == (100, 3, 6)
+
+def test_hard_session_is_repeated():
+    assert recommend_next([session(100, 4)]) == (100, 3, 5)
+
+def test_failed_session_is_deloaded():
+    assert recommend_next([session(100, 5)]) == (90, 3, 5)
+
+def test_stalled_run_of_hard_sessions_is_deloaded():
+    stalled = [session(100, 4, workout_date=f'2024-03-0{day}') for day in (1, 3, 5)]
+    assert recommend_next(stalled) == (90, 3, 5)
+
+    climbing = [session(weight, 4, workout_date=f'2024-03-0{day}') for weight, day in ((95, 1), (97.5, 3), (100, 5))]
+    assert recommend_next(climbing) == (100, 3, 5)
+
+def test_bodyweight_exercises_only_add_reps():
+    assert recommend_next([session(0, 2, reps=10)]) == (None, 3, 11)
+    assert recommend_next([session(None, 4, reps=10)]) == (None, 3, 10)
+
+def finish_squat(workout_date, weight, difficulty):
+    log_workouts.load_log_workout_page(USER_ID, workout_date, 'Monday')
+    log_workouts.update_curr_workout_exercise(USER_ID, 'squat', weight, '3', '5', difficulty, '')
+    log_workouts.finish_curr_workout(USER_ID, workout_date)
+
+def seeded_squat(workout_date):
+    page = log_workouts.load_log_workout_page(USER_ID, workout_date, 'Monday')
+    # (exercise_name, weight, sets, target_sets, reps, target_reps, ...)
+    return next(row for row in page['exercises'] if row[0] == 'squat')
+
+def test_next_session_is_seeded_from_the_recommendation(baseline):
+    finish_squat('2024-03-04', '100', 2)
+    squat = seeded_squat('2024-03-11')
+    assert (squat[1], squat[3], squat[5]) == (102.5, 3, 5)
+    log_workouts.delete_curr_workout(USER_ID)
+
+    finish_squat('2024-03-11', '102.5', 5)
+    squat = seeded_squat('2024-03-18')
+    assert squat[1] == 92.5
+
+def test_backdated_session_does_not_replace_the_latest(baseline):
+    finish_squat('2024-03-11', '100', 2)
+    finish_squat('2024-03-04', '90', 5)
+
+    assert seeded_squat('2024-03-18')[1] == 102.5
+
+def test_incremental_state_matches_a_rebuild(baseline):
+    cursor = baseline
+    for workout_date, weight, difficulty in (('2024-03-04', '100', 2), ('2024-03-11', '102.5', 4), ('2024-02-26', '95', 3), ('2024-03-18', '102.5', 4)):
+        finish_squat(workout_date, weight, difficulty)
+
+    query = 'SELECT * FROM exercise_recommendations ORDER BY user_id, exercise_id'
+    cursor.execute(query)
+    incremental = cursor.fetchall()
+    recommendations.rebuild_recommendations()
+    cursor.execute(query)
+    assert cursor.fetchall() == incremental
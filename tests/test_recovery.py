@@ -0,0 +1,100 @@
+import pytest
+
+import log_workouts
+import recovery
+from recovery import FATIGUE_HALF_LIFE_DAYS, SECONDARY_WEIGHT, decay, fold_load, recovery_score
+
+USER_ID = 1
+
+def test_fatigue_halves_every_half_life():
+    assert decay(8.0, '2024-03-04', '2024-03-04') == 8.0
+    assert decay(8.0, '2024-03-04', '2024-03-06') == pytest.approx(8.0 * 0.5 ** (2 / FATIGUE_HALF_LIFE_DAYS))
+    assert decay(8.0, '2024-03-04', '2024-03-08') == pytest.approx(decay(decay(8.0, '2024-03-04', '2024-03-06'), '2024-03-06', '2024-03-08'))
+
+def test_newer_session_decays_the_state_up_to_it():
+    assert fold_load(None, 6.0, '2024-03-04') == (6.0, '2024-03-04')
+    fatigue, updated_on = fold_load((8.0, '2024-03-04'), 6.0, '2024-03-06')
+    assert updated_on == '2024-03-06'
+    assert fatigue == pytest.approx(decay(8.0, '2024-03-04', '2024-03-06') + 6.0)
+
+def test_backdated_session_is_decayed_forward():
+    fatigue, updated_on = fold_load((8.0, '2024-03-06'), 6.0, '2024-03-04')
+    assert updated_on == '2024-03-06'
+    assert fatigue == pytest.approx(8.0 + decay(6.0, '2024-03-04', '2024-03-06'))
+
+def test_recovery_score_falls_with_fatigue():
+    assert recovery_score(0) == 5
+    assert recovery_score(recovery.FATIGUE_PER_RECOVERY_POINT) == 4
+    assert recovery_score(1000) == 1
+
+def finish_squat(workout_date, sets, difficulty):
+    log_workouts.load_log_workout_page(USER_ID, workout_date, 'Monday')
+    log_workouts.update_curr_workout_exercise(USER_ID, 'squat', '100', sets, '5', difficulty, '')
+    log_workouts.finish_curr_workout(USER_ID, workout_date)
+
+def squat_muscle_groups(cursor):
+    cursor.execute('''
+        SELECT t1.primary_muscle_group_id, t2.secondary_muscle_group_id
+        FROM exercises t1
+        LEFT JOIN exercise_secondary_muscle_groups t2
+            ON t2.exercise_id = t1.id
+        WHERE t1.name = 'squat'
+    ''')
+    rows = cursor.fetchall()
+    return rows[0][0], [row[1] for row in rows if row[1] is not None]
+
+def test_finished_workout_loads_primary_and_secondary_muscles(baseline):
+    cursor = baseline
+    finish_squat('2024-03-04', '6', 3)
+    primary, secondaries = squat_muscle_groups(cursor)
+    fatigue = recovery.read_fatigue(cursor, USER_ID)
+
+    assert fatigue[primary] == (pytest.approx(6.0), '2024-03-04')
+    assert secondaries
+    for muscle_group_id in secondaries:
+        assert fatigue[muscle_group_id] == (pytest.approx(6.0 * SECONDARY_WEIGHT), '2024-03-04')
+
+def test_state_follows_the_newest_session(baseline):
+    cursor = baseline
+    finish_squat('2024-03-04', '6', 3)
+    finish_squat('2024-03-08', '3', 3)
+    finish_squat('2024-03-06', '3', 3)
+    primary, _ = squat_muscle_groups(cursor)
+
+    fatigue, updated_on = recovery.read_fatigue(cursor, USER_ID)[primary]
+    assert updated_on == '2024-03-08'
+    expected = decay(6.0, '2024-03-04', '2024-03-08') + decay(3.0, '2024-03-06', '2024-03-08') + 3.0
+    assert fatigue == pytest.approx(expected)
+
+    # Reading decays the stored state up to the day asked about, but never
+    # back to before the newest session
+    scores = {row['muscle_group_id']: row for row in recovery.get_muscle_group_recovery(USER_ID, '2024-03-12')}
+    assert scores[primary]['fatigue'] == pytest.approx(round(decay(expected, '2024-03-08', '2024-03-12'), 2))
+    assert scores[primary]['last_trained'] == '2024-03-08'
+    scores = {row['muscle_group_id']: row for row in recovery.get_muscle_group_recovery(USER_ID, '2024-03-01')}
+    assert scores[primary]['fatigue'] == pytest.approx(round(expected, 2))
+
+def test_seeded_recovery_comes_from_the_model(baseline):
+    cursor = baseline
+    finish_squat('2024-03-04', '12', 5)
+    primary, _ = squat_muscle_groups(cursor)
+    cursor.execute('SELECT muscle_group FROM muscle_groups WHERE id = ?', (primary,))
+    primary_name = cursor.fetchone()[0]
+
+    page = log_workouts.load_log_workout_page(USER_ID, '2024-03-05', 'Monday')
+    seeded = {row[0]: row[3] for row in page['muscle_groups']}
+    fatigue = decay(12 * 5 / 3, '2024-03-04', '2024-03-05')
+    assert seeded[primary_name] == recovery_score(fatigue) < 5
+
+def test_incremental_state_matches_a_rebuild(baseline):
+    cursor = baseline
+    for workout_date, sets, difficulty in (('2024-03-04', '6', 3), ('2024-03-08', '3', 4), ('2024-03-06', '4', 2)):
+        finish_squat(workout_date, sets, difficulty)
+
+    incremental = recovery.read_fatigue(cursor, USER_ID)
+    recovery.rebuild_muscle_group_fatigue()
+    rebuilt = recovery.read_fatigue(cursor, USER_ID)
+
+    assert rebuilt.keys() == incremental.keys()
+    for muscle_group_id, (fatigue, updated_on) in incremental.items():
+        assert rebuilt[muscle_group_id] == (pytest.approx(fatigue), updated_on)
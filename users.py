@@ -0,0 +1,59 @@
+from database import connect_db, retry_on_busy
+from weekly_schedule import bump_schedule_version
+
+# Owns everything that existed before the app had users
+DEFAULT_USER_ID = 1
+
+def get_user_name(user_id):
+    conn = connect_db()
+    cursor = conn.cursor()
+
+    cursor.execute('''
+        SELECT name FROM users
+        WHERE id = ?
+    ''', (user_id,))
+    result = cursor.fetchone()
+
+    return result[0] if result else None
+
+def get_user_id(name):
+    conn = connect_db()
+    cursor = conn.cursor()
+
+    cursor.execute('''
+        SELECT id FROM users
+        WHERE name = ?
+    ''', (name,))
+    result = cursor.fetchone()
+
+    return result[0] if result else None
+
+@retry_on_busy
+def get_or_create_user(name):
+    conn = connect_db()
+    cursor = conn.cursor()
+
+    with conn:
+        cursor.execute('''
+            INSERT INTO users (name)
+            VALUES (?)
+            ON CONFLICT (name) DO NOTHING
+        ''', (name,))
+
+        # A new user starts from a copy of the default user's schedule
+        if cursor.rowcount:
+            user_id = cursor.lastrowid
+            cursor.execute('''
+                INSERT INTO weekly_schedule (user_id, weekday_int, exercise_id, target_sets, target_reps_or_duration)
+                SELECT ?, weekday_int, exercise_id, target_sets, target_reps_or_duration
+                FROM weekly_schedule
+                WHERE user_id = ?
+            ''', (user_id, DEFAULT_USER_ID))
+            bump_schedule_version(cursor, user_id)
+            return user_id
+
+    cursor.execute('''
+        SELECT id FROM users
+        WHERE name = ?
+    ''', (name,))
+    return cursor.fetchone()[0]
@@ -1,4 +1,8 @@
-from database import connect_db
+import logging
+
+from database import bump_data_version, connect_db, get_data_version, retry_on_busy
+
+logger = logging.getLogger(__name__)
 
 weekday_ints = {
     'Sunday': 0,
@@ -10,79 +14,91 @@ weekday_ints = {
     'Saturday': 6
 }
 
-def get_planned_workouts():
+weekday_names = {weekday_int: weekday for weekday, weekday_int in weekday_ints.items()}
+
+# Days in the order the schedule page shows them
+SCHEDULE_DAYS = ('Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday')
+
+# Each user's schedule has its own version in data_versions, bumped in the
+# same transaction as every change so cached copies can be checked cheaply
+def get_schedule_version(cursor, user_id):
+    return get_data_version(cursor, f'schedule:{user_id}')
+
+def bump_schedule_version(cursor, user_id):
+    bump_data_version(cursor, f'schedule:{user_id}')
+
+def get_planned_workouts(user_id):
     conn = connect_db()
     cursor = conn.cursor()
 
     cursor.execute('''
-        SELECT 
-            case 
-                when t1.weekday_int = 0 then 'Sunday'
-                when t1.weekday_int = 1 then 'Monday'
-                when t1.weekday_int = 2 then 'Tuesday'
-                when t1.weekday_int = 3 then 'Wednesday'
-                when t1.weekday_int = 4 then 'Thursday'
-                when t1.weekday_int = 5 then 'Friday'
-                when t1.weekday_int = 6 then 'Saturday'
-                end as weekday_name,
-            t2.name, t1.exercise_id, t1.target_sets, t1.target_reps_or_duration
+        SELECT t1.weekday_int, t2.name, t1.exercise_id, t1.target_sets, t1.target_reps_or_duration
         FROM weekly_schedule t1
         INNER JOIN exercises t2
             ON t1.exercise_id = t2.id
-    ''')
-
-    schedule_data = {
-        'Monday': [],
-        'Tuesday': [],
-        'Wednesday': [],
-        'Thursday': [],
-        'Friday': [],
-        'Saturday': [],
-        'Sunday': []
-    }
+        WHERE t1.user_id = ?
+        ORDER BY t1.weekday_int, t1.id
+    ''', (user_id,))
+
+    schedule_data = {weekday: [] for weekday in SCHEDULE_DAYS}
 
     for row in cursor.fetchall():
-        weekday_name, exercise_name, exercise_id, target_sets, target_reps_or_duration = row
-        schedule_data[weekday_name].append({
+        weekday_int, exercise_name, exercise_id, target_sets, target_reps_or_duration = row
+        schedule_data[weekday_names[weekday_int]].append({
             'exercise': exercise_name,
             'exercise_id': exercise_id,
             'sets': target_sets,
             'reps': target_reps_or_duration
         })
 
-    conn.close()
     return schedule_data
 
-def add_exercise_from_library(exercise_id, day_of_week, sets, reps):
+@retry_on_busy
+def bulk_add_exercises_from_library(user_id, day_of_week, exercises):
+    if not exercises:
+        return
+
     conn = connect_db()
     cursor = conn.cursor()
     weekday_int = weekday_ints[day_of_week]
 
-    sets = int(sets) if sets != '' else 0
-    sets = max(sets, 0)
-    reps = int(reps) if reps != '' else 0
-    reps = max(reps, 0)
+    selection = []
+    for exercise_id, sets, reps in exercises:
+        sets = int(sets) if sets != '' else 0
+        sets = max(sets, 0)
+        reps = int(reps) if reps != '' else 0
+        reps = max(reps, 0)
+        selection.extend((exercise_id, sets, reps))
 
-    cursor.execute('''
-        INSERT INTO weekly_schedule (weekday_int, exercise_id, target_sets, target_reps_or_duration)
-        VALUES (?, ?, ?, ?)
-    ''', (weekday_int, exercise_id, sets, reps))
-
-    conn.commit()
-    conn.close()
+    # WHERE true keeps SQLite from reading ON CONFLICT as a join constraint
+    with conn:
+        cursor.execute(f'''
+            WITH selection (exercise_id, sets, reps) AS (
+                VALUES {', '.join(['(?, ?, ?)'] * len(exercises))}
+            )
+            INSERT INTO weekly_schedule (user_id, weekday_int, exercise_id, target_sets, target_reps_or_duration)
+            SELECT ?, ?, t2.id, t1.sets, t1.reps
+            FROM selection t1
+            INNER JOIN exercises t2
+                ON t1.exercise_id = t2.id
+            WHERE true
+            ON CONFLICT (user_id, weekday_int, exercise_id) DO UPDATE
+            SET target_sets = excluded.target_sets, target_reps_or_duration = excluded.target_reps_or_duration
+        ''', (*selection, user_id, weekday_int))
+        bump_schedule_version(cursor, user_id)
 
-def delete_exercise_from_schedule(exercise_id, day_of_week):
+@retry_on_busy
+def delete_exercise_from_schedule(user_id, exercise_id, day_of_week):
     conn = connect_db()
     cursor = conn.cursor()
-    print(f"day_of_week: {day_of_week}")
-    print(f"exercise_id: {exercise_id}")
+    logger.debug(f"Deleting exercise {exercise_id} from {day_of_week}")
     weekday_int = weekday_ints[day_of_week]
 
     cursor.execute('''
         DELETE FROM weekly_schedule
-        WHERE weekday_int = ? AND exercise_id = ?
-    ''', (weekday_int, exercise_id))
+        WHERE user_id = ? AND weekday_int = ? AND exercise_id = ?
+    ''', (user_id, weekday_int, exercise_id))
+    bump_schedule_version(cursor, user_id)
 
     conn.commit()
-    conn.close()
     
\ No newline at end of file
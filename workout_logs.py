@@ -0,0 +1,101 @@
+from database import connect_db
+
+LOGS_PAGE_SIZE = 20
+
+# Seek past the last workout shown instead of using OFFSET, so every page
+# is a short range scan of idx_workout_user_date however far back it is
+WORKOUT_PAGE_SQL = '''
+    SELECT t1.id, t1.date, t1.duration_in_minutes, t1.workout_type, t1.performance, t1.fatigue_induced, t2.note
+    FROM workout t1
+    LEFT JOIN notes t2
+        ON t1.note_id = t2.id
+    WHERE {workout_filter}
+    ORDER BY t1.date DESC, t1.id DESC
+    LIMIT ?
+'''
+
+FIRST_PAGE_FILTER = 't1.user_id = ?'
+NEXT_PAGE_FILTER = 't1.user_id = ? AND (t1.date, t1.id) < (?, ?)'
+
+WORKOUT_EXERCISES_SQL = '''
+    SELECT t1.workout_id, t2.name, t1.weight, t1.sets, t1.reps, t1.difficulty, t3.note
+    FROM workout_exercises t1
+    INNER JOIN exercises t2
+        ON t1.exercise_id = t2.id
+    LEFT JOIN notes t3
+        ON t1.note_id = t3.id
+    WHERE t1.workout_id IN ({placeholders})
+    ORDER BY t1.workout_id, t1.id
+'''
+
+WORKOUT_MUSCLE_GROUPS_SQL = '''
+    SELECT t1.workout_id, t2.muscle_group, t1.pump, t1.soreness_before_workout, t1.recovery_before_workout, t3.note
+    FROM muscle_groups_worked t1
+    INNER JOIN muscle_groups t2
+        ON t1.muscle_group_id = t2.id
+    LEFT JOIN notes t3
+        ON t1.note_id = t3.id
+    WHERE t1.workout_id IN ({placeholders})
+    ORDER BY t1.workout_id, t1.id
+'''
+
+def get_workout_logs(user_id, before_date=None, before_id=None, limit=LOGS_PAGE_SIZE):
+    conn = connect_db()
+    cursor = conn.cursor()
+
+    if before_date is None:
+        cursor.execute(WORKOUT_PAGE_SQL.format(workout_filter=FIRST_PAGE_FILTER), (user_id, limit + 1))
+    else:
+        cursor.execute(WORKOUT_PAGE_SQL.format(workout_filter=NEXT_PAGE_FILTER), (user_id, before_date, before_id, limit + 1))
+    rows = cursor.fetchall()
+
+    workouts = {}
+    for row in rows[:limit]:
+        workout_id, workout_date, duration, workout_type, performance, fatigue_induced, note = row
+        workouts[workout_id] = {
+            'id': workout_id,
+            'date': workout_date,
+            'duration': duration,
+            'workout_type': workout_type,
+            'performance': performance,
+            'fatigue_induced': fatigue_induced,
+            'note': note,
+            'exercises': [],
+            'muscle_groups': []
+        }
+
+    if workouts:
+        placeholders = ', '.join(['?'] * len(workouts))
+
+        cursor.execute(WORKOUT_EXERCISES_SQL.format(placeholders=placeholders), list(workouts))
+        for row in cursor.fetchall():
+            workout_id, exercise_name, weight, sets, reps, difficulty, note = row
+            workouts[workout_id]['exercises'].append({
+                'exercise': exercise_name,
+                'weight': weight,
+                'sets': sets,
+                'reps': reps,
+                'difficulty': difficulty,
+                'note': note
+            })
+
+        cursor.execute(WORKOUT_MUSCLE_GROUPS_SQL.format(placeholders=placeholders), list(workouts))
+        for row in cursor.fetchall():
+            workout_id, muscle_group, pump, soreness_before_workout, recovery_before_workout, note = row
+            workouts[workout_id]['muscle_groups'].append({
+                'muscle_group': muscle_group,
+                'pump': pump,
+                'soreness_before_workout': soreness_before_workout,
+                'recovery_before_workout': recovery_before_workout,
+                'note': note
+            })
+
+    next_page = None
+    if len(rows) > limit:
+        last_workout = rows[limit - 1]
+        next_page = {'before_date': last_workout[1], 'before_id': last_workout[0]}
+
+    return {
+        'workouts': list(workouts.values()),
+        'next_page': next_page
+    }
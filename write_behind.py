@@ -0,0 +1,130 @@
+import atexit
+import logging
+import threading
+import time
+
+import live_sync
+import metrics
+from database import connect_db, retry_on_busy
+from log_workouts import curr_workout_patch_key, write_curr_workout_patches
+
+logger = logging.getLogger(__name__)
+
+# Autosave patches are acknowledged as soon as they are queued and written
+# by one background thread. Patches for the same staged row replace each
+# other while queued, and every flush writes all users' patches in a single
+# transaction, so concurrent sessions no longer queue up for SQLite's write
+# lock on every keystroke.
+FLUSH_INTERVAL_SECONDS = 0.25
+MAX_PENDING_ROWS = 10000
+
+_pending = {}
+_condition = threading.Condition()
+# Held for the whole take-and-write of a flush, so an older batch can never
+# be committed after a newer one for the same row
+_flush_lock = threading.Lock()
+_writer = None
+_stopping = False
+
+def enqueue(user_id, patches):
+    keys = [(user_id, *curr_workout_patch_key(patch)) for patch in patches]
+
+    with _condition:
+        for key, patch in zip(keys, patches):
+            _pending.pop(key, None)
+            _pending[key] = patch
+        full = len(_pending) >= MAX_PENDING_ROWS
+        _condition.notify()
+    metrics.increment('write_behind_patches_total', amount=len(patches))
+
+    # Past the bound the caller pays for the write itself rather than
+    # letting the queue grow without limit
+    if full:
+        flush()
+
+def flush(user_id=None):
+    # With a user_id only that user's patches are written, which is what a
+    # request needs before it reads (or finishes) that user's workout
+    with _flush_lock:
+        with _condition:
+            if user_id is None:
+                batch = dict(_pending)
+                _pending.clear()
+            else:
+                batch = {key: patch for key, patch in _pending.items() if key[0] == user_id}
+                for key in batch:
+                    del _pending[key]
+        if not batch:
+            return
+
+        patches_by_user = {}
+        for key, patch in batch.items():
+            patches_by_user.setdefault(key[0], []).append(patch)
+
+        try:
+            write_batch(patches_by_user)
+        except Exception:
+            # Put the batch back unless the row was edited again meanwhile
+            with _condition:
+                for key, patch in batch.items():
+                    _pending.setdefault(key, patch)
+            raise
+        metrics.increment('write_behind_flushes_total')
+
+    for batch_user_id in patches_by_user:
+        live_sync.notify(batch_user_id)
+
+@retry_on_busy
+def write_batch(patches_by_user):
+    conn = connect_db()
+    cursor = conn.cursor()
+
+    with conn:
+        for user_id, patches in patches_by_user.items():
+            write_curr_workout_patches(cursor, user_id, patches)
+
+def pending_count():
+    with _condition:
+        return len(_pending)
+
+def _run():
+    while True:
+        with _condition:
+            while not _pending and not _stopping:
+                _condition.wait()
+            if _stopping:
+                break
+
+        # Give a burst of edits a moment to coalesce
+        time.sleep(FLUSH_INTERVAL_SECONDS)
+        try:
+            flush()
+        except Exception:
+            logger.exception("Write-behind flush failed; retrying")
+
+    try:
+        flush()
+    except Exception:
+        logger.exception(f"Write-behind flush failed on shutdown; {pending_count()} rows lost")
+
+def start():
+    global _writer, _stopping
+    if _writer is not None:
+        return
+
+    _stopping = False
+    _writer = threading.Thread(target=_run, name='write-behind', daemon=True)
+    _writer.start()
+    atexit.register(stop)
+
+def stop():
+    global _writer, _stopping
+    if _writer is None:
+        return
+
+    with _condition:
+        _stopping = True
+        _condition.notify()
+    _writer.join()
+    _writer = None
+    logger.info("Write-behind queue flushed")
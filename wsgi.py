@@ -0,0 +1,11 @@
+import logging
+import os
+
+from app import create_app
+
+# Production entry point, e.g.
+#   gunicorn -c gunicorn.conf.py wsgi:app
+#   uvicorn --interface wsgi --workers 4 wsgi:app
+logging.basicConfig(level=os.environ.get('LOG_LEVEL', 'INFO'))
+
+app = create_app()